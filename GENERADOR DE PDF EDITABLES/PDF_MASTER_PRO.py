@@ -8,6 +8,7 @@ import customtkinter as ctk
 from tkinter import messagebox
 import os
 import threading
+import multiprocessing
 
 # Configuración de entorno para silenciar la librería MuPDF (debe hacerse antes de importar fitz)
 os.environ['FITZ_LOG_LEVEL'] = '0'
@@ -257,30 +258,28 @@ class PDFMasterPro(ctk.CTk):
         self.update_idletasks()
         
         # Limpiar editor visual
-        self.visual_editor.clear_fields()
-        
-        # Factor de escala (150 DPI para el editor visual)
-        scale_factor = 150.0 / 72.0
+        with self.visual_editor.batch_redraw():  # Un solo redibujado para limpiar, cargar y añadir
+            self.visual_editor.clear_fields()
         
-        # Cargar TODOS los campos al editor visual (INSTANTÁNEO - es solo canvas)
-        for f in fields:
-            abs_pos = f.get('abs_pos')
-            if abs_pos:
-                self.visual_editor.add_field_from_data({
-                    'label': f['label'],
-                    'type': map_type_to_internal(f['type']),
-                    'options': f.get('options', []),
-                    'abs_pos': {
-                        'x': abs_pos['x'] * scale_factor,
-                        'y': abs_pos['y'] * scale_factor,
-                        'w': abs_pos['w'] * scale_factor,
-                        'h': abs_pos['h'] * scale_factor,
-                        'page': abs_pos.get('page', 0)
-                    }
-                })
+            # Factor de escala (150 DPI para el editor visual)
+            scale_factor = 150.0 / 72.0
         
-        # Redibujar campos en canvas (RÁPIDO)
-        self.visual_editor._redraw_fields()
+            # Cargar TODOS los campos al editor visual (INSTANTÁNEO - es solo canvas)
+            for f in fields:
+                abs_pos = f.get('abs_pos')
+                if abs_pos:
+                    self.visual_editor.add_field_from_data({
+                        'label': f['label'],
+                        'type': map_type_to_internal(f['type']),
+                        'options': f.get('options', []),
+                        'abs_pos': {
+                            'x': abs_pos['x'] * scale_factor,
+                            'y': abs_pos['y'] * scale_factor,
+                            'w': abs_pos['w'] * scale_factor,
+                            'h': abs_pos['h'] * scale_factor,
+                            'page': abs_pos.get('page', 0)
+                        }
+                    })
         
         # Mensaje de éxito
         self.status_label.configure(text=f"✅ {total} campos cargados - {os.path.basename(bg_path)}", text_color="#34C759")
@@ -322,49 +321,49 @@ class PDFMasterPro(ctk.CTk):
             doc.close()
             
             # Limpiar editor visual
-            self.visual_editor.clear_fields()
+            with self.visual_editor.batch_redraw():  # Un solo redibujado para limpiar, cargar y añadir
+                self.visual_editor.clear_fields()
             
-            # Cargar imagen inicial si es necesario
-            self._update_page_info()
+                # Cargar imagen inicial si es necesario
+                self._update_page_info()
             
-            # Cargar campos
-            scale_factor = 150.0 / 72.0
-            fields_loaded = 0
+                # Cargar campos
+                scale_factor = 150.0 / 72.0
+                fields_loaded = 0
             
-            # Recopilar todos los campos del generador avanzado
-            for row in self.app_generator.field_rows:
-                abs_pos = row.get("abs_pos")
-                if abs_pos:
-                    self.visual_editor.add_field_from_data({
-                        'label': row["entry"].get(),
-                        'type': map_type_to_internal(row["type"].get()),
-                        'options': [o.strip() for o in row["options"].get().split(",") if o.strip()],
-                        'abs_pos': {
-                            'x': abs_pos['x'] * scale_factor,
-                            'y': abs_pos['y'] * scale_factor,
-                            'w': abs_pos['w'] * scale_factor,
-                            'h': abs_pos['h'] * scale_factor,
-                            'page': abs_pos.get('page', 0)
-                        }
-                    })
-                    fields_loaded += 1
-                else:
-                    # Campo sin posición absoluta: Colocar en una posición "flotante" por defecto en la página 0
-                    self.visual_editor.add_field_from_data({
-                        'label': row["entry"].get(),
-                        'type': map_type_to_internal(row["type"].get()),
-                        'options': [o.strip() for o in row["options"].get().split(",") if o.strip()],
-                        'abs_pos': {
-                            'x': 50,
-                            'y': 50 + (fields_loaded * 30),
-                            'w': 150,
-                            'h': 20,
-                            'page': 0
-                        }
-                    })
-                    fields_loaded += 1
+                # Recopilar todos los campos del generador avanzado
+                for row in self.app_generator.field_rows:
+                    abs_pos = row.get("abs_pos")
+                    if abs_pos:
+                        self.visual_editor.add_field_from_data({
+                            'label': row["entry"].get(),
+                            'type': map_type_to_internal(row["type"].get()),
+                            'options': [o.strip() for o in row["options"].get().split(",") if o.strip()],
+                            'abs_pos': {
+                                'x': abs_pos['x'] * scale_factor,
+                                'y': abs_pos['y'] * scale_factor,
+                                'w': abs_pos['w'] * scale_factor,
+                                'h': abs_pos['h'] * scale_factor,
+                                'page': abs_pos.get('page', 0)
+                            }
+                        })
+                        fields_loaded += 1
+                    else:
+                        # Campo sin posición absoluta: Colocar en una posición "flotante" por defecto en la página 0
+                        self.visual_editor.add_field_from_data({
+                            'label': row["entry"].get(),
+                            'type': map_type_to_internal(row["type"].get()),
+                            'options': [o.strip() for o in row["options"].get().split(",") if o.strip()],
+                            'abs_pos': {
+                                'x': 50,
+                                'y': 50 + (fields_loaded * 30),
+                                'w': 150,
+                                'h': 20,
+                                'page': 0
+                            }
+                        })
+                        fields_loaded += 1
             
-            self.visual_editor._redraw_fields()
             self.status_label.configure(text=f"Cargados {fields_loaded} campos", text_color="#34C759")
             
         except Exception as e:
@@ -526,5 +525,6 @@ class PDFMasterPro(ctk.CTk):
         self.font_size_var.set(size)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Necesario para el pool de procesos del lote CSV en el ejecutable
     app = PDFMasterPro()
     app.mainloop()
@@ -2,7 +2,20 @@
 Módulo core: Funcionalidad principal del generador PDF
 """
 
-from .document_analyzer import DocumentAnalyzer
-from .pdf_generator import generar_pdf
+__all__ = ['DocumentAnalyzer', 'generar_pdf', 'generar_pdf_lote']
 
-__all__ = ['DocumentAnalyzer', 'generar_pdf']
+# Importación diferida (PEP 562): cv2/numpy y reportlab/pypdf solo se cargan al usarse,
+# no al importar cualquier submódulo de src.core durante el arranque
+_LAZY = {
+    'DocumentAnalyzer': '.document_analyzer',
+    'generar_pdf': '.pdf_generator',
+    'generar_pdf_lote': '.pdf_generator',
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
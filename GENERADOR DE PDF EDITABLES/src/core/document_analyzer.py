@@ -298,18 +298,14 @@ class DocumentAnalyzer:
             if rect.width * zoom > 2500 or rect.height * zoom > 2500:
                 zoom = 2500 / max(rect.width, rect.height)
 
-            mat = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), annots=False)
-            img_data = mat.tobytes("png")
-            
-            # Convertir a formato OpenCV
-            nparr = np.frombuffer(img_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
+            # Renderizar directamente en escala de grises y envolver los samples sin
+            # codificar a PNG (evita el round-trip zlib + imdecode + cvtColor)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, annots=False)
+            if pix.width == 0 or pix.height == 0:
                 return []
             
-            # Convertir a escala de grises
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = np.ascontiguousarray(
+                np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.stride)[:, :pix.width])
             
             # Aplicar umbral adaptativo para mejorar la detección
             thresh = cv2.adaptiveThreshold(
@@ -335,7 +331,7 @@ class DocumentAnalyzer:
             
             # Filtrar solo líneas horizontales y convertir coordenadas
             horizontal_lines = []
-            scale_factor = page.rect.width / img.shape[1]  # Factor de escala imagen->PDF
+            scale_factor = page.rect.width / gray.shape[1]  # Factor de escala imagen->PDF
             
             for line in lines_detected:
                 x1, y1, x2, y2 = line[0]
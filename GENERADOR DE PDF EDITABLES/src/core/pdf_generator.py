@@ -6,6 +6,27 @@ from io import BytesIO
 from pypdf import PdfReader, PdfWriter
 from pypdf.generic import NameObject, DictionaryObject, ArrayObject, TextStringObject, NumberObject, BooleanObject
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+@lru_cache(maxsize=16)
+def _cached_image_reader(path, mtime):
+    return ImageReader(path)
+
+def _image_reader(path):
+    """
+    ImageReader memoizado por (ruta, mtime): el logo y las imágenes extra se decodifican una
+    vez por proceso, no en cada página ni en cada PDF de un lote.
+    """
+    return _cached_image_reader(path, os.path.getmtime(path))
+
+# JavaScript de validación (/AA /V) por tipo; las cadenas son fijas, se construyen una sola vez
+_VALIDATION_JS = {
+    'Email': 'var re=/^[\\w-\\.]+@([\\w-]+\\.)+[\\w-]{2,4}$/; if(event.value&&!re.test(event.value)){{app.alert("Email incorrecto"); event.rc=false;}}',
+    'DNI/NIE': 'var re=/^[XYZ0-9][0-9]{7}[TRWAGMYFPDXBNJZSQVHLCKE]$/i; if(event.value&&!re.test(event.value)){{app.alert("DNI inválido"); event.rc=false;}}',
+    'Teléfono': 'var re=/^(\\+34|0034|34)?[6789]\\d{8}$/; if(event.value&&!re.test(event.value)){{app.alert("Teléfono inválido"); event.rc=false;}}',
+    'Numérico': 'if(event.value&&isNaN(event.value.replace(",","."))){{app.alert("Debe ser numérico"); event.rc=false;}}',
+}
 
 def generar_pdf(output_path, titulo, campos, logo_path=None, config_visual=None, extra_images=None, bg_pdf_path=None):
     """
@@ -59,7 +80,7 @@ def generar_pdf(output_path, titulo, campos, logo_path=None, config_visual=None,
         # Dibujar Logo
         if logo_path and os.path.exists(logo_path):
             try:
-                img = ImageReader(logo_path)
+                img = _image_reader(logo_path)
                 img_w, img_h = img.getSize()
                 aspect = img_h / float(img_w)
                 logo_pos = config_visual.get('logo_position', {'x': 50, 'y': 30})
@@ -109,7 +130,7 @@ def generar_pdf(output_path, titulo, campos, logo_path=None, config_visual=None,
                     img_w = img_data.get('w', 100)
                     img_h = img_data.get('h', 100)
                     real_y = height - img_y_from_top - img_h
-                    c.drawImage(ImageReader(img_p), img_x, real_y, width=img_w, height=img_h, mask='auto')
+                    c.drawImage(_image_reader(img_p), img_x, real_y, width=img_w, height=img_h, mask='auto')
                 except: pass
 
     # Layout Setup
@@ -331,14 +352,8 @@ def generar_pdf(output_path, titulo, campos, logo_path=None, config_visual=None,
                 aa_dict.update({NameObject("/C"): DictionaryObject({NameObject("/S"): NameObject("/JavaScript"), NameObject("/JS"): TextStringObject(js)})})
             except: pass
 
-        val_type = field.get('validation', 'Ninguno')
-        if val_type != 'Ninguno':
-            js_v = ""
-            if val_type == 'Email': js_v = 'var re=/^[\\w-\\.]+@([\\w-]+\\.)+[\\w-]{2,4}$/; if(event.value&&!re.test(event.value)){{app.alert("Email incorrecto"); event.rc=false;}}'
-            elif val_type == 'DNI/NIE': js_v = 'var re=/^[XYZ0-9][0-9]{7}[TRWAGMYFPDXBNJZSQVHLCKE]$/i; if(event.value&&!re.test(event.value)){{app.alert("DNI inválido"); event.rc=false;}}'
-            elif val_type == 'Teléfono': js_v = 'var re=/^(\\+34|0034|34)?[6789]\\d{8}$/; if(event.value&&!re.test(event.value)){{app.alert("Teléfono inválido"); event.rc=false;}}'
-            elif val_type == 'Numérico': js_v = 'if(event.value&&isNaN(event.value.replace(",","."))){{app.alert("Debe ser numérico"); event.rc=false;}}'
-            if js_v: aa_dict.update({NameObject("/V"): DictionaryObject({NameObject("/S"): NameObject("/JavaScript"), NameObject("/JS"): TextStringObject(js_v)})})
+        js_v = _VALIDATION_JS.get(field.get('validation', 'Ninguno'))
+        if js_v: aa_dict.update({NameObject("/V"): DictionaryObject({NameObject("/S"): NameObject("/JavaScript"), NameObject("/JS"): TextStringObject(js_v)})})
 
         if aa_dict: field_dict.update({NameObject("/AA"): aa_dict})
 
@@ -370,3 +385,53 @@ def generar_pdf(output_path, titulo, campos, logo_path=None, config_visual=None,
 
     writer.write(output_path)
     print(f"✅ PDF multi-página: {output_path}")
+
+
+# Opciones comunes del lote (titulo, logo_path, config_visual, extra_images) en cada proceso
+_lote_comun = None
+
+def _init_lote(comun):
+    """(Inicializador del pool) Recibe una sola vez por proceso lo que comparten todas las filas."""
+    global _lote_comun
+    _lote_comun = comun
+
+def _generar_uno(trabajo):
+    """(Proceso del pool) Genera un PDF del lote y devuelve (ruta, error o None)."""
+    output_path, campos = trabajo
+    titulo, logo_path, config_visual, extra_images = _lote_comun
+    try:
+        generar_pdf(output_path, titulo, campos, logo_path, config_visual=config_visual, extra_images=extra_images)
+        return output_path, None
+    except Exception as e:
+        return output_path, str(e)
+
+def generar_pdf_lote(trabajos, titulo, logo_path=None, config_visual=None, extra_images=None, num_workers=None, progress_callback=None):
+    """
+    Genera varios PDFs en paralelo con un pool de procesos (la generación es CPU-bound).
+
+    `trabajos` es una lista de tuplas (output_path, campos); el título, el logo, la configuración
+    visual y las imágenes extra son comunes al lote y se envían a cada proceso una sola vez.
+    Devuelve, en el mismo orden, tuplas (output_path, error) con error=None si se generó bien.
+    `progress_callback(actual, total)` se invoca tras cada PDF terminado.
+    """
+    comun = (titulo, logo_path, config_visual, extra_images)
+    total = len(trabajos)
+    if num_workers is None:
+        num_workers = min(os.cpu_count() or 1, 4)
+    num_workers = min(num_workers, total)
+
+    def recoger(resultados):
+        hechos = []
+        for resultado in resultados:
+            hechos.append(resultado)
+            if progress_callback:
+                progress_callback(len(hechos), total)
+        return hechos
+
+    if num_workers <= 1:
+        _init_lote(comun)
+        return recoger(map(_generar_uno, trabajos))
+    # Envío por bloques (~4 por proceso): amortiza el pickling y el despacho de cada trabajo
+    chunksize = max(1, total // (num_workers * 4))
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_lote, initargs=(comun,)) as executor:
+        return recoger(executor.map(_generar_uno, trabajos, chunksize=chunksize))
@@ -1,10 +1,181 @@
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Callable, NamedTuple
 import os
 
-def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config_visual=None, extra_images=None, bg_images=None, pdf_dims=None):
+@dataclass
+class CamposSoA:
+    """
+    Campos de la vista previa en formato struct-of-arrays: una lista por atributo,
+    de modo que el bucle de dibujado recorre columnas en paralelo sin buscar claves.
+    """
+    labels: list = field(default_factory=list)
+    types: list = field(default_factory=list)
+    columns: list = field(default_factory=list)
+    options: list = field(default_factory=list)  # None si el campo no define opciones
+    abs_pos: list = field(default_factory=list)  # None si el campo sigue el flujo normal
+
+    def append(self, label, tipo='text', options=None, column='full', abs_pos=None):
+        self.labels.append(label)
+        self.types.append(tipo)
+        self.columns.append(column)
+        self.options.append(options)
+        self.abs_pos.append(abs_pos)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def from_campos(cls, campos):
+        """Convierte una lista de diccionarios de campo (formato clásico) a SoA."""
+        if isinstance(campos, cls):
+            return campos
+        soa = cls()
+        for campo in campos:
+            soa.append(campo['label'], campo.get('type', 'text'), campo.get('options'),
+                       campo.get('column', 'full'), campo.get('abs_pos'))
+        return soa
+
+@lru_cache(maxsize=128)
+def _render_section_header(label_upper, scale, color, font_file, font_size, line_len):
+    """
+    Pre-rasteriza la cabecera de una sección (texto + subrayado) como un tile RGBA.
+    Las secciones se repiten entre renders, así que el tile se reutiliza desde la caché.
+    """
+    try:
+        font = ImageFont.truetype(font_file, font_size)
+    except:
+        font = ImageFont.load_default()
+
+    line_y = int(25 * scale)
+    line_width = int(1 * scale)
+    text_bottom = font.getbbox(label_upper)[3]
+    tile_h = max(text_bottom, line_y + line_width) + 1
+
+    tile = Image.new('RGBA', (max(1, line_len + 1), tile_h), (0, 0, 0, 0))
+    tile_draw = ImageDraw.Draw(tile)
+    tile_draw.text((0, 0), label_upper, fill=color, font=font)
+    tile_draw.line([(0, line_y), (line_len, line_y)], fill=color, width=line_width)
+    return tile
+
+class _DrawCtx(NamedTuple):
+    """Contexto invariante de un render, compartido por todos los manejadores de tipo."""
+    text: Callable
+    rect: Callable
+    line: Callable
+    ellipse: Callable
+    scale: float
+    spacing: float
+    font_label: object
+    font_small: object
+    primary_color: tuple
+    text_color: tuple
+
+# Cada manejador dibuja un campo y devuelve el avance vertical (en puntos) del flujo normal
+
+def _draw_date(ctx, label, opts, field_x, field_y, field_w, label_y):
+    scale = ctx.scale
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    for i, offset_pts in enumerate([50, 95, 140]):
+        off_x = field_x + int(offset_pts * scale)
+        ctx.rect([off_x, field_y, off_x + int(30 * scale if i<2 else 50 * scale), field_y + int(20 * scale)], fill=(245, 250, 255))
+        ctx.line([(off_x, field_y + int(20 * scale)), (off_x + int(30 * scale if i<2 else 50 * scale), field_y + int(20 * scale))], fill='black')
+        if i < 2: ctx.text((off_x + int(35 * scale), field_y), "/", fill=ctx.text_color, font=ctx.font_small)
+    return ctx.spacing
+
+def _draw_checkbox(ctx, label, opts, field_x, field_y, field_w, label_y):
+    scale = ctx.scale
+    ctx.rect([field_x, label_y, field_x + int(18 * scale), label_y + int(18 * scale)], outline='black')
+    ctx.text((field_x + int(25 * scale), label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    return ctx.spacing * 0.7
+
+def _draw_dropdown(ctx, label, opts, field_x, field_y, field_w, label_y):
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    ctx.rect([field_x, field_y, field_x + field_w, field_y + int(20 * ctx.scale)], outline=ctx.primary_color)
+    return ctx.spacing
+
+def _draw_radio(ctx, label, opts, field_x, field_y, field_w, label_y):
+    scale = ctx.scale
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    options = opts if opts is not None else ['Opc 1', 'Opc 2']
+    for i, opt in enumerate(options):
+        opt_y = field_y + (i * int(25 * scale))
+        ctx.ellipse([field_x + int(2 * scale), opt_y, field_x + int(14 * scale), opt_y + int(12 * scale)], outline='black')
+        ctx.text((field_x + int(20 * scale), opt_y), opt, fill=ctx.text_color, font=ctx.font_small)
+    return len(options) * 25 + ctx.spacing
+
+def _draw_multiline(ctx, label, opts, field_x, field_y, field_w, label_y):
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    ctx.rect([field_x, field_y, field_x + field_w, field_y + int(60 * ctx.scale)], outline='black', fill=(250, 252, 255))
+    return ctx.spacing + 40
+
+def _draw_signature(ctx, label, opts, field_x, field_y, field_w, label_y):
+    scale = ctx.scale
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    line_y = field_y + int(40 * scale)
+    ctx.line([(field_x, line_y), (field_x + field_w, line_y)], fill='black', width=1)
+    ctx.text((field_x + int(5 * scale), line_y - int(15 * scale)), "(Firma Digital)", fill=(150, 150, 150), font=ctx.font_small)
+    return ctx.spacing + 25
+
+def _draw_text(ctx, label, opts, field_x, field_y, field_w, label_y):
+    """Texto / Número (y cualquier tipo desconocido)."""
+    ctx.text((field_x, label_y), label, fill=ctx.text_color, font=ctx.font_label)
+    ctx.rect([field_x, field_y, field_x + field_w, field_y + int(20 * ctx.scale)], fill=(245, 250, 255), outline=(220, 230, 240))
+    ctx.line([(field_x, field_y + int(20 * ctx.scale)), (field_x + field_w, field_y + int(20 * ctx.scale))], fill=(100, 100, 100))
+    return ctx.spacing
+
+DRAW_HANDLERS = {
+    'date': _draw_date,
+    'checkbox': _draw_checkbox,
+    'dropdown': _draw_dropdown,
+    'radio': _draw_radio,
+    'multiline': _draw_multiline,
+    'signature': _draw_signature,
+}
+
+def generar_sprite_arrastre(tipo, datos, scale):
+    """
+    Imagen suelta del elemento que se arrastra en la vista previa, al mismo tamaño con el que
+    lo pinta generar_preview_imagen. tipo: 'logo' (datos = ruta), 'extra' (dict de la imagen)
+    o 'field' (abs_pos). Devuelve None si la imagen no se puede cargar.
+    """
+    try:
+        if tipo == 'field':
+            w, h = int(datos['w'] * scale), int(datos['h'] * scale)
+            sprite = Image.new('RGBA', (w + 1, h + 1), (0, 0, 0, 0))
+            ImageDraw.Draw(sprite).rectangle([0, 0, w, h], fill=(0, 122, 255, 30),
+                                             outline=(0, 122, 255, 200), width=2)
+            return sprite
+        if tipo == 'logo':
+            sprite = Image.open(datos)
+            sprite.thumbnail((int(180 * scale), int(100 * scale)), Image.Resampling.LANCZOS)
+        else:
+            sprite = Image.open(datos['path'])
+            sprite.thumbnail((int(datos.get('w', 100) * scale), int(datos.get('h', 100) * scale)),
+                             Image.Resampling.LANCZOS)
+        # generar_preview_imagen pega logo e imágenes sin máscara: mismo resultado en RGB
+        return sprite.convert('RGB')
+    except Exception as e:
+        print(f"Error preparando elemento de arrastre: {e}")
+        return None
+
+def escalar_fondo(bg_images, width_px):
+    """Redimensiona las páginas del PDF de fondo al ancho del preview (para cachearlas)."""
+    escaladas = []
+    for bg_img in bg_images or []:
+        bg_w, bg_h = bg_img.size
+        target_h = int(bg_h * (width_px / float(bg_w)))
+        escaladas.append(bg_img.resize((width_px, target_h), Image.Resampling.LANCZOS))
+    return escaladas
+
+def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config_visual=None, extra_images=None, bg_images=None, pdf_dims=None, cached_bg=None):
     """
     Genera una imagen PIL de alta resolución para la vista previa.
+    `campos` puede ser una lista de diccionarios o un CamposSoA ya construido.
+    `cached_bg`: páginas de fondo ya escaladas a `width_px` (ver escalar_fondo); evita el LANCZOS por render.
     """
+    campos = CamposSoA.from_campos(campos)
     if not config_visual:
         config_visual = {
             'primary_color': '#2E86C1',
@@ -31,13 +202,11 @@ def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config
     
     # Calcular Altura Necesaria Dinámicamente
     total_y_pts = 140 # Margen superior
-    for campo in campos:
-        tipo = campo.get('type', 'text')
-        col = campo.get('column', 'full')
+    for tipo, col, opts in zip(campos.types, campos.columns, campos.options):
         if col == '2': continue 
         
         if tipo == 'section': total_y_pts += 50
-        elif tipo == 'radio': total_y_pts += (len(campo.get('options', ['1','2'])) * 25 + spacing_base)
+        elif tipo == 'radio': total_y_pts += (len(opts if opts is not None else ['1','2']) * 25 + spacing_base)
         elif tipo == 'multiline': total_y_pts += (spacing_base + 60)
         elif tipo == 'signature': total_y_pts += (spacing_base + 40)
         else: total_y_pts += spacing_base
@@ -52,15 +221,12 @@ def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config
     
     # Pegar fondo PDF si existe
     if bg_images:
-        for p, bg_img in enumerate(bg_images):
+        if cached_bg is None:
+            # Redimensionar fondo para ajustar al ancho del preview
+            cached_bg = escalar_fondo(bg_images, width_px)
+        for p, bg_resized in enumerate(cached_bg):
             py = int(p * page_h_pts * scale)
             if py < height_px:
-                # Redimensionar fondo para ajustar al ancho del preview
-                bg_w, bg_h = bg_img.size
-                ratio = width_px / float(bg_w)
-                target_h = int(bg_h * ratio)
-                
-                bg_resized = bg_img.resize((width_px, target_h), Image.Resampling.LANCZOS)
                 img.paste(bg_resized, (0, py))
 
     # Dibujar indicadores de salto de página (líneas discontinuas cada page_h_pts)
@@ -155,12 +321,14 @@ def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config
     col_width_pts = (612 - 100) / 2
     col_width_px = int(col_width_pts * scale)
 
-    for idx, campo in enumerate(campos):
-        label = campo['label']
-        tipo = campo.get('type', 'text')
-        col_type = campo.get('column', 'full') # 'full', '1', '2'
-        
-        abs_pos = campo.get('abs_pos')
+    # Contexto invariante con los métodos de dibujo ya enlazados (evita LOAD_ATTR por llamada)
+    ctx = _DrawCtx(draw.text, draw.rectangle, draw.line, draw.ellipse, scale, spacing_base,
+                   font_label, font_small, primary_color, text_color)
+    get_handler = DRAW_HANDLERS.get
+
+    for label, tipo, col_type, opts, abs_pos in zip(campos.labels, campos.types, campos.columns,
+                                                    campos.options, campos.abs_pos):
+        # col_type: 'full', '1', '2'
         if abs_pos:
             field_x = int(abs_pos['x'] * scale)
             # Y absoluta en el preview = (puntos_acumulados_paginas + y_en_pagina) * scale
@@ -187,60 +355,18 @@ def generar_preview_imagen(titulo, campos, logo_path=None, width_px=1200, config
         if tipo == 'section':
             if col_type == '1': current_y += spacing_base
             text_y = y_scaled + int(20 * scale)
-            draw.text((int(50 * scale), text_y), label.upper(), fill=primary_color, font=font_bold)
-            draw.line([(int(50 * scale), text_y + int(25 * scale)), (width_px - int(50 * scale), text_y + int(25 * scale))], fill=primary_color, width=int(1 * scale))
+            header_x = int(50 * scale)
+            tile = _render_section_header(label.upper(), scale, primary_color, font_file_bold, size_title,
+                                          width_px - 2 * header_x)
+            img.paste(tile, (header_x, text_y), tile)
             current_y += 45
             continue
 
-        if tipo == 'date':
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            for i, offset_pts in enumerate([50, 95, 140]):
-                off_x = field_x + int(offset_pts * scale)
-                draw.rectangle([off_x, field_y, off_x + int(30 * scale if i<2 else 50 * scale), field_y + int(20 * scale)], fill=(245, 250, 255))
-                draw.line([(off_x, field_y + int(20 * scale)), (off_x + int(30 * scale if i<2 else 50 * scale), field_y + int(20 * scale))], fill='black')
-                if i < 2: draw.text((off_x + int(35 * scale), field_y), "/", fill=text_color, font=font_small)
-            if col_type != '1': current_y += spacing_base
-        
-        elif tipo == 'checkbox':
-            draw.rectangle([field_x, label_y, field_x + int(18 * scale), label_y + int(18 * scale)], outline='black')
-            draw.text((field_x + int(25 * scale), label_y), label, fill=text_color, font=font_label)
-            if col_type != '1': current_y += (spacing_base * 0.7)
-        
-        elif tipo == 'dropdown':
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            draw.rectangle([field_x, field_y, field_x + field_w, field_y + int(20 * scale)], outline=primary_color)
-            if col_type != '1': current_y += spacing_base
-
-        elif tipo == 'radio':
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            options = campo.get('options', ['Opc 1', 'Opc 2'])
-            for i, opt in enumerate(options):
-                opt_y = field_y + (i * int(25 * scale))
-                draw.ellipse([field_x + int(2 * scale), opt_y, field_x + int(14 * scale), opt_y + int(12 * scale)], outline='black')
-                draw.text((field_x + int(20 * scale), opt_y), opt, fill=text_color, font=font_small)
-            if col_type != '1': current_y += (len(options) * 25 + spacing_base)
-
-        elif tipo == 'multiline':
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            draw.rectangle([field_x, field_y, field_x + field_w, field_y + int(60 * scale)], outline='black', fill=(250, 252, 255))
-            if col_type != '1': current_y += (spacing_base + 40)
-
-        elif tipo == 'signature':
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            line_y = field_y + int(40 * scale)
-            draw.line([(field_x, line_y), (field_x + field_w, line_y)], fill='black', width=1)
-            draw.text((field_x + int(5 * scale), line_y - int(15 * scale)), "(Firma Digital)", fill=(150, 150, 150), font=font_small)
-            if col_type != '1': current_y += (spacing_base + 25)
-
-        else: # Texto / Number
-            draw.text((field_x, label_y), label, fill=text_color, font=font_label)
-            draw.rectangle([field_x, field_y, field_x + field_w, field_y + int(20 * scale)], fill=(245, 250, 255), outline=(220, 230, 240))
-            draw.line([(field_x, field_y + int(20 * scale)), (field_x + field_w, field_y + int(20 * scale))], fill=(100, 100, 100))
-            if col_type != '1': current_y += spacing_base
+        advance = get_handler(tipo, _draw_text)(ctx, label, opts, field_x, field_y, field_w, label_y)
+        if col_type != '1': current_y += advance
 
     # Dibujar rectángulos visuales para campos absolutos (para facilitar selección)
-    for idx, campo in enumerate(campos):
-        abs_pos = campo.get('abs_pos')
+    for abs_pos in campos.abs_pos:
         if abs_pos:
             field_x = int(abs_pos['x'] * scale)
             page_offset_pts = abs_pos.get('page', 0) * page_h_pts
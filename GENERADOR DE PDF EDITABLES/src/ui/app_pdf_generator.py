@@ -13,27 +13,72 @@ Características:
 """
 
 import customtkinter as ctk
-from tkinter import filedialog, messagebox, colorchooser
+from tkinter import filedialog, messagebox, colorchooser, TclError
 from PIL import Image, ImageTk
 import os
 import csv
-import io
+import codecs
+import copy
+import time
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
-from src.core.pdf_generator import generar_pdf
-from src.core.preview_generator import generar_preview_imagen
-from src.utils.templates_manager import PREDEFINED_TEMPLATES, save_template, load_custom_template, list_custom_templates
+from dataclasses import asdict
+from src.core.preview_generator import generar_preview_imagen, generar_sprite_arrastre, escalar_fondo, CamposSoA
+from src.utils.templates_manager import PREDEFINED_TEMPLATES, save_template, load_custom_template_cached, list_custom_templates, template_path
 
 # Nuevos módulos modularizados
 from src.utils.app_models import *
-from src.utils.app_data_manager import DataManager, ExportManager
+from src.utils.app_data_manager import DataManager, ExportManager, OperationJournal
 from src.utils.app_email_logic import send_generated_pdf_email, test_smtp_connection
 from src.ui.app_ui_dialogs import show_add_field_dialog, show_field_settings
-from src.utils.app_pdf_utils import render_pdf_to_images, get_pdf_dimensions, map_import_type, map_type_to_internal
-from src.core.document_analyzer import DocumentAnalyzer
+from src.utils.app_pdf_utils import render_pdf_to_images_cached, get_pdf_dimensions_cached, map_import_type, map_type_to_internal, find_field_box_at
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+
+def _split_opts(text):
+    """Separa las opciones de un campo ("a, b,,c" -> ["a", "b", "c"])."""
+    return [o for o in (t.strip() for t in text.split(",")) if o]
+
+
+def _row_options(row):
+    """
+    Opciones de una fila de campo ya separadas. El resultado se guarda en la fila junto al
+    texto del que sale, así que solo se vuelve a separar si el usuario cambió las opciones.
+    La lista devuelta es compartida: no mutarla.
+    """
+    text = row["options"].get()
+    cached = row.get("_opts_cache")
+    if cached is None or cached[0] != text:
+        cached = row["_opts_cache"] = (text, _split_opts(text))
+    return cached[1]
+
+
+def _normalize_predefined(fields_data):
+    """Convierte los campos de una plantilla predefinida al formato del estado completo."""
+    normalized_fields = []
+    for f in fields_data:
+        opts = f.get("options", [])
+        normalized_fields.append({
+            "label": f.get("label", ""),
+            "type": TYPE_MAP_INV.get(f.get("type", "text"), "Texto"),
+            "options": ",".join(opts) if isinstance(opts, (list, tuple)) else str(opts),
+            "column": COLUMN_MAP_INV.get(f.get("column", "full"), "Ancho Completo"),
+            "logic": f.get("logic", "")
+        })
+    return normalized_fields
+
+# Las plantillas predefinidas no cambian en ejecución: se normalizan una sola vez
+_NORMALIZED_PREDEFINED = {name: _normalize_predefined(fields) for name, fields in PREDEFINED_TEMPLATES.items()}
+
+# Caracteres prohibidos en nombres de archivo (se eliminan en una sola pasada con str.translate)
+_FNAME_TRANSLATE = str.maketrans('', '', '<>:"/\\|?*')
+
 class PDFGeneratorApp(ctk.CTkFrame):
     """
     Componente principal para la generación de formularios PDF editables con 
@@ -59,6 +104,12 @@ class PDFGeneratorApp(ctk.CTkFrame):
         # 4. Carga inicial de datos y refresco visual
         self._load_initial_data()
 
+    def destroy(self):
+        """Detiene el hilo de preview antes de destruir los widgets."""
+        self._destroyed = True
+        self._preview_pool.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
+
     def _load_initial_data(self):
         """Carga los datos por defecto y el historial al arrancar."""
         # self.add_default_fields() # No cargar campos por defecto
@@ -75,19 +126,66 @@ class PDFGeneratorApp(ctk.CTkFrame):
     def _init_state(self):
         """Inicializa variables de control, historial y configuración visual."""
         self.after_id = None      # Para debouncing de vista previa
+        self._last_preview_ts = 0.0  # Instante (monotonic) del último render completado
+        self._preview_busy = False   # Hay un render en curso en el hilo de preview
+        self._preview_pending = False  # Se pidió otro render mientras había uno en curso
+        # Hilo único para generar_preview_imagen: el bucle de Tk no se bloquea durante el render
+        self._preview_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+        self._destroyed = False      # destroy() ya se llamó: se ignoran los renders que lleguen tarde
+        self._preview_gen_id = 0     # Nº del último render lanzado
+        self._preview_shown_id = 0   # Nº del render que se está mostrando (descarta resultados antiguos)
+        self._batching = 0           # >0 mientras se aplica un estado completo (sin renders)
+        # Throttle leading+trailing para los sliders de imágenes
+        self._throttled_preview = self._throttle(self.update_preview, PREVIEW_THROTTLE_MS,
+                                                 on_start=self.save_state_to_undo)
+        self._visual_after_id = None  # Debounce (trailing) de los controles de diseño
+        self._preview_after_id = None  # Refresco pendiente del preview durante un arrastre
+        self._layout_after_id = None   # Re-empaquetado pendiente al reordenar filas
+        self._drag_base_img = None     # Preview sin el elemento arrastrado (se compone encima)
+        self._drag_element_img = None  # Imagen del elemento arrastrado
+        # Rejilla (celda -> índices de campos absolutos) para el hit-test del preview
+        self._abs_pos_grid = {}
+        self._abs_boxes = np.empty((0, 4))                # x, y (acumulada entre páginas), w, h en pts
+        self._abs_box_rows = np.empty(0, dtype=np.intp)   # Fila de field_rows de cada caja
+        self._abs_pos_grid_dirty = True
+        self._abs_grid_page_h = None
+        self._packed_frames = []  # Frames de campo empaquetados, en orden (último layout aplicado)
+        self._bg_raster_cache = {}  # (bg_pdf_path, width_px) -> páginas de fondo ya escaladas
+        self._render_w = None       # Ancho de render del preview (se calcula al primer uso)
+        # Geometría del preview (márgenes en px y escala px -> pts), recalculada solo al
+        # redimensionar el label o cambiar de fondo; los eventos de ratón la leen sin consultar a Tk
+        self._preview_geom = {"margin_x": 0, "margin_y": 0, "scale": 1.0, "widget_w": 0, "widget_h": 0}
         self.logo_path = None     # Ruta del logo principal
         self.extra_images = []    # Imágenes adicionales: [{'path', 'x', 'y', 'w', 'h'}, ...]
         
+        # Widgets reutilizables de las listas del sidebar (evita destruir/recrear en cada cambio)
+        self._image_widget_pool = []     # Una tarjeta por posición: {'frame', 'name', 'x', 'y', 'w'}
+        self._template_btn_cache = {}    # Nombre de plantilla personalizada -> fila (CTkFrame)
+        self._custom_tpl_header = None   # Etiqueta "MIS PLANTILLAS" (se crea una vez)
+        self._custom_templates_cache = None  # Listado de plantillas en disco (None = releer)
+
+        # Fuentes compartidas: cada CTkFont crea un objeto de fuente Tk, se reutilizan entre filas
+        self._font_bold_14 = ctk.CTkFont(size=14, weight="bold")
+        self._font_bold_12 = ctk.CTkFont(size=12, weight="bold")
+        self._font_bold_10 = ctk.CTkFont(size=10, weight="bold")
+        self._font_bold_9 = ctk.CTkFont(size=9, weight="bold")
+        self._font_bold = ctk.CTkFont(weight="bold")
+        self._font_12 = ctk.CTkFont(size=12)
+        self._font_11 = ctk.CTkFont(size=11)
+        self._font_10 = ctk.CTkFont(size=10)
+        self._font_9 = ctk.CTkFont(size=9)
+
         # Configuración Visual por Defecto (Look & Feel)
         self.config_visual = DEFAULT_CONFIG_VISUAL.copy()
 
         # Pilas para Deshacer / Rehacer
-        self.undo_stack = []
-        self.redo_stack = []
+        self.undo_stack = deque(maxlen=UNDO_LIMIT)  # Al llenarse descarta la entrada más antigua
+        self.redo_stack = deque(maxlen=UNDO_LIMIT)
         self._block_state_capture = False
 
         # Gestor de Datos e Historial
         self.data_manager = DataManager()
+        self.ops_journal = OperationJournal()  # Copia en disco de las operaciones de deshacer
         self.history = self.data_manager.history
 
         # Configuración de Email
@@ -399,19 +497,48 @@ class PDFGeneratorApp(ctk.CTkFrame):
         self.add_field_btn.pack(side="right")
 
         # 2. Área de desplazamiento para los campos
-        scrollbar_color = ("#D1D1D6", "#333333")
-        scrollbar_hover = ("#C7C7CC", "#444444")
-        self.fields_scroll = ctk.CTkScrollableFrame(self.editor_frame, 
-                                                    fg_color=("#FFFFFF", "#161617"), 
-                                                    scrollbar_button_color=scrollbar_color,
-                                                    scrollbar_button_hover_color=scrollbar_hover)
+        self.fields_scroll = self._create_fields_scroll()
         self.fields_scroll.grid(row=1, column=0, padx=10, pady=0, sticky="nsew")
-        self.fields_scroll.grid_columnconfigure(0, weight=1)
         self.field_rows = []
 
         # 3. Footer (Botón de Generación Principal)
         self._setup_editor_footer()
 
+    def _create_fields_scroll(self):
+        """Crea el contenedor desplazable (vacío) que aloja las filas de campos."""
+        scrollbar_color = ("#D1D1D6", "#333333")
+        scrollbar_hover = ("#C7C7CC", "#444444")
+        scroll = ctk.CTkScrollableFrame(self.editor_frame, 
+                                        fg_color=("#FFFFFF", "#161617"), 
+                                        scrollbar_button_color=scrollbar_color,
+                                        scrollbar_button_hover_color=scrollbar_hover)
+        scroll.grid_columnconfigure(0, weight=1)
+        return scroll
+
+    def _recreate_fields_scroll(self):
+        """Destruye el contenedor de campos de una vez y lo sustituye por uno vacío.
+
+        Tk libera todos los hijos en una sola operación, mucho más rápido que
+        destruir cada fila por separado. Se conserva el gestor de geometría
+        (grid en el editor, pack cuando PDF_MASTER_PRO lo recoloca).
+        """
+        old = self.fields_scroll
+        outer = getattr(old, "_parent_frame", old)
+        manager = outer.winfo_manager()
+        info = {}
+        if manager == "grid":
+            info = outer.grid_info()
+        elif manager == "pack":
+            info = outer.pack_info()
+        info.pop("in", None)
+        old.destroy()
+        self.fields_scroll = self._create_fields_scroll()
+        if manager == "grid":
+            self.fields_scroll.grid(**info)
+        elif manager == "pack":
+            self.fields_scroll.pack(**info)
+        self._packed_frames = []
+
     def _setup_editor_footer(self):
         """Configura el pie de página del editor con el botón de generar PDF."""
         footer_bg = ("#F2F2F7", "#1A1A1A")
@@ -443,10 +570,10 @@ class PDFGeneratorApp(ctk.CTkFrame):
         toolbar.grid(row=0, column=0, sticky="ew", padx=15, pady=5)
         
         ctk.CTkLabel(toolbar, text="👁️ VISTA PREVIA", 
-                      font=ctk.CTkFont(size=14, weight="bold")).pack(side="left")
+                      font=self._font_bold_14).pack(side="left")
 
         self.design_switch = ctk.CTkSwitch(toolbar, text="Modo Diseño ✏️", variable=self.design_mode, 
-                                           progress_color="#34C759", font=ctk.CTkFont(size=12))
+                                           progress_color="#34C759", font=self._font_12)
         self.design_switch.pack(side="right", padx=10)
 
         # El "Papel" (Mockup visual del PDF en ScrollableArea)
@@ -461,6 +588,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
         self.preview_canvas_label.bind("<Button-1>", self._on_preview_click)
         self.preview_canvas_label.bind("<B1-Motion>", self._on_preview_drag)
         self.preview_canvas_label.bind("<ButtonRelease-1>", self._on_preview_release)
+        self.preview_canvas_label.bind("<Configure>", self._update_preview_geom)
 
     def _setup_keybindings(self):
         """Define los atajos de teclado globales para mejorar la productividad."""
@@ -474,6 +602,21 @@ class PDFGeneratorApp(ctk.CTkFrame):
         self.bind("<Control-y>", lambda e: self.redo())
         self.bind("<Control-Z>", lambda e: self.redo()) # Atajo alternativo para rehacer
 
+        # Hover de las tarjetas de campo: un único handler para todas las filas
+        self.bind_class("FieldRow", "<Enter>", self._on_row_enter)
+        self.bind_class("FieldRow", "<Leave>", self._on_row_leave)
+
+    def _on_row_enter(self, event):
+        event.widget.configure(border_color="#007AFF", border_width=2)
+
+    def _on_row_leave(self, event):
+        row_frame = event.widget
+        # Pasar a un widget hijo también genera <Leave>: mantener el resaltado
+        under = row_frame.winfo_containing(event.x_root, event.y_root)
+        if under is not None and str(under).startswith(str(row_frame)):
+            return
+        row_frame.configure(border_color=("#D1D1D6", "#2C2C2E"), border_width=1)
+
     # =========================================================================
     # GESTIÓN DE PLANTILLAS Y PERSISTENCIA
     # =========================================================================
@@ -481,216 +624,323 @@ class PDFGeneratorApp(ctk.CTkFrame):
     def load_template_by_name(self, name, is_predefined=True):
         """Carga una plantilla (predefinida o personalizada) y aplica su estado a la UI."""
         self.save_state_to_undo()
-        
-        if is_predefined:
-            if name in PREDEFINED_TEMPLATES:
-                fields_data = PREDEFINED_TEMPLATES[name]
-                # Normalizar formato de plantillas predefinidas al formato del estado completo
-                normalized_fields = []
-                for f in fields_data:
-                    # Mapeo de tipos si es necesario
-                    ftype_map_inv = {"text": "Texto", "date": "Fecha", "checkbox": "Checkbox", 
-                                     "dropdown": "Dropdown", "radio": "Radio Buttons",
-                                     "multiline": "Multilínea", "signature": "Firma", 
-                                     "number": "Número", "section": "Sección"}
-                    
-                    raw_type = f.get("type", "text")
-                    disp_type = ftype_map_inv.get(raw_type, "Texto")
-                    
-                    raw_col = f.get("column", "full")
-                    disp_col = {"full": "Ancho Completo", "1": "Columna Izq", "2": "Columna Der"}.get(raw_col, "Ancho Completo")
-                    
-                    opts = f.get("options", [])
-                    disp_opts = ",".join(opts) if isinstance(opts, list) else str(opts)
-
-                    normalized_fields.append({
-                        "label": f.get("label", ""),
-                        "type": disp_type,
-                        "options": disp_opts,
-                        "column": disp_col,
-                        "logic": f.get("logic", "")
-                    })
-                
-                state = {
-                    "title": name.upper(),
-                    "fields": normalized_fields,
-                    "visual": self.config_visual.copy(),
-                    "images": [],
-                    "logo": None
-                }
-                self._apply_state(state)
-        else:
-            path = os.path.join("templates", f"{name}.json")
-            if os.path.exists(path):
-                data = load_custom_template(path)
-                state = {
-                    "title": name.upper(),
-                    "fields": data.get("fields", []),
-                    "visual": data.get("visual_config", self.config_visual.copy()),
-                    "images": data.get("extra_images", []),
-                    "logo": data.get("logo", None)
-                }
-                self._apply_state(state)
+        # Un único registro de deshacer para toda la plantilla (no uno por campo)
+        self._block_state_capture = True
+        try:
+            if is_predefined:
+                if name in _NORMALIZED_PREDEFINED:
+                    # _apply_state solo lee los campos, no hace falta copiarlos
+                    state = {
+                        "title": name.upper(),
+                        "fields": _NORMALIZED_PREDEFINED[name],
+                        "visual": self.config_visual.copy(),
+                        "images": [],
+                        "logo": None
+                    }
+                    self._apply_state(state)
+            else:
+                path = template_path(name)
+                if os.path.exists(path):
+                    data = load_custom_template_cached(path)
+                    state = {
+                        "title": name.upper(),
+                        "fields": data.get("fields", []),
+                        "visual": data.get("visual_config", self.config_visual.copy()),
+                        "images": data.get("extra_images", []),
+                        "logo": data.get("logo", None)
+                    }
+                    self._apply_state(state)
+        except Exception as e:
+            # Plantilla corrupta, formato sin su paquete opcional, error al aplicar...
+            messagebox.showerror("Error", f"No se pudo cargar la plantilla '{name}': {e}")
+        finally:
+            # Pase lo que pase, el deshacer debe seguir funcionando
+            self._block_state_capture = False
         
         self.update_preview()
 
     def refresh_templates_list(self):
-        """Refresca la lista de plantillas predefinidas y personalizadas en la UI."""
-        # Limpiar contenedor actual
-        for child in self.templates_scroll.winfo_children():
-            child.destroy()
-
-        # --- SECCIÓN: PREDEFINIDAS ---
-        ctk.CTkLabel(self.templates_scroll, text="PREDEFINIDAS", 
-                      font=ctk.CTkFont(size=10, weight="bold"), 
-                      text_color=("black", "white")).pack(pady=(5, 2))
-        
-        for name in PREDEFINED_TEMPLATES.keys():
-            btn = ctk.CTkButton(self.templates_scroll, text=name, height=24, font=ctk.CTkFont(size=11),
-                                fg_color=("#FFFFFF", "#0A0A0A"), border_width=1, border_color=("#D1D1D6", "#2C2C2E"),
-                                text_color=("black", "white"), hover_color=("#F5F5F7", "#161617"),
-                                command=lambda n=name: self.load_template_by_name(n, is_predefined=True))
-            btn.pack(fill="x", pady=1, padx=2)
+        """
+        Refresca la lista de plantillas predefinidas y personalizadas en la UI.
+        Solo crea las filas nuevas y destruye las de plantillas que ya no existen.
+        """
+        # --- SECCIÓN: PREDEFINIDAS (fijas, se construyen una sola vez) ---
+        if self._custom_tpl_header is None:
+            ctk.CTkLabel(self.templates_scroll, text="PREDEFINIDAS", 
+                          font=self._font_bold_10, 
+                          text_color=("black", "white")).pack(pady=(5, 2))
+            
+            for name in PREDEFINED_TEMPLATES.keys():
+                btn = ctk.CTkButton(self.templates_scroll, text=name, height=24, font=self._font_11,
+                                    fg_color=("#FFFFFF", "#0A0A0A"), border_width=1, border_color=("#D1D1D6", "#2C2C2E"),
+                                    text_color=("black", "white"), hover_color=("#F5F5F7", "#161617"),
+                                    command=lambda n=name: self.load_template_by_name(n, is_predefined=True))
+                btn.pack(fill="x", pady=1, padx=2)
+
+            self._custom_tpl_header = ctk.CTkLabel(self.templates_scroll, text="MIS PLANTILLAS", 
+                                                   font=self._font_bold_10, 
+                                                   text_color=("#8E8E93", "#8E8E93"))
 
         # --- SECCIÓN: MIS PLANTILLAS (Personalizadas) ---
-        customs = list_custom_templates()
+        customs = self._get_custom_templates()
+        for name in list(self._template_btn_cache):
+            if name not in customs:
+                self._template_btn_cache.pop(name).destroy()
+
+        # Re-empaquetar en orden (barato comparado con recrear los botones)
+        self._custom_tpl_header.pack_forget()
+        for f_row in self._template_btn_cache.values():
+            f_row.pack_forget()
         if customs:
-            ctk.CTkLabel(self.templates_scroll, text="MIS PLANTILLAS", 
-                          font=ctk.CTkFont(size=10, weight="bold"), 
-                          text_color=("#8E8E93", "#8E8E93")).pack(pady=(10, 2))
-            for name in customs:
-                f_row = ctk.CTkFrame(self.templates_scroll, fg_color="transparent")
-                f_row.pack(fill="x")
-                
-                # Botón de carga
-                btn = ctk.CTkButton(f_row, text=name, height=24, font=ctk.CTkFont(size=11),
-                                    fg_color=("#D1D1D6", "#2E4053"), text_color=("black", "white"),
-                                    command=lambda n=name: self.load_template_by_name(n, is_predefined=False))
-                btn.pack(side="left", fill="x", expand=True, pady=1, padx=(2, 0))
-                
-                # Botón de eliminación
-                del_tpl = ctk.CTkButton(f_row, text="🗑", width=20, height=24, fg_color="transparent", 
-                                        text_color="#E74C3C", hover_color=("#FFEBEE", "#3D1C1C"),
-                                        command=lambda n=name: self.delete_template_file(n))
-                del_tpl.pack(side="right", padx=2)
+            self._custom_tpl_header.pack(pady=(10, 2))
+        for name in customs:
+            f_row = self._template_btn_cache.get(name)
+            if f_row is None:
+                f_row = self._template_btn_cache[name] = self._build_template_row(name)
+            f_row.pack(fill="x")
+
+    def _get_custom_templates(self):
+        """Nombres de las plantillas personalizadas; se lee el directorio solo si la caché se invalidó."""
+        if self._custom_templates_cache is None:
+            self._custom_templates_cache = list_custom_templates()
+        return self._custom_templates_cache
+
+    def _build_template_row(self, name):
+        """Crea la fila (cargar + eliminar) de una plantilla personalizada."""
+        f_row = ctk.CTkFrame(self.templates_scroll, fg_color="transparent")
+        
+        # Botón de carga
+        btn = ctk.CTkButton(f_row, text=name, height=24, font=self._font_11,
+                            fg_color=("#D1D1D6", "#2E4053"), text_color=("black", "white"),
+                            command=lambda n=name: self.load_template_by_name(n, is_predefined=False))
+        btn.pack(side="left", fill="x", expand=True, pady=1, padx=(2, 0))
+        
+        # Botón de eliminación
+        del_tpl = ctk.CTkButton(f_row, text="🗑", width=20, height=24, fg_color="transparent", 
+                                text_color="#E74C3C", hover_color=("#FFEBEE", "#3D1C1C"),
+                                command=lambda n=name: self.delete_template_file(n))
+        del_tpl.pack(side="right", padx=2)
+        return f_row
 
     # =========================================================================
     # ESTADO Y DESHACER/REHACER
     # =========================================================================
 
+    def push_op(self, kind, index=None, old=None, new=None):
+        """Registra un cambio incremental (solo lo modificado) en la pila de 'Deshacer'."""
+        if self._block_state_capture: return
+        
+        now = time.monotonic()
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if last and last.kind == kind and now - last.ts < UNDO_COALESCE_S and self._can_coalesce(last, index, old, new):
+            # Continuación del mismo gesto: se amplía la entrada anterior en vez de apilar otra
+            last.new, last.ts = new, now
+            self.ops_journal.append(asdict(last))
+            return
+        op = Operation(kind, index, old, new, now)
+        self.undo_stack.append(op)
+        self.redo_stack.clear()
+        self.ops_journal.append(asdict(op))
+
+    def _can_coalesce(self, last, index, old, new):
+        """Indica si un nuevo movimiento continúa la operación `last` (mismo elemento)."""
+        if last.kind in ("field_move", "image_move"):
+            return last.index == index
+        if last.kind == "reorder":
+            return last.new == old  # La fila sigue desde donde quedó
+        if last.kind == "visual":
+            return last.old.keys() == old.keys() == {'logo_position'}
+        return False
+
     def save_state_to_undo(self):
         """
-        Captura el estado actual de los campos y lo guarda en la pila de 'Deshacer'.
-        Se dispara antes de cualquier cambio estructural significativo.
+        Captura el estado completo y lo guarda en la pila de 'Deshacer'.
+        Fallback para cambios sin operación específica (plantillas, reordenar, tecleo).
         """
         if self._block_state_capture: return
-        
-        state = self._capture_full_state()
-        self.undo_stack.append(state)
-        # Limitar tamaño de la pila
-        if len(self.undo_stack) > 30: self.undo_stack.pop(0)
-        self.redo_stack = []
+        self.push_op("snapshot", old=self._capture_full_state())
 
     def undo(self):
-        """Revierte al último estado guardado en la pila de deshacer."""
+        """Revierte la última operación de la pila de deshacer."""
         if not self.undo_stack: return
-        self._block_state_capture = True
-        
-        # Guardar el actual en redo antes de volver atrás
-        current = self._capture_full_state()
-        self.redo_stack.append(current)
-        
-        state = self.undo_stack.pop()
-        self._apply_state(state)
-        self._block_state_capture = False
+        op = self.undo_stack.pop()
+        self.redo_stack.append(self._apply_op(op, reverse=True))
         self.update_preview()
 
     def redo(self):
-        """Avanza al siguiente estado guardado en la pila de rehacer."""
+        """Vuelve a aplicar la última operación deshecha."""
         if not self.redo_stack: return
-        self._block_state_capture = True
-        
-        # Guardar el actual en undo antes de ir adelante
-        current = self._capture_full_state()
-        self.undo_stack.append(current)
-        
-        state = self.redo_stack.pop()
-        self._apply_state(state)
-        self._block_state_capture = False
+        op = self.redo_stack.pop()
+        self.undo_stack.append(self._apply_op(op, reverse=False))
         self.update_preview()
 
-    def _capture_full_state(self):
-        """Crea una instantánea serializable de toda la configuración actual."""
-        fields = []
-        for row in self.field_rows:
-            fields.append({
-                "label": row["entry"].get(),
-                "type": row["type"].get(),
-                "options": row["options"].get(),
-                "column": row["column"].get(),
-                "logic": row["logic"].get(),
-                "required": row["required"].get(),
-                "validation": row["validation"].get(),
-                "abs_pos": row.get("abs_pos") # Guardar posición absoluta
-            })
+    def _apply_op(self, op, reverse):
+        """
+        Aplica una operación (reverse=True para deshacerla) y devuelve el registro
+        que debe ir a la pila contraria.
+        """
+        self._block_state_capture = True
+        try:
+            if op.kind == "snapshot":
+                current = self._capture_full_state()
+                self._apply_state(op.old)
+                return Operation("snapshot", old=current)
+            
+            target = op.old if reverse else op.new
+            if op.kind in ("field_add", "field_del"):
+                if (op.kind == "field_add") == reverse:
+                    row = self.field_rows.pop(op.index)
+                    row["frame"].destroy()
+                    self._abs_pos_grid_dirty = True
+                    self.refresh_fields_layout()
+                else:
+                    self._restore_field(op.new if op.kind == "field_add" else op.old, index=op.index)
+            elif op.kind == "reorder":
+                src, dst = (op.new, op.old) if reverse else (op.old, op.new)
+                self.field_rows.insert(dst, self.field_rows.pop(src))
+                self._abs_pos_grid_dirty = True
+                self.refresh_fields_layout()
+            elif op.kind == "field_move":
+                abs_pos = self.field_rows[op.index]["abs_pos"]
+                abs_pos["x"], abs_pos["y"] = target
+                self._abs_pos_grid_dirty = True
+            elif op.kind == "image_move":
+                img_data = self.extra_images[op.index]
+                img_data['x'], img_data['y'] = target
+                self.refresh_images_ui()
+            elif op.kind in ("image_add", "image_del"):
+                if (op.kind == "image_add") == reverse:
+                    self.extra_images.pop(op.index)
+                else:
+                    img = op.new if op.kind == "image_add" else op.old
+                    self.extra_images.insert(op.index, img.copy())
+                self.refresh_images_ui()
+            elif op.kind == "visual":
+                self.config_visual.update(target)
+                self._sync_visual_controls()
+                if 'bg_pdf_path' in target:
+                    self._load_bg_images(target['bg_pdf_path'])
+            elif op.kind == "logo":
+                self.logo_path = target
+                self._sync_logo_label()
+            return op
+        finally:
+            self._block_state_capture = False
+
+    def _capture_field(self, row):
+        """Datos serializables de una fila de campo (valores tal como se muestran en la UI)."""
         return {
-            "title": self.title_entry.get(),
-            "fields": fields,
-            "visual": self.config_visual.copy(),
-            "images": [img.copy() for img in self.extra_images],
-            "logo": self.logo_path
+            "label": row["entry"].get(),
+            "type": row["type"].get(),
+            "options": row["options"].get(),
+            "column": row["column"].get(),
+            "logic": row["logic"].get(),
+            "required": row["required"].get(),
+            "validation": row["validation"].get(),
+            "abs_pos": row.get("abs_pos") # Guardar posición absoluta
         }
 
-    def _apply_state(self, state):
-        """Aplica una instantánea de estado a la interfaz de usuario."""
-        # Título
-        self.title_entry.delete(0, "end")
-        self.title_entry.insert(0, state["title"])
-        
-        # Limpiar campos actuales
-        for row in self.field_rows:
-            row["frame"].destroy()
-        self.field_rows = []
-        
-        # Reconstruir campos
-        for f in state["fields"]:
-            self.add_field_row(
-                default_text=f["label"], 
-                default_type=f["type"], 
-                default_options=f["options"], 
-                default_column=f["column"],
-                default_logic=f.get("logic", ""),
-                default_required=f.get("required", False),
-                default_validation=f.get("validation", "Ninguno"),
-                abs_pos=f.get("abs_pos")
-            )
-        
-        # Configuración Visual
-        self.config_visual = state["visual"].copy()
-        # Actualizar sliders/menús de la UI para que coincidan (Diseño)
+    def _restore_field(self, f, index=None, request_layout=True):
+        """Recrea una fila de campo a partir de los datos de `_capture_field`."""
+        return self.add_field_row(
+            default_text=f["label"], 
+            default_type=f["type"], 
+            index=index,
+            default_options=f["options"], 
+            default_column=f["column"],
+            default_logic=f.get("logic", ""),
+            default_required=f.get("required", False),
+            default_validation=f.get("validation", "Ninguno"),
+            abs_pos=f.get("abs_pos"),
+            request_layout=request_layout
+        )
+
+    def _sync_visual_controls(self):
+        """Actualiza sliders/menús de la UI para que coincidan con config_visual (Diseño)."""
         self.font_menu.set(self.config_visual['font_name'])
         self.spacing_slider.set(self.config_visual['spacing'])
         self.color_btn.configure(fg_color=self.config_visual['primary_color'])
-        
-        # Imágenes
-        self.extra_images = [img.copy() for img in state["images"]]
-        self.logo_path = state["logo"]
-        self.refresh_images_ui()
+
+    def _sync_logo_label(self):
         if self.logo_path:
             self.logo_preview_text.configure(text=os.path.basename(self.logo_path), text_color="#34C759")
         else:
             self.logo_preview_text.configure(text="Sin logo", text_color="gray")
 
-        # Actualizar Label de PDF de fondo y recargar imágenes
-        bg_path = self.config_visual.get('bg_pdf_path')
+    def _load_bg_images(self, bg_path):
+        """Recarga las imágenes y dimensiones del PDF de fondo (o las limpia si no hay)."""
+        self._invalidate_bg_cache()
         if bg_path and os.path.exists(bg_path):
-            self.bg_pdf_label.configure(text=f"Fondo: {os.path.basename(bg_path)}", text_color="#34C759")
-            self.bg_images = render_pdf_to_images(bg_path)
-            self.bg_pdf_dims = get_pdf_dimensions(bg_path)
+            self.bg_images = render_pdf_to_images_cached(bg_path)
+            self.bg_pdf_dims = get_pdf_dimensions_cached(bg_path)
         else:
-            self.bg_pdf_label.configure(text="Sin PDF de fondo", text_color="gray")
             self.bg_images = []
             self.bg_pdf_dims = (612.0, 792.0)
+        self._update_preview_geom()
+
+    def _capture_full_state(self):
+        """Crea una instantánea serializable de toda la configuración actual."""
+        fields = [self._capture_field(row) for row in self.field_rows]
+        return {
+            "title": self.title_entry.get(),
+            "fields": fields,
+            "visual": self.config_visual.copy(),
+            "images": [img.copy() for img in self.extra_images],
+            "logo": self.logo_path
+        }
+
+    def _apply_state(self, state):
+        """
+        Aplica una instantánea de estado a la interfaz de usuario.
+        Solo toca lo que difiere del estado actual: las filas de campo iguales se conservan.
+        """
+        current = self._capture_full_state()
+        # Sin renders intermedios mientras se reconstruye la UI: el llamador renderiza al final
+        self._batching += 1
+        try:
+            # Título
+            if state["title"] != current["title"]:
+                self.title_entry.delete(0, "end")
+                self.title_entry.insert(0, state["title"])
+        
+            # Campos: reconstruir solo los índices que cambian
+            cur_fields, new_fields = current["fields"], state["fields"]
+            if cur_fields != new_fields:
+                for row in self.field_rows[len(new_fields):]:
+                    row["frame"].destroy()
+                del self.field_rows[len(new_fields):]
+                self._abs_pos_grid_dirty = True
+                for i, f in enumerate(new_fields):
+                    if i < len(self.field_rows):
+                        if cur_fields[i] == f: continue
+                        self.field_rows.pop(i)["frame"].destroy()
+                    self._restore_field(f, index=i, request_layout=False)
+                self.refresh_fields_layout()
+        
+            # Configuración Visual
+            if state["visual"] != current["visual"]:
+                self.config_visual = state["visual"].copy()
+                self._sync_visual_controls()
+        
+            # Imágenes
+            if state["images"] != current["images"]:
+                self.extra_images = [img.copy() for img in state["images"]]
+                self.refresh_images_ui()
+            if state["logo"] != current["logo"]:
+                self.logo_path = state["logo"]
+                self._sync_logo_label()
+
+            # Actualizar Label de PDF de fondo y recargar imágenes (solo si cambió el PDF)
+            bg_path = self.config_visual.get('bg_pdf_path')
+            if bg_path != current["visual"].get('bg_pdf_path'):
+                if hasattr(self, 'bg_pdf_label'):
+                    if bg_path and os.path.exists(bg_path):
+                        self.bg_pdf_label.configure(text=f"Fondo: {os.path.basename(bg_path)}", text_color="#34C759")
+                    else:
+                        self.bg_pdf_label.configure(text="Sin PDF de fondo", text_color="gray")
+                self._load_bg_images(bg_path)
+        finally:
+            self._batching -= 1
 
     # =========================================================================
     # GESTIÓN DE CAMPOS DEL EDITOR
@@ -712,20 +962,28 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
     def choose_color(self):
         """Abre un selector de color para cambiar el tono primario del PDF."""
-        self.save_state_to_undo()
         # Usar el selector de colores nativo (Paleta)
         color_code = colorchooser.askcolor(title="Seleccionar Color Primario", initialcolor=self.config_visual['primary_color'])
         if color_code[1]: # color_code[1] es el valor hex
+            self.push_op("visual", old={'primary_color': self.config_visual['primary_color']},
+                         new={'primary_color': color_code[1]})
             self.config_visual['primary_color'] = color_code[1]
             # Actualizar el botón con el nuevo color (fg_color y hover_color)
             self.color_btn.configure(fg_color=color_code[1], hover_color=color_code[1])
-            # Forzar actualización inmediata de la vista previa (sin debouncing)
-            if self.after_id:
-                self.after_cancel(self.after_id)
-                self.after_id = None
+            # Forzar actualización inmediata (update_preview cancela el debouncing pendiente)
             self.update_preview()
 
     def change_visual_config(self, *args):
+        """
+        El estado se actualiza en cada evento; el render solo tras VISUAL_CONFIG_DEBOUNCE_MS
+        sin cambios (un arrastre del slider de espaciado produce un único render).
+        """
+        self._apply_visual_config_state()
+        if self._visual_after_id:
+            self.after_cancel(self._visual_after_id)
+        self._visual_after_id = self.after(VISUAL_CONFIG_DEBOUNCE_MS, self._render_visual_config)
+
+    def _apply_visual_config_state(self):
         self.config_visual['font_name'] = self.font_menu.get()
         self.config_visual['spacing'] = int(self.spacing_slider.get())
         if hasattr(self, 'align_menu'):
@@ -734,10 +992,12 @@ class PDFGeneratorApp(ctk.CTkFrame):
             self.config_visual['font_size_title'] = int(self.title_size_var.get())
         if hasattr(self, 'label_size_var'):
             self.config_visual['font_size_label'] = int(self.label_size_var.get())
+
+    def _render_visual_config(self):
+        self._visual_after_id = None
         self.update_preview()
 
     def add_extra_image(self):
-        self.save_state_to_undo()
         path = filedialog.askopenfilename(filetypes=[("Imágenes", "*.png;*.jpg;*.jpeg")])
         if path:
             # Datos por defecto: abajo a la derecha, tamaño medio
@@ -749,55 +1009,72 @@ class PDFGeneratorApp(ctk.CTkFrame):
                 'h': 50
             }
             self.extra_images.append(new_img)
+            self.push_op("image_add", index=len(self.extra_images) - 1, new=new_img.copy())
             self.refresh_images_ui()
             self.update_preview()
 
     def refresh_images_ui(self):
-        for child in self.images_scroll.winfo_children():
-            child.destroy()
-        
-        for idx, img_data in enumerate(self.extra_images):
-            card_bg = ("#FFFFFF", "#131313")
-            card_border = ("#D1D1D6", "#2C2C2E")
-            frame = ctk.CTkFrame(self.images_scroll, corner_radius=12, border_width=1, 
-                                 border_color=card_border, fg_color=card_bg)
-            frame.pack(fill="x", pady=6, padx=5)
-            
-            name = os.path.basename(img_data['path'])
-            ctk.CTkLabel(frame, text=name, font=ctk.CTkFont(size=10, weight="bold"), text_color=("black", "white")).pack(pady=4)
-            
-            # Estilo sutil para sliders y labels (Adaptativo)
-            label_style = {"font": ctk.CTkFont(size=9), "text_color": ("#8E8E93", "#8E8E93")}
-            
-            ctk.CTkLabel(frame, text="Posición Horizontal (X):", **label_style).pack()
-            sx = ctk.CTkSlider(frame, from_=0, to=600, number_of_steps=120, 
-                               command=lambda v, i=idx: self.update_img_val(i, 'x', v))
-            sx.set(img_data['x'])
-            sx.pack(padx=15, fill="x", pady=(0, 5))
-            
-            ctk.CTkLabel(frame, text="Posición Vertical (Y):", **label_style).pack()
-            sy = ctk.CTkSlider(frame, from_=0, to=800, number_of_steps=160, 
-                               command=lambda v, i=idx: self.update_img_val(i, 'y', v))
-            sy.set(img_data['y'])
-            sy.pack(padx=15, fill="x", pady=(0, 5))
-
-            ctk.CTkLabel(frame, text="Ancho (W):", **label_style).pack()
-            sw = ctk.CTkSlider(frame, from_=20, to=300, number_of_steps=28, 
-                               command=lambda v, i=idx: self.update_img_val(i, 'w', v))
-            sw.set(img_data['w'])
-            sw.pack(padx=15, fill="x", pady=(0, 10))
-            
-            del_btn = ctk.CTkButton(frame, text="✕", height=24, fg_color="transparent", 
-                                    text_color="#FF3B30", hover_color=("#FFEBEE", "#3D1C1C"),
-                                    font=ctk.CTkFont(weight="bold"))
-            del_btn.configure(command=lambda i=idx: self.remove_extra_image(i)) # Configure after creation
-            del_btn.pack(pady=(0, 10), padx=15, fill="x")
+        """
+        Sincroniza las tarjetas de imágenes con self.extra_images reutilizando las ya creadas:
+        la tarjeta de la posición idx siempre controla extra_images[idx], así que basta con
+        actualizar nombre y sliders. Solo se crean tarjetas nuevas si la lista crece.
+        """
+        pool = self._image_widget_pool
+        while len(pool) < len(self.extra_images):
+            pool.append(self._build_image_card(len(pool)))
+        
+        for idx, card in enumerate(pool):
+            if idx >= len(self.extra_images):
+                card['frame'].pack_forget()
+                continue
+            img_data = self.extra_images[idx]
+            card['name'].configure(text=os.path.basename(img_data['path']))
+            card['x'].set(img_data['x'])
+            card['y'].set(img_data['y'])
+            card['w'].set(img_data['w'])
+            if not card['frame'].winfo_manager():  # Aún no empaquetada (nueva u oculta)
+                card['frame'].pack(fill="x", pady=6, padx=5)
+
+    def _build_image_card(self, idx):
+        """Crea la tarjeta de controles (posición, ancho, borrar) para la imagen en la posición idx."""
+        card_bg = ("#FFFFFF", "#131313")
+        card_border = ("#D1D1D6", "#2C2C2E")
+        frame = ctk.CTkFrame(self.images_scroll, corner_radius=12, border_width=1, 
+                             border_color=card_border, fg_color=card_bg)
+        
+        name_label = ctk.CTkLabel(frame, text="", font=self._font_bold_10, text_color=("black", "white"))
+        name_label.pack(pady=4)
+        
+        # Estilo sutil para sliders y labels (Adaptativo)
+        label_style = {"font": self._font_9, "text_color": ("#8E8E93", "#8E8E93")}
+        
+        ctk.CTkLabel(frame, text="Posición Horizontal (X):", **label_style).pack()
+        sx = ctk.CTkSlider(frame, from_=0, to=600, number_of_steps=120, 
+                           command=partial(self.update_img_val, idx, 'x'))
+        sx.pack(padx=15, fill="x", pady=(0, 5))
+        
+        ctk.CTkLabel(frame, text="Posición Vertical (Y):", **label_style).pack()
+        sy = ctk.CTkSlider(frame, from_=0, to=800, number_of_steps=160, 
+                           command=partial(self.update_img_val, idx, 'y'))
+        sy.pack(padx=15, fill="x", pady=(0, 5))
+
+        ctk.CTkLabel(frame, text="Ancho (W):", **label_style).pack()
+        sw = ctk.CTkSlider(frame, from_=20, to=300, number_of_steps=28, 
+                           command=partial(self.update_img_val, idx, 'w'))
+        sw.pack(padx=15, fill="x", pady=(0, 10))
+        
+        del_btn = ctk.CTkButton(frame, text="✕", height=24, fg_color="transparent", 
+                                text_color="#FF3B30", hover_color=("#FFEBEE", "#3D1C1C"),
+                                font=self._font_bold,
+                                command=partial(self.remove_extra_image, idx))
+        del_btn.pack(pady=(0, 10), padx=15, fill="x")
+        return {'frame': frame, 'name': name_label, 'x': sx, 'y': sy, 'w': sw}
 
     def update_img_val(self, idx, key, value):
         self.extra_images[idx][key] = int(value)
         # Sincronizar alto proporcionalmente si es ancho (opcional, pero para no deformar)
         # if key == 'w': self.extra_images[idx]['h'] = int(value * 0.5) 
-        self.request_preview_update()
+        self._throttled_preview()
 
     def adjust_img(self, idx, key, delta):
         # Mantenemos este para compatibilidad si hiciera falta, pero usamos update_img_val
@@ -805,8 +1082,8 @@ class PDFGeneratorApp(ctk.CTkFrame):
         self.update_preview()
 
     def remove_extra_image(self, idx):
-        self.save_state_to_undo()
-        self.extra_images.pop(idx)
+        removed = self.extra_images.pop(idx)
+        self.push_op("image_del", index=idx, old=removed)
         self.refresh_images_ui()
         self.update_preview()
 
@@ -819,39 +1096,55 @@ class PDFGeneratorApp(ctk.CTkFrame):
             campos_to_save = []
             for row in self.field_rows:
                 raw_type = row["type"].get()
-                ftype = {
-                    "Texto": "text", "Fecha": "date", "Checkbox": "checkbox",
-                    "Dropdown": "dropdown", "Radio Buttons": "radio",
-                    "Multilínea": "multiline", "Firma": "signature", "Número": "number",
-                    "Sección": "section"
-                }.get(raw_type, "text")
+                ftype = TYPE_MAP.get(raw_type, "text")
                 
                 raw_col = row["column"].get()
-                fcol = {"Ancho Completo": "full", "1": "Columna Izq", "2": "Columna Der"}.get(raw_col, "full")
+                fcol = COLUMN_MAP.get(raw_col, "full")
                 
-                opts = [o.strip() for o in row["options"].get().split(",") if o.strip()]
+                opts = _row_options(row)
                 campos_to_save.append({
                     "label": row["entry"].get(), 
                     "type": ftype, 
                     "options": opts,
                     "column": fcol,
-                    "logic": row.get("logic", ctk.StringVar()).get()
+                    "logic": row["logic"].get()
                 })
             
-            save_template(name, campos_to_save, self.config_visual, self.extra_images)
+            try:
+                save_template(name, campos_to_save, self.config_visual, self.extra_images)
+            except OSError as e:
+                self._custom_templates_cache = None
+                messagebox.showerror("Error", f"No se pudo guardar la plantilla: {e}")
+                return
+            customs = self._get_custom_templates()
+            if name not in customs:
+                customs.append(name)
             messagebox.showinfo("Éxito", f"Plantilla '{name}' guardada correctamente.")
             self.refresh_templates_list()
 
     def delete_template_file(self, name):
         if messagebox.askyesno("Confirmar", f"¿Borrar la plantilla '{name}'?"):
-            os.remove(os.path.join("templates", f"{name}.json"))
+            # Quitarla de la lista al instante; el borrado en disco se hace cuando la UI esté libre
+            customs = self._get_custom_templates()
+            if name in customs:
+                customs.remove(name)
+            self.refresh_templates_list()
+            self.after_idle(self._remove_template_file, name)
+
+    def _remove_template_file(self, name):
+        try:
+            os.remove(template_path(name))
+        except OSError as e:
+            # Volver a leer el directorio para reflejar el estado real
+            self._custom_templates_cache = None
             self.refresh_templates_list()
+            messagebox.showerror("Error", f"No se pudo borrar la plantilla: {e}")
 
     def select_logo(self):
         """ Selecciona una imagen para usar como logo principal. """
         path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png *.jpg *.jpeg *.bmp")])
         if path:
-            self.save_state_to_undo()
+            self.push_op("logo", old=self.logo_path, new=path)
             self.logo_path = path
             self.logo_preview_text.configure(text=os.path.basename(path), text_color="#34C759")
             self.update_preview()
@@ -862,14 +1155,17 @@ class PDFGeneratorApp(ctk.CTkFrame):
             path = filedialog.askopenfilename(filetypes=[("PDF files", "*.pdf")])
         
         if path:
-            self.save_state_to_undo()
+            self.push_op("visual", old={'bg_pdf_path': self.config_visual.get('bg_pdf_path')},
+                         new={'bg_pdf_path': path})
             self.config_visual['bg_pdf_path'] = path
             
             try:
                 # Obtener dimensiones reales del PDF
-                self.bg_pdf_dims = get_pdf_dimensions(path)
+                self.bg_pdf_dims = get_pdf_dimensions_cached(path)
                 # Renderizar páginas para previsualización (72 DPI base)
-                self.bg_images = render_pdf_to_images(path, dpi=72)
+                self.bg_images = render_pdf_to_images_cached(path, dpi=72)
+                self._invalidate_bg_cache()
+                self._update_preview_geom()
                 self.update_preview()
                 return True
             except Exception as e:
@@ -884,9 +1180,6 @@ class PDFGeneratorApp(ctk.CTkFrame):
         show_add_field_dialog(self)
 
     def add_field_row(self, default_text="", default_type="Texto", index=None, default_options="", default_column="Ancho Completo", default_logic="", default_required=False, default_validation="Ninguno", request_layout=True, request_preview=True, **kwargs):
-        if request_preview:
-            self.save_state_to_undo()
-        
         # El card del campo (Premium Gadget Look Adaptativo - High Contrast)
         row_bg = ("#FFFFFF", "#1A1B1C") 
         row_border = ("#D1D1D6", "#2C2C2E")
@@ -895,13 +1188,13 @@ class PDFGeneratorApp(ctk.CTkFrame):
         row_frame.grid_columnconfigure(2, weight=1) 
         
         # Efecto Hover Sutil (Apple Highlight) - Solo si se necesita preview para evitar overhead
+        # (vinculación de clase "FieldRow" registrada una sola vez en _setup_keybindings)
         if request_preview:
-            row_frame.bind("<Enter>", lambda e: row_frame.configure(border_color="#007AFF", border_width=2))
-            row_frame.bind("<Leave>", lambda e: row_frame.configure(border_color=row_border, border_width=1))
+            row_frame.bindtags(("FieldRow",) + row_frame.bindtags())
 
         # --- Col 0: Index y Handle de Drag (Look Apple/Adobe) ---
         idx_label = ctk.CTkLabel(row_frame, text=f"⁝⁝ {len(self.field_rows)+1}", 
-                                  font=ctk.CTkFont(size=12, weight="bold"), 
+                                  font=self._font_bold_12, 
                                   text_color=("#8E8E93", "#8E8E93"),
                                   cursor="fleur")
         idx_label.grid(row=0, column=0, padx=(15, 5))
@@ -909,7 +1202,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
         # --- Col 1: Info Principal (Look minimalista) ---
         entry = ctk.CTkEntry(row_frame, placeholder_text="Field Name...", border_width=0, 
-                             fg_color="transparent", font=ctk.CTkFont(size=14, weight="bold"),
+                             fg_color="transparent", font=self._font_bold_14,
                              text_color=("black", "white"), placeholder_text_color=("#8E8E93", "#8E8E93"))
         if default_text: entry.insert(0, default_text)
         entry.grid(row=0, column=1, padx=10, sticky="ew")
@@ -961,6 +1254,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
         del_btn.grid(row=0, column=6, padx=(2, 15))
 
         def on_type_change(val):
+            row_data["is_trigger"] = val in TRIGGER_TYPES  # Cacheado para el diálogo de lógica
             options_entry.grid_forget()
             col_menu.grid(row=0, column=3, padx=5)
             logic_btn.grid(row=0, column=5, padx=5)
@@ -971,11 +1265,11 @@ class PDFGeneratorApp(ctk.CTkFrame):
                 logic_btn.grid_forget()
                 collapse_btn.grid(row=0, column=0, padx=(5, 0)) # Mover a la izquierda del idx
                 idx_label.grid(row=0, column=1, padx=(5, 5))
-                entry.configure(placeholder_text="CABECERA DE SECCIÓN", font=ctk.CTkFont(size=14, weight="bold"))
+                entry.configure(placeholder_text="CABECERA DE SECCIÓN", font=self._font_bold_14)
                 row_frame.configure(fg_color=("#E5E5EA", "#131313")) 
             else:
                 idx_label.grid(row=0, column=0, padx=(15, 5))
-                entry.configure(placeholder_text="Nombre del campo...", font=ctk.CTkFont(size=14, weight="bold"))
+                entry.configure(placeholder_text="Nombre del campo...", font=self._font_bold_14)
                 row_frame.configure(fg_color=row_bg)
                 if val in ["Dropdown", "Radio Buttons"]:
                     options_entry.grid(row=0, column=4, padx=5)
@@ -983,69 +1277,34 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
         type_menu.configure(command=on_type_change)
         
-        logic_var = ctk.StringVar(value=default_logic)
-        required_var = ctk.BooleanVar(value=default_required)
-        validation_var = ctk.StringVar(value=default_validation)
+        # Sin widget asociado: valores Python en lugar de variables Tk
+        logic_var = FieldValue(default_logic)
+        required_var = FieldValue(default_required)
+        validation_var = FieldValue(default_validation)
         
         row_data = {
             "frame": row_frame, "entry": entry, "type": type_var, "options": options_entry,
             "column": col_var, "logic": logic_var, "required": required_var, "validation": validation_var,
             "logic_btn": logic_btn, "idx_label": idx_label, "collapse_btn": collapse_btn,
-            "abs_pos": kwargs.get("abs_pos")
+            # Copia propia: arrastre, deshacer y spinboxes la modifican in situ
+            "abs_pos": dict(kwargs["abs_pos"]) if kwargs.get("abs_pos") else None
         }
         
         if row_data["abs_pos"]:
             # Pequeño indicador visual de que es posición absoluta
-            abs_indicator = ctk.CTkLabel(row_frame, text="📍 ABS", font=ctk.CTkFont(size=9, weight="bold"), text_color="#007AFF")
+            abs_indicator = ctk.CTkLabel(row_frame, text="📍 ABS", font=self._font_bold_9, text_color="#007AFF")
             abs_indicator.grid(row=0, column=7, padx=(0, 5))
             
-            # Crear frame para controles de posición (segunda fila)
+            # Los controles X/Y/W/H solo existen en filas con posición absoluta
             pos_frame = ctk.CTkFrame(row_frame, fg_color="transparent")
             pos_frame.grid(row=1, column=0, columnspan=8, sticky="ew", padx=10, pady=(5, 5))
-            
-            # Variables para X, Y, W, H
-            abs_x_var = ctk.IntVar(value=int(row_data["abs_pos"]["x"]))
-            abs_y_var = ctk.IntVar(value=int(row_data["abs_pos"]["y"]))
-            abs_w_var = ctk.IntVar(value=int(row_data["abs_pos"]["w"]))
-            abs_h_var = ctk.IntVar(value=int(row_data["abs_pos"]["h"]))
-            
-            # Función para actualizar abs_pos cuando cambian los valores
-            def update_abs_pos():
-                row_data["abs_pos"]["x"] = abs_x_var.get()
-                row_data["abs_pos"]["y"] = abs_y_var.get()
-                row_data["abs_pos"]["w"] = abs_w_var.get()
-                row_data["abs_pos"]["h"] = abs_h_var.get()
-                self.request_preview_update()
-            
-            # Controles X, Y, W, H
-            ctk.CTkLabel(pos_frame, text="X:", font=ctk.CTkFont(size=10)).grid(row=0, column=0, padx=(0, 2))
-            x_spin = ctk.CTkEntry(pos_frame, textvariable=abs_x_var, width=60, font=ctk.CTkFont(size=10))
-            x_spin.grid(row=0, column=1, padx=2)
-            x_spin.bind("<FocusOut>", lambda e: update_abs_pos())
-            x_spin.bind("<Return>", lambda e: update_abs_pos())
-            
-            ctk.CTkLabel(pos_frame, text="Y:", font=ctk.CTkFont(size=10)).grid(row=0, column=2, padx=(5, 2))
-            y_spin = ctk.CTkEntry(pos_frame, textvariable=abs_y_var, width=60, font=ctk.CTkFont(size=10))
-            y_spin.grid(row=0, column=3, padx=2)
-            y_spin.bind("<FocusOut>", lambda e: update_abs_pos())
-            y_spin.bind("<Return>", lambda e: update_abs_pos())
-            
-            ctk.CTkLabel(pos_frame, text="W:", font=ctk.CTkFont(size=10)).grid(row=0, column=4, padx=(5, 2))
-            w_spin = ctk.CTkEntry(pos_frame, textvariable=abs_w_var, width=60, font=ctk.CTkFont(size=10))
-            w_spin.grid(row=0, column=5, padx=2)
-            w_spin.bind("<FocusOut>", lambda e: update_abs_pos())
-            w_spin.bind("<Return>", lambda e: update_abs_pos())
-            
-            ctk.CTkLabel(pos_frame, text="H:", font=ctk.CTkFont(size=10)).grid(row=0, column=6, padx=(5, 2))
-            h_spin = ctk.CTkEntry(pos_frame, textvariable=abs_h_var, width=60, font=ctk.CTkFont(size=10))
-            h_spin.grid(row=0, column=7, padx=2)
-            h_spin.bind("<FocusOut>", lambda e: update_abs_pos())
-            h_spin.bind("<Return>", lambda e: update_abs_pos())
+            self._create_xywh_controls(row_data, pos_frame)
 
-        # Bindings para Drag & Drop (Captura correcta de row_data)
-        idx_label.bind("<Button-1>", lambda e, rd=row_data: self._on_drag_start(e, rd))
-        idx_label.bind("<B1-Motion>", lambda e, rd=row_data: self._on_drag_motion(e, rd))
-        idx_label.bind("<ButtonRelease-1>", lambda e, rd=row_data: self._on_drag_stop(e, rd))
+        # Bindings para Drag & Drop: los handlers recuperan row_data desde el widget (sin closures por fila)
+        row_frame._row_data = row_data
+        idx_label.bind("<Button-1>", self._on_drag_start_ev)
+        idx_label.bind("<B1-Motion>", self._on_drag_motion_ev)
+        idx_label.bind("<ButtonRelease-1>", self._on_drag_stop_ev)
 
         on_type_change(default_type)
 
@@ -1053,6 +1312,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
             self.field_rows.append(row_data)
         else:
             self.field_rows.insert(index, row_data)
+        self._abs_pos_grid_dirty = True  # Los índices de la rejilla pueden haber cambiado
         
         # Estado inicial de la lógica (Apple Blue si hay lógica)
         if logic_var.get():
@@ -1061,9 +1321,58 @@ class PDFGeneratorApp(ctk.CTkFrame):
         if request_layout:
             self.refresh_fields_layout()
         if request_preview:
-            self.request_preview_update()
+            self.push_op("field_add", index=self.field_rows.index(row_data), new=self._capture_field(row_data))
+            self.request_preview_update(capture=False)
         return row_data
 
+    def _create_xywh_controls(self, row_data, pos_frame):
+        """Crea en pos_frame los controles X, Y, W, H de un campo con abs_pos."""
+        # Entradas X, Y, W, H (se leen directamente, sin IntVar)
+        abs_entries = {}
+        
+        # Función para actualizar abs_pos cuando cambian los valores
+        def update_abs_pos(event=None):
+            for key, spin in abs_entries.items():
+                try:
+                    row_data["abs_pos"][key] = int(float(spin.get()))
+                except ValueError:
+                    pass  # Valor no numérico: se conserva el anterior
+            self._abs_pos_grid_dirty = True
+            self.request_preview_update()
+        
+        # Controles X, Y, W, H
+        ctk.CTkLabel(pos_frame, text="X:", font=self._font_10).grid(row=0, column=0, padx=(0, 2))
+        x_spin = ctk.CTkEntry(pos_frame, width=60, font=self._font_10)
+        x_spin.insert(0, str(int(row_data["abs_pos"]["x"])))
+        abs_entries["x"] = x_spin
+        x_spin.grid(row=0, column=1, padx=2)
+        x_spin.bind("<FocusOut>", update_abs_pos)
+        x_spin.bind("<Return>", update_abs_pos)
+        
+        ctk.CTkLabel(pos_frame, text="Y:", font=self._font_10).grid(row=0, column=2, padx=(5, 2))
+        y_spin = ctk.CTkEntry(pos_frame, width=60, font=self._font_10)
+        y_spin.insert(0, str(int(row_data["abs_pos"]["y"])))
+        abs_entries["y"] = y_spin
+        y_spin.grid(row=0, column=3, padx=2)
+        y_spin.bind("<FocusOut>", update_abs_pos)
+        y_spin.bind("<Return>", update_abs_pos)
+        
+        ctk.CTkLabel(pos_frame, text="W:", font=self._font_10).grid(row=0, column=4, padx=(5, 2))
+        w_spin = ctk.CTkEntry(pos_frame, width=60, font=self._font_10)
+        w_spin.insert(0, str(int(row_data["abs_pos"]["w"])))
+        abs_entries["w"] = w_spin
+        w_spin.grid(row=0, column=5, padx=2)
+        w_spin.bind("<FocusOut>", update_abs_pos)
+        w_spin.bind("<Return>", update_abs_pos)
+        
+        ctk.CTkLabel(pos_frame, text="H:", font=self._font_10).grid(row=0, column=6, padx=(5, 2))
+        h_spin = ctk.CTkEntry(pos_frame, width=60, font=self._font_10)
+        h_spin.insert(0, str(int(row_data["abs_pos"]["h"])))
+        abs_entries["h"] = h_spin
+        h_spin.grid(row=0, column=7, padx=2)
+        h_spin.bind("<FocusOut>", update_abs_pos)
+        h_spin.bind("<Return>", update_abs_pos)
+
     def toggle_section(self, section_row):
         """Alterna el estado de colapso de una sección."""
         frame_id = section_row["frame"]
@@ -1076,11 +1385,30 @@ class PDFGeneratorApp(ctk.CTkFrame):
         
         self.refresh_fields_layout()
 
+    @staticmethod
+    def _row_of(widget):
+        """Sube por los contenedores del widget hasta la tarjeta del campo y devuelve su row_data."""
+        while widget is not None and not hasattr(widget, "_row_data"):
+            widget = widget.master
+        return widget._row_data if widget is not None else None
+
+    def _on_drag_start_ev(self, event):
+        row_data = self._row_of(event.widget)
+        if row_data: self._on_drag_start(event, row_data)
+
+    def _on_drag_motion_ev(self, event):
+        row_data = self._row_of(event.widget)
+        if row_data: self._on_drag_motion(event, row_data)
+
+    def _on_drag_stop_ev(self, event):
+        self._on_drag_stop(event, self._row_of(event.widget))
+
     def _on_drag_start(self, event, row_data):
         """Inicia el proceso de arrastre de una tarjeta de campo."""
         self._drag_data["widget"] = row_data["frame"]
         self._drag_data["y"] = event.y_root
         self._drag_data["index"] = self.field_rows.index(row_data)
+        self._drag_data["cur"] = self._drag_data["index"]  # Posición actual durante el arrastre
         
         # Estilo de 'Arrastrando'
         row_data["frame"].configure(border_color="#007AFF", border_width=2)
@@ -1088,23 +1416,31 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
     def _on_drag_motion(self, event, row_data):
         """Calcula el reordenamiento en tiempo real mientras se arrastra."""
-        if not self._drag_data["widget"] or row_data not in self.field_rows: return
+        if not self._drag_data["widget"]: return
         
         # Detectar el widget debajo del ratón
         y_now = event.y_root
         delta = y_now - self._drag_data["y"]
         
         # Umbral sutil para el intercambio (Apple-style smoothness)
-        if abs(delta) > 30:
-            idx = self.field_rows.index(row_data)
-            direction = 1 if delta > 0 else -1
-            new_idx = idx + direction
-            
-            if 0 <= new_idx < len(self.field_rows):
-                # Intercambio 'Vivo'
-                self.field_rows[idx], self.field_rows[new_idx] = self.field_rows[new_idx], self.field_rows[idx]
-                self.refresh_fields_layout()
-                self._drag_data["y"] = y_now 
+        if abs(delta) <= 30: return
+        
+        # Índice actual sin recorrer la lista (comparar dicts de fila con == es caro)
+        idx = self._drag_data.get("cur")
+        if idx is None or idx >= len(self.field_rows) or self.field_rows[idx] is not row_data:
+            idx = next((i for i, r in enumerate(self.field_rows) if r is row_data), None)
+            if idx is None: return
+        new_idx = idx + (1 if delta > 0 else -1)
+        if not 0 <= new_idx < len(self.field_rows): return  # Ya está en un extremo
+        
+        # Intercambio 'Vivo' (el re-empaquetado se agrupa a un frame; si el orden visible
+        # no cambia, p. ej. con una fila oculta en una sección colapsada, no se re-empaqueta nada)
+        self.field_rows[idx], self.field_rows[new_idx] = self.field_rows[new_idx], self.field_rows[idx]
+        self._drag_data["cur"] = new_idx
+        self._abs_pos_grid_dirty = True
+        if not self._layout_after_id:
+            self._layout_after_id = self.after(DRAG_FRAME_MS, self._flush_layout_update)
+        self._drag_data["y"] = y_now
 
     def _on_drag_stop(self, event, row_data):
         """Finaliza el arrastre y guarda el estado para Deshacer."""
@@ -1116,37 +1452,63 @@ class PDFGeneratorApp(ctk.CTkFrame):
         
         self._drag_data["widget"] = None
         self.config(cursor="")
-        
-        self.save_state_to_undo()
-        self.update_preview()
+        if self._layout_after_id:
+            self.after_cancel(self._layout_after_id)
+            self._flush_layout_update()
+        
+        # Registrar solo el movimiento (origen -> destino) de la fila; un clic sin mover no cambia nada
+        if row_data in self.field_rows:
+            old_idx, new_idx = self._drag_data["index"], self.field_rows.index(row_data)
+            if old_idx is not None and old_idx != new_idx:
+                self.push_op("reorder", old=old_idx, new=new_idx)
+                self.update_preview()
+
+    def _flush_layout_update(self):
+        self._layout_after_id = None
+        self.refresh_fields_layout()
 
     def reindex_fields(self):
-        """Actualiza los números visuales de los campos tras un reordenamiento."""
+        """Actualiza los números visuales de los campos tras un reordenamiento (solo los que cambian)."""
         for i, row in enumerate(self.field_rows):
-            row["idx_label"].configure(text=f"⁝⁝ {i+1}")
+            if row.get("shown_idx") != i:
+                row["idx_label"].configure(text=f"⁝⁝ {i+1}")
+                row["shown_idx"] = i
 
 
     def show_field_settings(self, current_row):
         show_field_settings(self, current_row)
 
     def refresh_fields_layout(self):
-        """Actualiza el empaquetado de todos los campos respetando secciones colapsadas."""
-        for row in self.field_rows:
-            row["frame"].pack_forget()
-            
+        """
+        Actualiza el empaquetado de todos los campos respetando secciones colapsadas.
+        Solo re-empaqueta a partir de la primera fila cuyo orden/visibilidad cambió.
+        """
+        visible = []
         current_visible = True
         for row in self.field_rows:
             is_section = row["type"].get() == "Sección"
             
             if is_section:
                 # Las secciones siempre se muestran
-                row["frame"].pack(fill="x", pady=6, padx=15)
+                visible.append(row["frame"])
                 # El estado de visibilidad para los siguientes hijos depende de si esta sección está colapsada
                 current_visible = row["frame"] not in self.collapsed_sections
-            else:
+            elif current_visible:
                 # Los campos normales dependen del estado de la sección anterior
-                if current_visible:
-                    row["frame"].pack(fill="x", pady=6, padx=15)
+                visible.append(row["frame"])
+
+        previous = self._packed_frames
+        if visible != previous:
+            # El prefijo común ya está empaquetado en su sitio; pack() añade al final
+            keep = 0
+            for old, new in zip(previous, visible):
+                if old is not new: break
+                keep += 1
+            for frame in previous[keep:]:
+                if frame.winfo_exists(): frame.pack_forget()
+            for frame in visible[keep:]:
+                frame.pack(fill="x", pady=6, padx=15)
+            self._packed_frames = visible
                     
         self.reindex_fields()
 
@@ -1154,61 +1516,178 @@ class PDFGeneratorApp(ctk.CTkFrame):
         """Elimina todos los campos del generador."""
         if request_preview:
             self.save_state_to_undo()
-        for row in self.field_rows:
-            row["frame"].destroy()
+        if self.field_rows:
+            self._recreate_fields_scroll()
         self.field_rows.clear()
+        self.collapsed_sections.clear()
+        self._abs_pos_grid_dirty = True
         if request_layout:
             self.refresh_fields_layout()
         if request_preview:
             self.update_preview()
 
     def remove_field_row(self, frame):
-        self.save_state_to_undo()
+        for idx, row in enumerate(self.field_rows):
+            if row["frame"] == frame:
+                self.push_op("field_del", index=idx, old=self._capture_field(row))
+                break
         frame.destroy()
         self.field_rows = [row for row in self.field_rows if row["frame"] != frame]
+        self._abs_pos_grid_dirty = True
         self.update_preview()
 
 
-    def request_preview_update(self):
+    def request_preview_update(self, capture=True):
+        if self._batching: return
         if self.after_id:
             self.after_cancel(self.after_id)
-        else:
+        elif capture:
             # Si no hay timer, es que es el inicio de un cambio. Guardamos estado.
             self.save_state_to_undo()
-        self.after_id = self.after(300, self.update_preview)
+        self.after_id = self.after(PREVIEW_DEBOUNCE_MS, self._do_preview)
+
+    def _throttle(self, fn, ms, on_start=None):
+        """
+        Devuelve un wrapper leading+trailing de `fn` basado en after/after_cancel de Tk:
+        la primera llamada se ejecuta al instante, las siguientes dentro de la ventana de
+        `ms` se agrupan en una única llamada final. `on_start` se invoca al iniciar cada ráfaga.
+        """
+        state = {"id": None, "pending": False}
+
+        def trailing():
+            if state["pending"]:
+                state["pending"] = False
+                fn()
+                state["id"] = self.after(ms, trailing)  # Seguir limitando mientras dure la ráfaga
+            else:
+                state["id"] = None
+
+        def wrapper(*args):
+            if state["id"]:
+                state["pending"] = True
+                return
+            if on_start: on_start()
+            fn()
+            state["id"] = self.after(ms, trailing)
+
+        return wrapper
+
+    def _do_preview(self):
+        """Ejecuta el render diferido respetando una ventana mínima entre renders completados."""
+        elapsed_ms = (time.monotonic() - self._last_preview_ts) * 1000
+        if self._preview_busy or elapsed_ms < PREVIEW_DEBOUNCE_MS:
+            # Aún dentro de la ventana (o renderizando): reprogramar una única vez
+            self.after_id = self.after(PREVIEW_DEBOUNCE_MS, self._do_preview)
+            return
+        self.update_preview()
 
     def update_preview(self):
+        if self.after_id:
+            self.after_cancel(self.after_id)
         self.after_id = None
-        titulo = self.title_entry.get()
-        campos = []
+        if self._batching or self._destroyed: return  # Tras destroy() el pool ya no acepta trabajos
+        if self._preview_busy:
+            self._preview_pending = True  # Se relanza con el estado más reciente al terminar
+            return
+        self._preview_busy = True
+        self._render_preview()
+
+    def _render_preview(self):
+        """
+        Recopila los campos en el hilo de Tk y lanza el render en el hilo de preview.
+        Se pasan copias del estado mutable para que la UI pueda seguir editándolo.
+        """
+        self._preview_gen_id += 1
+        width_px = self._preview_render_width()
+        fut = self._preview_pool.submit(
+            generar_preview_imagen, self.title_entry.get(), self._collect_preview_campos(), self.logo_path,
+            width_px=width_px, config_visual=copy.deepcopy(self.config_visual),
+            extra_images=[dict(img) for img in self.extra_images], bg_images=list(self.bg_images),
+            pdf_dims=self.bg_pdf_dims, cached_bg=self._get_bg_raster(width_px))
+        fut.add_done_callback(partial(self._on_preview_done, self._preview_gen_id))
+
+    def _on_preview_done(self, gen_id, fut):
+        """(Hilo de preview) Devuelve el resultado al hilo de Tk."""
+        if self._destroyed or fut.cancelled():
+            return
+        try:
+            self.after(0, self._apply_preview, gen_id, fut)
+        except (RuntimeError, TclError):
+            pass  # La ventana ya se cerró
+
+    def _apply_preview(self, gen_id, fut):
+        """Muestra un render terminado, salvo que sea más antiguo que el visible o haya un arrastre."""
+        if self._destroyed or not self.winfo_exists():
+            return
+        self._preview_busy = False
+        self._last_preview_ts = time.monotonic()
+        if self._preview_pending:
+            self._preview_pending = False
+            self.update_preview()
+        img_pil = fut.result()  # Re-lanza en el hilo de Tk los errores del render
+        if gen_id < self._preview_shown_id or self._drag_base_img is not None:
+            return
+        self._preview_shown_id = gen_id
+        self._show_preview_image(img_pil)
+
+    def _preview_render_width(self):
+        """
+        Ancho al que se rasteriza el preview: el ancho en pantalla por el factor de la pantalla
+        (tk scaling relativo a 96 DPI), con al menos PREVIEW_SUPERSAMPLE para que el texto
+        se vea nítido. Renderizar más ancho solo para reducirlo después es trabajo perdido.
+        """
+        if self._render_w is None:
+            try:
+                dpi_ratio = float(self.tk.call('tk', 'scaling')) / (96 / 72)
+            except Exception:
+                dpi_ratio = 1.0
+            self._render_w = int(PREVIEW_DISPLAY_W * max(PREVIEW_SUPERSAMPLE, dpi_ratio))
+        return self._render_w
+
+    def _get_bg_raster(self, width_px):
+        """Páginas del PDF de fondo escaladas a width_px; se calculan una vez por PDF y ancho."""
+        if not self.bg_images:
+            return None
+        key = (self.config_visual.get('bg_pdf_path'), width_px)
+        if key not in self._bg_raster_cache:
+            self._bg_raster_cache[key] = escalar_fondo(self.bg_images, width_px)
+        return self._bg_raster_cache[key]
+
+    def _invalidate_bg_cache(self):
+        self._bg_raster_cache.clear()
+
+    def _collect_preview_campos(self):
+        # Los campos se recogen directamente en columnas (struct-of-arrays) para el renderizador
+        campos = CamposSoA()
+        add, type_get, col_get = campos.append, TYPE_MAP.get, COLUMN_MAP.get
         for row in self.field_rows:
             label = row["entry"].get()
             if not label: continue
-            
-            raw_type = row["type"].get()
-            ftype = {
-                "Texto": "text", "Fecha": "date", "Checkbox": "checkbox",
-                "Dropdown": "dropdown", "Radio Buttons": "radio",
-                "Multilínea": "multiline", "Firma": "signature", "Número": "number",
-                "Sección": "section"
-            }.get(raw_type, "text")
-            
-            raw_col = row["column"].get()
-            fcol = {"Ancho Completo": "full", "Columna Izq": "1", "Columna Der": "2"}.get(raw_col, "full")
-
-            opts = [o.strip() for o in row["options"].get().split(",") if o.strip()]
-            campos.append({
-                "label": label, 
-                "type": ftype, 
-                "options": opts, 
-                "column": fcol, 
-                "logic": row.get("logic", ctk.StringVar()).get(),
-                "abs_pos": row.get("abs_pos")
-            })
-
-        # Generar imagen de preview de alta resolución
-        display_w = 480
-        img_pil = generar_preview_imagen(titulo, campos, self.logo_path, width_px=1400, config_visual=self.config_visual, extra_images=self.extra_images, bg_images=self.bg_images, pdf_dims=self.bg_pdf_dims)
+            # Copia de abs_pos: el hilo de render no debe ver arrastres/deshacer a medias
+            abs_pos = row.get("abs_pos")
+            add(label, type_get(row["type"].get(), "text"), _row_options(row),
+                col_get(row["column"].get(), "full"), dict(abs_pos) if abs_pos else None)
+        return campos
+
+    def _update_preview_geom(self, event=None):
+        """Recalcula márgenes y escala del preview (al redimensionar o cambiar de fondo)."""
+        g = self._preview_geom
+        if event is not None:
+            g["widget_w"], g["widget_h"] = event.width, event.height
+        widget_w, widget_h = g["widget_w"], g["widget_h"]
+        # CTkLabel centra la imagen si sobra espacio
+        g["margin_x"] = max(0, (widget_w - PREVIEW_DISPLAY_W) / 2)
+        g["margin_y"] = max(0, (widget_h - getattr(self, 'last_display_h', widget_h)) / 2)
+        g["scale"] = self.bg_pdf_dims[0] / PREVIEW_DISPLAY_W
+
+    def _event_to_pdf(self, event):
+        """Convierte coordenadas del ratón en el preview a puntos PDF (Y acumulada entre páginas)."""
+        g = self._preview_geom
+        return (event.x - g["margin_x"]) * g["scale"], (event.y - g["margin_y"]) * g["scale"]
+
+    def _show_preview_image(self, img_pil):
+        """Muestra una imagen de preview de alta resolución en el panel (480 px de ancho)."""
+        display_w = PREVIEW_DISPLAY_W
         w_pil, h_pil = img_pil.size
         display_h = int(display_w * (h_pil / w_pil))
         
@@ -1216,59 +1695,36 @@ class PDFGeneratorApp(ctk.CTkFrame):
         base_w, base_h = self.bg_pdf_dims
         self.last_page_h = (h_pil / float(w_pil)) * base_w
 
-        self.last_display_h = display_h
+        if display_h != getattr(self, 'last_display_h', None):
+            self.last_display_h = display_h
+            self._update_preview_geom()
         ctk_img = ctk.CTkImage(light_image=img_pil, dark_image=img_pil, size=(display_w, display_h)) 
         self.preview_canvas_label.configure(image=ctk_img)
 
     def _on_preview_click(self, event):
         """Detecta si se ha hecho clic sobre un campo absoluto, imagen o logo para arrastrarlo, o activa Modo Diseño."""
-        # Dimensiones para cálculo de margen
-        display_w = 480
-        widget_w = self.preview_canvas_label.winfo_width()
-        widget_h = self.preview_canvas_label.winfo_height()
-        margin_x = max(0, (widget_w - display_w) / 2)
-        margin_y = max(0, (widget_h - getattr(self, 'last_display_h', widget_h)) / 2)
-        
-        # Coordenadas relativas a la imagen
-        img_x = event.x - margin_x
-        img_y = event.y - margin_y
-        
-        # Convertir a puntos PDF
-        scale_display_to_pdf = self.bg_pdf_dims[0] / display_w
-        pdf_x = img_x * scale_display_to_pdf
-        total_pdf_y = img_y * scale_display_to_pdf
+        # Convertir a puntos PDF (márgenes y escala precalculados)
+        pdf_x, total_pdf_y = self._event_to_pdf(event)
         
         # 1. Verificar si el click está sobre un campo absoluto
-        # Buscar el campo MÁS CERCANO al punto de click
+        # Buscar el campo MÁS CERCANO al punto de click (solo candidatos de la celda del clic, vectorizado)
         closest_field = None
-        min_distance = float('inf')
         
-        for idx, row in enumerate(self.field_rows):
-            abs_pos = row.get("abs_pos")
-            if abs_pos:
-                page_h = self.bg_pdf_dims[1]
-                page_offset_pts = abs_pos.get('page', 0) * page_h
-                field_x = abs_pos['x']
-                field_y = page_offset_pts + abs_pos['y']
-                field_w = abs_pos['w']
-                field_h = abs_pos['h']
-                
-                # Agregar margen de tolerancia para facilitar el click (30 puntos)
-                tolerance = 30
-                
-                # Verificar si el click está dentro del campo (con tolerancia)
-                if (field_x - tolerance <= pdf_x <= field_x + field_w + tolerance and 
-                    field_y - tolerance <= total_pdf_y <= field_y + field_h + tolerance):
-                    
-                    # Calcular distancia al centro del campo
-                    center_x = field_x + field_w / 2
-                    center_y = field_y + field_h / 2
-                    distance = ((pdf_x - center_x) ** 2 + (total_pdf_y - center_y) ** 2) ** 0.5
-                    
-                    # Guardar si es el más cercano
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_field = (idx, abs_pos)
+        if self._abs_pos_grid_dirty or self._abs_grid_page_h != self.bg_pdf_dims[1]:
+            self._rebuild_abs_grid()
+        cell = (int(pdf_x // ABS_GRID_CELL_PTS), int(total_pdf_y // ABS_GRID_CELL_PTS))
+        cand = self._abs_pos_grid.get(cell)
+        if cand is not None:
+            x, y, w, h = self._abs_boxes[cand].T
+            # Tolerancia para facilitar el click
+            tol = ABS_CLICK_TOLERANCE_PTS
+            inside = ((x - tol <= pdf_x) & (pdf_x <= x + w + tol) &
+                      (y - tol <= total_pdf_y) & (total_pdf_y <= y + h + tol))
+            if inside.any():
+                # Distancia (al cuadrado) al centro de cada campo; argmin conserva el primero en empate
+                dist2 = np.where(inside, (pdf_x - (x + w / 2)) ** 2 + (total_pdf_y - (y + h / 2)) ** 2, np.inf)
+                idx = int(self._abs_box_rows[cand[dist2.argmin()]])
+                closest_field = (idx, self.field_rows[idx]["abs_pos"])
         
         # Si encontramos un campo cercano, seleccionarlo
         if closest_field:
@@ -1292,28 +1748,12 @@ class PDFGeneratorApp(ctk.CTkFrame):
             self._handle_design_click(event)
             return
 
-        # Dimensiones para cálculo de margen
-        display_w = 480
-        widget_w = self.preview_canvas_label.winfo_width()
-        widget_h = self.preview_canvas_label.winfo_height()
-        margin_x = max(0, (widget_w - display_w) / 2)
-        margin_y = max(0, (widget_h - getattr(self, 'last_display_h', widget_h)) / 2)
-
-        # Convertir clic (display coord) -> PDF points
-        scale_display_to_pdf = self.bg_pdf_dims[0] / display_w
-        
-        img_x = event.x - margin_x
-        img_y = event.y - margin_y
-        
-        pdf_x = img_x * scale_display_to_pdf
-        pdf_y = img_y * scale_display_to_pdf
-        
         self._drag_preview["id"] = None
         
         # 1. Comprobar Imágenes Extras (Inverso para pillar la de 'arriba')
         for i, img_data in reversed(list(enumerate(self.extra_images))):
             x, y, w, h = img_data['x'], img_data['y'], img_data['w'], img_data['h']
-            if x <= pdf_x <= x+w and y <= pdf_y <= y+h:
+            if x <= pdf_x <= x+w and y <= total_pdf_y <= y+h:
                 self._drag_preview.update({
                     "id": i, "type": "extra", "start_x": event.x, "start_y": event.y,
                     "original_pos": (x, y)
@@ -1325,12 +1765,63 @@ class PDFGeneratorApp(ctk.CTkFrame):
             l_pos = self.config_visual.get('logo_position', {'x': 50, 'y': 30})
             lx, ly = l_pos['x'], l_pos['y']
             # Estimación del tamaño del logo (180x100 max)
-            if lx <= pdf_x <= lx+180 and ly <= pdf_y <= ly+100:
+            if lx <= pdf_x <= lx+180 and ly <= total_pdf_y <= ly+100:
                 self._drag_preview.update({
                     "id": 0, "type": "logo", "start_x": event.x, "start_y": event.y,
                     "original_pos": (lx, ly)
                 })
 
+    def _rebuild_abs_grid(self):
+        """
+        Reparte los campos absolutos (con su tolerancia de clic) en celdas de ABS_GRID_CELL_PTS
+        y guarda sus cajas en un array (N, 4) para el hit-test vectorizado.
+        """
+        grid = {}
+        boxes, rows = [], []
+        page_h = self.bg_pdf_dims[1]
+        tol, cell = ABS_CLICK_TOLERANCE_PTS, ABS_GRID_CELL_PTS
+        for idx, row in enumerate(self.field_rows):
+            abs_pos = row.get("abs_pos")
+            if not abs_pos: continue
+            x = abs_pos['x']
+            y = abs_pos.get('page', 0) * page_h + abs_pos['y']
+            box = len(boxes)
+            boxes.append((x, y, abs_pos['w'], abs_pos['h']))
+            rows.append(idx)
+            for cx in range(int((x - tol) // cell), int((x + abs_pos['w'] + tol) // cell) + 1):
+                for cy in range(int((y - tol) // cell), int((y + abs_pos['h'] + tol) // cell) + 1):
+                    grid.setdefault((cx, cy), []).append(box)
+        self._abs_boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self._abs_box_rows = np.array(rows, dtype=np.intp)
+        self._abs_pos_grid = {c: np.array(b, dtype=np.intp) for c, b in grid.items()}
+        self._abs_pos_grid_dirty = False
+        self._abs_grid_page_h = page_h
+
+    def _record_preview_move(self):
+        """
+        Registra en deshacer el desplazamiento (posición original -> actual) del elemento arrastrado.
+        Devuelve False si se soltó sin moverlo (no se apila nada).
+        """
+        kind = self._drag_preview["type"]
+        ox, oy = self._drag_preview["original_pos"]
+        if kind == "field":
+            idx = self._drag_preview["field_idx"]
+            abs_pos = self.field_rows[idx]["abs_pos"]
+            new = (abs_pos["x"], abs_pos["y"])
+            if new == (ox, oy): return False
+            self.push_op("field_move", index=idx, old=(ox, oy), new=new)
+        elif kind == "extra":
+            idx = self._drag_preview["id"]
+            new = (self.extra_images[idx]['x'], self.extra_images[idx]['y'])
+            if new == (ox, oy): return False
+            self.push_op("image_move", index=idx, old=(ox, oy), new=new)
+        elif kind == "logo":
+            pos = self.config_visual.get('logo_position', {'x': 50, 'y': 30})
+            if (pos['x'], pos['y']) == (ox, oy): return False
+            self.push_op("visual", old={'logo_position': {'x': ox, 'y': oy}},
+                         new={'logo_position': dict(pos)})
+        return True
+
     def _handle_design_click(self, event):
         """Maneja el clic en el preview cuando el Modo Diseño está activo."""
         bg_path = self.config_visual.get('bg_pdf_path')
@@ -1339,27 +1830,8 @@ class PDFGeneratorApp(ctk.CTkFrame):
             self.design_mode.set(False)
             return
 
-        # 1. Obtener coordenadas del click respecto al widget
-        click_x = event.x
-        click_y = event.y
-
-        # El CTkLabel puede centrar la imagen si es más grande que 480px
-        # El ancho de la imagen en pantalla es fijo: 480
-        display_w = 480
-        widget_w = self.preview_canvas_label.winfo_width()
-        widget_h = self.preview_canvas_label.winfo_height()
-        
-        # Calcular márgenes (CTkLabel centra la imagen si sobra espacio)
-        margin_x = max(0, (widget_w - display_w) / 2)
-        margin_y = max(0, (widget_h - getattr(self, 'last_display_h', widget_h)) / 2)
-        
-        # Ajustar coordenadas relativas a la imagen real
-        img_x = click_x - margin_x
-        img_y = click_y - margin_y
-        
-        scale_screen = display_w / self.bg_pdf_dims[0]
-        pdf_x = img_x / scale_screen
-        total_pdf_y = img_y / scale_screen
+        # 1. Coordenadas del click en puntos PDF (márgenes y escala precalculados)
+        pdf_x, total_pdf_y = self._event_to_pdf(event)
         
         page_h = self.bg_pdf_dims[1]
         page_num = int(total_pdf_y // page_h)
@@ -1384,20 +1856,10 @@ class PDFGeneratorApp(ctk.CTkFrame):
     def _on_preview_drag(self, event):
         """Mueve el elemento seleccionado en el preview."""
         if self._drag_preview["id"] is None: return
+        if self._drag_base_img is None:
+            self._build_drag_base()
         
-        display_w = 480
-        widget_w = self.preview_canvas_label.winfo_width()
-        widget_h = self.preview_canvas_label.winfo_height()
-        margin_x = max(0, (widget_w - display_w) / 2)
-        margin_y = max(0, (widget_h - getattr(self, 'last_display_h', widget_h)) / 2)
-        
-        # Coordenadas relativas a la imagen
-        img_x = event.x - margin_x
-        img_y = event.y - margin_y
-        
-        scale_display_to_pdf = self.bg_pdf_dims[0] / display_w
-        pdf_x = img_x * scale_display_to_pdf
-        total_pdf_y = img_y * scale_display_to_pdf
+        pdf_x, total_pdf_y = self._event_to_pdf(event)
         
         # Calcular desplazamiento desde el inicio del arrastre
         dx = pdf_x - self._drag_preview["start_x"]
@@ -1419,6 +1881,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
             
             self.field_rows[idx]["abs_pos"]["x"] = int(new_x)
             self.field_rows[idx]["abs_pos"]["y"] = int(page_relative_y)
+            self._abs_pos_grid_dirty = True
         elif self._drag_preview["type"] == "extra":
             idx = self._drag_preview["id"]
             self.extra_images[idx]['x'] = int(new_x)
@@ -1426,13 +1889,75 @@ class PDFGeneratorApp(ctk.CTkFrame):
         elif self._drag_preview["type"] == "logo":
             self.config_visual['logo_position'] = {'x': int(new_x), 'y': int(new_y)}
 
-        self.update_preview()
+        # Como mucho un render por frame: los eventos de movimiento intermedios solo actualizan datos.
+        # (No se cancela y reprograma: eso aplazaría el render hasta que el ratón se detenga)
+        if not self._preview_after_id:
+            self._preview_after_id = self.after(DRAG_FRAME_MS, self._flush_preview_update)
+
+    def _flush_preview_update(self):
+        self._preview_after_id = None
+        if self._drag_base_img is not None and self._drag_element_img is not None:
+            self._render_drag_frame()
+        else:
+            self.update_preview()
+
+    def _build_drag_base(self):
+        """
+        Renderiza una sola vez, al empezar a arrastrar, el preview sin el logo/imagen que se mueve
+        y prepara la imagen de ese elemento; cada frame del arrastre solo la pega encima.
+        Los campos absolutos se quedan en la base (quitarlos alteraría el flujo del resto) y se
+        arrastra su rectángulo de selección.
+        """
+        kind = self._drag_preview["type"]
+        scale = self._preview_render_width() / self.bg_pdf_dims[0]
+        logo_path, extra_images = self.logo_path, self.extra_images
+        if kind == "logo":
+            logo_path = None
+            self._drag_element_img = generar_sprite_arrastre("logo", self.logo_path, scale)
+        elif kind == "extra":
+            idx = self._drag_preview["id"]
+            extra_images = self.extra_images[:idx] + self.extra_images[idx + 1:]
+            self._drag_element_img = generar_sprite_arrastre("extra", self.extra_images[idx], scale)
+        else:
+            abs_pos = self.field_rows[self._drag_preview["field_idx"]]["abs_pos"]
+            self._drag_element_img = generar_sprite_arrastre("field", abs_pos, scale)
+        self._drag_base_img = generar_preview_imagen(self.title_entry.get(), self._collect_preview_campos(),
+                                                     logo_path, width_px=self._preview_render_width(), config_visual=self.config_visual,
+                                                     extra_images=extra_images, bg_images=self.bg_images,
+                                                     pdf_dims=self.bg_pdf_dims, cached_bg=self._get_bg_raster(self._preview_render_width()))
+
+    def _render_drag_frame(self):
+        """Compone la base cacheada con el elemento arrastrado en su posición actual."""
+        scale = self._preview_render_width() / self.bg_pdf_dims[0]
+        kind = self._drag_preview["type"]
+        if kind == "logo":
+            pos = self.config_visual.get('logo_position', {'x': 50, 'y': 30})
+            px, py = pos['x'], pos['y']
+        elif kind == "extra":
+            img_data = self.extra_images[self._drag_preview["id"]]
+            px, py = img_data['x'], img_data['y']
+        else:
+            abs_pos = self.field_rows[self._drag_preview["field_idx"]]["abs_pos"]
+            px, py = abs_pos['x'], abs_pos.get('page', 0) * self.bg_pdf_dims[1] + abs_pos['y']
+        
+        sprite = self._drag_element_img
+        img = self._drag_base_img.copy()
+        img.paste(sprite, (int(px * scale), int(py * scale)), sprite if sprite.mode == 'RGBA' else None)
+        self._show_preview_image(img)
 
     def _on_preview_release(self, event):
         """Finaliza el arrastre en el preview y guarda el estado."""
-        if self._drag_preview["id"] is not None:
-            self.save_state_to_undo()
-            self.refresh_images_ui() # Actualizar inputs numéricos si están abiertos
+        if self._preview_after_id:
+            self.after_cancel(self._preview_after_id)
+            self._preview_after_id = None
+        # Descartar la base del arrastre y reconciliar con un render completo
+        dragged = self._drag_base_img is not None
+        self._drag_base_img = self._drag_element_img = None
+        if dragged:
+            self.update_preview()
+        if self._drag_preview["id"] is not None and self._record_preview_move():
+            if self._drag_preview["type"] == "extra":
+                self.refresh_images_ui() # Actualizar inputs numéricos si están abiertos
         self._drag_preview["id"] = None
 
     # =========================================================================
@@ -1442,42 +1967,35 @@ class PDFGeneratorApp(ctk.CTkFrame):
     # Se eliminó open_visual_editor redundante. Se usa el integrado en PDF_MASTER_PRO.
 
 
-    def generate_pdf(self):
-        """Procesa los campos actuales y genera el archivo PDF final."""
-        titulo = self.title_entry.get()
-        if not titulo:
-            messagebox.showerror("Error", "El título es obligatorio.")
-            return
-
+    def _collect_campos(self, with_abs_pos=True):
+        """Campos del editor (con etiqueta) en el formato de diccionarios que espera generar_pdf."""
+        type_get, col_get = TYPE_MAP.get, COLUMN_MAP.get
         campos = []
         for row in self.field_rows:
             label = row["entry"].get()
             if not label: continue
-            
-            raw_type = row["type"].get()
-            ftype = {
-                "Texto": "text", "Fecha": "date", "Checkbox": "checkbox",
-                "Dropdown": "dropdown", "Radio Buttons": "radio",
-                "Multilínea": "multiline", "Firma": "signature", "Número": "number",
-                "Sección": "section"
-            }.get(raw_type, "text")
-            
-            raw_col = row["column"].get()
-            fcol = {"Ancho Completo": "full", "Columna Izq": "1", "Columna Der": "2"}.get(raw_col, "full")
-
-            opts = [o.strip() for o in row["options"].get().split(",") if o.strip()]
-            campos.append({
+            campo = {
                 "label": label, 
-                "type": ftype, 
-                "options": opts, 
-                "column": fcol, 
-                "logic": row.get("logic", ctk.StringVar()).get(),
-                "required": row.get("required", ctk.BooleanVar()).get(),
-                "validation": row.get("validation", ctk.StringVar()).get(),
+                "type": type_get(row["type"].get(), "text"), 
+                "options": _row_options(row), 
+                "column": col_get(row["column"].get(), "full"), 
+                "logic": row["logic"].get(),
+                "required": row["required"].get(),
+                "validation": row["validation"].get()
+            }
+            if with_abs_pos:
+                campo["abs_pos"] = row.get("abs_pos")
+            campos.append(campo)
+        return campos
 
-                "abs_pos": row.get("abs_pos")
+    def generate_pdf(self):
+        """Procesa los campos actuales y genera el archivo PDF final."""
+        titulo = self.title_entry.get()
+        if not titulo:
+            messagebox.showerror("Error", "El título es obligatorio.")
+            return
 
-            })
+        campos = self._collect_campos()
 
         if not campos:
             messagebox.showerror("Error", "Debe agregar al menos un campo.")
@@ -1485,6 +2003,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
         output_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
         if output_path:
+            from src.core.pdf_generator import generar_pdf  # reportlab/pypdf se cargan solo al generar
             try:
                 generar_pdf(output_path, titulo, campos, self.logo_path, config_visual=self.config_visual, extra_images=self.extra_images, bg_pdf_path=self.config_visual.get('bg_pdf_path'))
                 self.save_to_history(output_path)
@@ -1502,24 +2021,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
         # 2. Recopilar datos (Igual que generate_pdf pero sin diálogo de guardado)
         titulo = self.title_entry.get()
-        campos = []
-        for row in self.field_rows:
-            label = row["entry"].get()
-            if not label: continue
-            raw_type = row["type"].get()
-            ftype = {"Texto": "text", "Fecha": "date", "Checkbox": "checkbox", "Dropdown": "dropdown", "Radio Buttons": "radio", "Multilínea": "multiline", "Firma": "signature", "Número": "number", "Sección": "section"}.get(raw_type, "text")
-            raw_col = row["column"].get()
-            fcol = {"Ancho Completo": "full", "Columna Izq": "1", "Columna Der": "2"}.get(raw_col, "full")
-            opts = [o.strip() for o in row["options"].get().split(",") if o.strip()]
-            campos.append({
-                "label": label, 
-                "type": ftype, 
-                "options": opts, 
-                "column": fcol, 
-                "logic": row.get("logic", ctk.StringVar()).get(),
-                "required": row.get("required", ctk.BooleanVar()).get(),
-                "validation": row.get("validation", ctk.StringVar()).get()
-            })
+        campos = self._collect_campos(with_abs_pos=False)
 
         if not campos:
             messagebox.showerror("Error", "Debe agregar al menos un campo.")
@@ -1527,6 +2029,7 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
         # 3. Generar a archivo temporal
         import tempfile
+        from src.core.pdf_generator import generar_pdf
         temp_dir = tempfile.gettempdir()
         temp_path = os.path.join(temp_dir, f"{titulo.replace(' ', '_')}.pdf")
         
@@ -1561,8 +2064,11 @@ class PDFGeneratorApp(ctk.CTkFrame):
     # --- UX: Historial ---
 
     def refresh_history_ui(self):
+        """Reconstruye por completo la pestaña de historial (inicio y al limpiar)."""
         for widget in self.tab_history.winfo_children():
             widget.destroy()
+        self._history_scroll = None
+        self._history_frames = []
         
         if not self.history:
             ctk.CTkLabel(self.tab_history, text="No hay PDFs generados", text_color=("#8E8E93", "#8E8E93")).pack(pady=20)
@@ -1571,28 +2077,47 @@ class PDFGeneratorApp(ctk.CTkFrame):
                                         scrollbar_button_color=("#D1D1D6", "#2C2C2E"),
                                         scrollbar_button_hover_color=("#C7C7CC", "#3A3A3C"))
         scroll.pack(fill="both", expand=True)
+        self._history_scroll = scroll
 
         for item in self.history:
-            frame = ctk.CTkFrame(scroll, fg_color="transparent")
-            frame.pack(fill="x", pady=4, padx=5)
-            
-            btn = ctk.CTkButton(frame, text=f"{item['filename']}\n({item['date']})", 
-                                font=ctk.CTkFont(size=10),
-                                fg_color="transparent", text_color=("black", "white"), anchor="w",
-                                hover_color=("#E5E5EA", "#1A1A1A"),
-                                command=lambda p=item['path']: os.startfile(p))
-            btn.pack(side="left", fill="x", expand=True)
-            
-            folder_btn = ctk.CTkButton(frame, text="📁", width=30, height=30, corner_radius=8,
-                                       fg_color=("#E5E5EA", "#1A1A1B"), text_color=("black", "white"), 
-                                       hover_color=("#D1D1D6", "#333333"),
-                                       command=lambda p=item['path']: os.startfile(os.path.dirname(p)))
-            folder_btn.pack(side="right", padx=2)
+            self._history_frames.append(self._build_history_row(item))
         
         ctk.CTkButton(self.tab_history, text="Limpiar Historial", fg_color="#FF3B30", 
                      text_color="#FFFFFF", corner_radius=10, height=35,
                      command=self.clear_history).pack(pady=10, padx=20, fill="x")
 
+    def _build_history_row(self, item, before=None):
+        """Crea la fila de un PDF del historial (opcionalmente antes de otra fila)."""
+        frame = ctk.CTkFrame(self._history_scroll, fg_color="transparent")
+        if before is None:
+            frame.pack(fill="x", pady=4, padx=5)
+        else:
+            frame.pack(fill="x", pady=4, padx=5, before=before)
+        
+        btn = ctk.CTkButton(frame, text=f"{item['filename']}\n({item['date']})", 
+                            font=self._font_10,
+                            fg_color="transparent", text_color=("black", "white"), anchor="w",
+                            hover_color=("#E5E5EA", "#1A1A1A"),
+                            command=partial(os.startfile, item['path']))
+        btn.pack(side="left", fill="x", expand=True)
+        
+        folder_btn = ctk.CTkButton(frame, text="📁", width=30, height=30, corner_radius=8,
+                                   fg_color=("#E5E5EA", "#1A1A1B"), text_color=("black", "white"), 
+                                   hover_color=("#D1D1D6", "#333333"),
+                                   command=partial(os.startfile, os.path.dirname(item['path'])))
+        folder_btn.pack(side="right", padx=2)
+        return frame
+
+    def _prepend_history_ui(self):
+        """Añade solo la fila nueva (arriba) y retira las que superan el límite del historial."""
+        if self._history_scroll is None:
+            self.refresh_history_ui()  # Primera entrada: hay que sustituir el aviso de lista vacía
+            return
+        first = self._history_frames[0] if self._history_frames else None
+        self._history_frames.insert(0, self._build_history_row(self.history[0], before=first))
+        while len(self._history_frames) > len(self.history):
+            self._history_frames.pop().destroy()
+
     def clear_history(self):
         if messagebox.askyesno("Confirmar", "¿Borrar todo el historial de PDFs?"):
             self.data_manager.clear_history()
@@ -1601,7 +2126,15 @@ class PDFGeneratorApp(ctk.CTkFrame):
 
     def save_to_history(self, file_path):
         """Añade un archivo al historial y persiste el cambio."""
+        previous_first = self.history[0] if self.history else None
         self.history = self.data_manager.add_to_history(file_path)
+        if self.history and self.history[0] is not previous_first:  # Duplicado reciente: nada que pintar
+            self._prepend_history_ui()
+
+    def save_history_batch(self, file_paths):
+        """Añade varios archivos al historial con una sola escritura y un solo refresco de la lista."""
+        if not file_paths: return
+        self.history = self.data_manager.add_many_to_history(file_paths)
         self.refresh_history_ui()
 
     # --- UX: Exportación ---
@@ -1619,20 +2152,25 @@ class PDFGeneratorApp(ctk.CTkFrame):
         if not csv_path: return
         
         try:
+            # Solo se lee una muestra para detectar codificación y delimitador;
+            # el resto del archivo se parsea en streaming
             with open(csv_path, 'rb') as f:
-                raw_data = f.read()
+                raw_sample = f.read(8192)
             
             try:
-                content = raw_data.decode('utf-8-sig').strip()
-            except:
-                content = raw_data.decode('latin-1', errors='replace').strip()
+                # Decodificador incremental: tolera un carácter multibyte cortado al final de la muestra
+                sample = codecs.getincrementaldecoder('utf-8-sig')().decode(raw_sample)
+                encoding = 'utf-8-sig'
+            except UnicodeDecodeError:
+                sample = raw_sample.decode('latin-1')
+                encoding = 'latin-1'
             
-            if not content:
+            if not sample.strip():
                 messagebox.showerror("Error", "El archivo CSV está vacío.")
                 return
             
             # Sniffer más agresivo
-            sample = content[:4096]
+            sample = sample.lstrip()[:4096]
             try:
                 dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
                 delimiter = dialect.delimiter
@@ -1641,16 +2179,29 @@ class PDFGeneratorApp(ctk.CTkFrame):
                 counts = {d: sample.count(d) for d in [';', ',', '\t', '|']}
                 delimiter = max(counts, key=counts.get)
             
-            f_mem = io.StringIO(content)
-            reader = csv.DictReader(f_mem, delimiter=delimiter)
-            all_rows = [r for r in reader if any(r.values())] # Filtrar filas vacías
-            columns = reader.fieldnames if reader.fieldnames else []
+            def read_rows(enc):
+                with open(csv_path, 'r', encoding=enc, newline='') as f:
+                    reader = csv.reader(f, delimiter=delimiter)
+                    header = next((r for r in reader if any(r)), [])  # Cabecera: primera fila no vacía
+                    return header, [r for r in reader if any(r)]  # Filtrar filas vacías
+            
+            try:
+                columns, data_rows = read_rows(encoding)
+            except UnicodeDecodeError:
+                # La muestra era UTF-8 válido pero el resto no (p. ej. un latin-1 cuyo primer
+                # acento está después de la muestra): se relee entero como latin-1
+                columns, data_rows = read_rows('latin-1')
+            
+            # Columnas (SoA): nombre -> valores por fila; las filas cortas se completan con ""
+            columns_soa = {col: [r[c] if c < len(r) else "" for r in data_rows] for c, col in enumerate(columns)}
+            n_rows = len(data_rows)
+            del data_rows
             
             if not columns:
                 messagebox.showerror("Error", "No se detectaron cabeceras en el CSV.")
                 return
             
-            if not all_rows:
+            if not n_rows:
                 messagebox.showwarning("Atención", "Se detectaron las cabeceras pero no hay filas de datos debajo.\n\nPor favor, asegúrate de que el CSV tenga datos a partir de la segunda fila.")
                 return
 
@@ -1695,61 +2246,122 @@ class PDFGeneratorApp(ctk.CTkFrame):
             mapping = {f: v.get() for f, v in mapping_vars.items() if v.get() != "-- Ninguna --"}
             
             try:
-                success_count = 0
                 titulo_orig = self.title_entry.get()
                 
-                for i, row_data in enumerate(all_rows):
-                    # Preparar campos con valores del CSV
-                    campos_generar = []
-                    for row in self.field_rows:
-                        label = row["entry"].get()
-                        if not label: continue
-                        
-                        ftype_raw = row["type"].get()
-                        ftype = {
-                            "Texto": "text", "Fecha": "date", "Checkbox": "checkbox",
-                            "Dropdown": "dropdown", "Radio Buttons": "radio",
-                            "Multilínea": "multiline", "Firma": "signature", "Número": "number",
-                            "Sección": "section"
-                        }.get(ftype_raw, "text")
-                        
-                        fcol_raw = row["column"].get()
-                        fcol = {"Ancho Completo": "full", "Columna Izq": "1", "Columna Der": "2"}.get(fcol_raw, "full")
-                        
-                        opts = [o.strip() for o in row["options"].get().split(",") if o.strip()]
-                        logic = row.get("logic", ctk.StringVar()).get()
-
-                        # Valor por defecto o del CSV
-                        val = ""
-                        if label in mapping:
-                            val = row_data.get(mapping[label], "")
-
-                        campos_generar.append({
-                            "label": label, "type": ftype, "options": opts, 
-                            "column": fcol, "logic": logic, "default_value": val
-                        })
+                # Plantilla de campos: se resuelve una sola vez, por fila solo cambia el valor del CSV
+                plantilla = []
+                obligatorios = []  # (campo, valores) de los campos obligatorios que se rellenan desde el CSV
+                invalidos = {}  # nº de fila -> campos cuyo valor del CSV no cumple su validación
+                for row in self.field_rows:
+                    label = row["entry"].get()
+                    if not label: continue
+                    campo = {
+                        "label": label, "type": TYPE_MAP.get(row["type"].get(), "text"),
+                        "options": _row_options(row), "column": COLUMN_MAP.get(row["column"].get(), "full"),
+                        "logic": row["logic"].get(), "default_value": ""
+                    }
+                    csv_col = mapping.get(label)  # Columna CSV resuelta una vez por campo
+                    plantilla.append((campo, columns_soa[csv_col] if csv_col else None))
+                    if csv_col and row["required"].get():
+                        obligatorios.append((label, columns_soa[csv_col]))
+                    kind = row["validation"].get()
+                    if csv_col and kind in VALIDATION_PATTERNS:
+                        for i, v in enumerate(columns_soa[csv_col]):
+                            if not validate_value(kind, v):
+                                invalidos.setdefault(i, []).append(label)
+                
+                f_col = filename_col_var.get()
+                name_values = columns_soa[f_col] if f_col != "-- Autogenerado --" else None
+                # Marca de tiempo y carpeta comunes a todo el lote; el índice de fila hace único cada nombre
+                stamp = datetime.now().strftime('%H%M%S')
+                out_base = os.path.join(out_dir, "")
+                # Copias: el lote se envía a los procesos mientras la UI sigue pudiendo editar
+                config_visual = copy.deepcopy(self.config_visual)
+                extra_images = [dict(img) for img in self.extra_images]
+                logo_path = self.logo_path
+                trabajos = []
+                filas = []  # Nº de fila del CSV de cada trabajo
+                omitidas = []  # (nº de fila, motivo) de las filas sin generar (obligatorios o validación)
+                for i in range(n_rows):
+                    # Sin valor en un campo obligatorio: la fila no se envía a generar
+                    missing = [label for label, values in obligatorios if not values[i].strip()]
+                    if missing:
+                        omitidas.append((i + 1, f"Faltan campos obligatorios: {', '.join(missing)}"))
+                        continue
+                    # Valores que no cumplen la validación de su campo: tampoco se genera
+                    if i in invalidos:
+                        omitidas.append((i + 1, f"Valores no válidos: {', '.join(invalidos[i])}"))
+                        continue
+
+                    # Valor por defecto o del CSV (índice en la lista de la columna)
+                    campos_generar = [
+                        {**campo, "default_value": values[i]} if values is not None else campo
+                        for campo, values in plantilla
+                    ]
                     
                     file_prefix = "PDF"
-                    f_col = filename_col_var.get()
-                    if f_col != "-- Autogenerado --":
-                        val = str(row_data.get(f_col, "")).strip()
+                    if name_values is not None:
+                        # Sanear nombre de archivo (quitar caracteres prohibidos) y limitar longitud
+                        val = name_values[i].strip().translate(_FNAME_TRANSLATE)[:50]
                         if val:
-                            # Sanear nombre de archivo (quitar caracteres prohibidos)
-                            for char in '<>:"/\\|?*': val = val.replace(char, '')
-                            file_prefix = val[:50] # Limitar longitud
-
-                    file_name = f"{file_prefix}_{success_count+1}_{datetime.now().strftime('%H%M%S')}.pdf"
-                    dest = os.path.join(out_dir, file_name)
-                    generar_pdf(dest, titulo_orig, campos_generar, self.logo_path, config_visual=self.config_visual, extra_images=self.extra_images)
-                    self.save_to_history(dest)
-                    success_count += 1
-            
-                messagebox.showinfo("Proceso Terminado", f"Se han generado {success_count} PDFs con éxito.")
-                dialog.destroy()
+                            file_prefix = val
+
+                    dest = f"{out_base}{file_prefix}_{i+1}_{stamp}.pdf"
+                    trabajos.append((dest, campos_generar))
+                    filas.append(i + 1)
+                
             except Exception as e:
                 messagebox.showerror("Error", f"Error durante la generación: {e}")
+                return
 
-        ctk.CTkButton(dialog, text="Comenzar Generación", command=start_batch, fg_color="green").pack(pady=10)
+            # La generación corre en un hilo aparte (la UI sigue respondiendo); el progreso y el
+            # resultado vuelven al hilo de Tk con after()
+            start_btn.configure(state="disabled", text="Generando...")
+            progress_bar.set(0)
+            progress_bar.pack(pady=(0, 10), padx=20, fill="x")
+
+            def progress(current, total):
+                self.after(0, lambda: progress_bar.winfo_exists() and progress_bar.set(current / total))
+
+            def finalize(resultados):
+                # Fallos por fila (nº de fila del CSV, mensaje); las demás filas se generan igualmente
+                errores = [(filas[k], err) for k, (_, err) in enumerate(resultados) if err]
+                success_count = len(resultados) - len(errores)
+                failures = sorted(omitidas + errores)
+                self.save_history_batch([dest for dest, err in resultados if not err])
+            
+                if failures:
+                    detalle = "\n".join(f"Fila {n}: {err}" for n, err in failures[:5])
+                    if len(failures) > 5:
+                        detalle += f"\n... y {len(failures) - 5} más"
+                    messagebox.showwarning("Proceso Terminado", f"Se han generado {success_count} PDFs; {len(failures)} filas no se generaron.\n\n{detalle}")
+                else:
+                    messagebox.showinfo("Proceso Terminado", f"Se han generado {success_count} PDFs con éxito.")
+                if dialog.winfo_exists():
+                    dialog.destroy()
+
+            def run_batch():
+                try:
+                    from src.core.pdf_generator import generar_pdf_lote
+                    resultados = generar_pdf_lote(trabajos, titulo_orig, logo_path, config_visual, extra_images,
+                                                  progress_callback=progress)
+                    self.after(0, lambda: finalize(resultados))
+                except Exception as e:
+                    msg = str(e)
+                    self.after(0, lambda: fail(msg))
+
+            def fail(msg):
+                # Dejar el diálogo listo para reintentar
+                if start_btn.winfo_exists():
+                    start_btn.configure(state="normal", text="Comenzar Generación")
+                    progress_bar.pack_forget()
+                messagebox.showerror("Error", f"Error durante la generación: {msg}")
+
+            threading.Thread(target=run_batch, daemon=True).start()
+
+        start_btn = ctk.CTkButton(dialog, text="Comenzar Generación", command=start_batch, fg_color="green")
+        start_btn.pack(pady=10)
+        progress_bar = ctk.CTkProgressBar(dialog)  # Se muestra al empezar la generación
     
 
 # Fin de PDFGeneratorApp
@@ -3,6 +3,7 @@ Módulo de Diálogos de Usuario - PDF Master Pro
 """
 
 import customtkinter as ctk
+from src.utils.app_models import TRIGGER_TYPES, VALIDATION_PATTERNS
 
 def show_add_field_dialog(app):
     """Muestra un diálogo para elegir dónde insertar un nuevo campo."""
@@ -59,7 +60,7 @@ def show_field_settings(app, current_row):
                      font=ctk.CTkFont(size=12)).pack(pady=5, padx=50, anchor="w")
 
     ctk.CTkLabel(dialog, text="Tipo de Validación Especial:", font=ctk.CTkFont(size=11)).pack(pady=(10, 2))
-    val_types = ["Ninguno", "Email", "DNI/NIE", "Teléfono", "Numérico"]
+    val_types = ["Ninguno", *VALIDATION_PATTERNS]
     val_type_var = ctk.StringVar(value=current_row['validation'].get())
     val_menu = ctk.CTkOptionMenu(dialog, values=val_types, variable=val_type_var, width=280,
                                   fg_color=("#E5E5EA", "#1A1B1C"), button_color=("#D1D1D6", "#2C2C2E"), 
@@ -76,13 +77,16 @@ def show_field_settings(app, current_row):
     trigger_options = ["(Sin lógica)"]
     trigger_map = [] 
     
+    # El tipo de cada fila ya está cacheado (is_trigger): solo se lee la etiqueta de los disparadores
     for i, row in enumerate(app.field_rows):
-        if row['frame'] == current_row['frame']: continue
-        r_type = row['type'].get()
-        if r_type in ["Dropdown", "Radio Buttons", "Checkbox"]:
+        if row is current_row: continue
+        if row['is_trigger']:
             label = row['entry'].get() or f"Campo {i+1}"
             trigger_options.append(label)
             trigger_map.append({'index': i, 'label': label})
+    # Búsquedas directas etiqueta -> índice (al guardar) e índice -> etiqueta (al abrir)
+    trigger_idx_by_label = {m['label']: m['index'] for m in reversed(trigger_map)}  # Etiquetas repetidas: gana la primera
+    trigger_label_by_idx = {str(m['index']): m['label'] for m in trigger_map}
 
     choice_var = ctk.StringVar(value=trigger_options[0])
     val_var = ctk.StringVar(value="")
@@ -90,10 +94,9 @@ def show_field_settings(app, current_row):
     current_logic = current_row['logic'].get()
     if "|" in current_logic:
         t_idx, t_val = current_logic.split("|")
-        for m in trigger_map:
-            if str(m['index']) == t_idx:
-                choice_var.set(m['label'])
-                val_var.set(t_val)
+        if t_idx in trigger_label_by_idx:
+            choice_var.set(trigger_label_by_idx[t_idx])
+            val_var.set(t_val)
 
     ctk.CTkLabel(dialog, text="Campo Disparador:", text_color=("black", "white")).pack(pady=(10, 2))
     combo_trigger = ctk.CTkOptionMenu(dialog, values=trigger_options, variable=choice_var, width=280,
@@ -108,17 +111,15 @@ def show_field_settings(app, current_row):
     val_entry.pack(pady=5)
 
     def save_settings():
+        # Guardar el estado ANTES de modificar para que Deshacer lo recupere
+        app.save_state_to_undo()
         current_row['required'].set(req_var.get())
         current_row['validation'].set(val_type_var.get())
         sel_label = choice_var.get()
         if sel_label == "(Sin lógica)":
             current_row['logic'].set("")
         else:
-            trigger_idx = -1
-            for m in trigger_map:
-                if m['label'] == sel_label:
-                    trigger_idx = m['index']
-                    break
+            trigger_idx = trigger_idx_by_label.get(sel_label, -1)
             if trigger_idx != -1 and val_var.get():
                 current_row['logic'].set(f"{trigger_idx}|{val_var.get()}")
 
@@ -129,8 +130,7 @@ def show_field_settings(app, current_row):
         else:
             current_row['logic_btn'].configure(fg_color="transparent", text_color=("#8E8E93", "gray"))
 
-        app.save_state_to_undo()
-        app.update_preview()
+        # Obligatorio/validación/lógica no se dibujan en la vista previa: no hace falta re-renderizar
         dialog.destroy()
 
     ctk.CTkButton(dialog, text="Guardar Cambios", command=save_settings, 
@@ -132,6 +132,27 @@ class PropertiesPanel(ctk.CTkFrame):
             properties = self.get_properties()
             self.on_property_changed(properties)
     
+    @staticmethod
+    def _set_var(var, value):
+        """Escribe en la variable solo si cambia (cada set dispara sus traces aunque el valor sea igual)."""
+        if var.get() != value:
+            var.set(value)
+    
+    @staticmethod
+    def _set_entry(entry, text):
+        """Sustituye el texto del entry solo si es distinto del actual."""
+        if entry.get() != text:
+            entry.delete(0, "end")
+            entry.insert(0, text)
+    
+    def _show_options(self, visible):
+        """Muestra u oculta el campo de opciones sin re-empaquetar si ya está en ese estado."""
+        if visible != bool(self.options_entry.winfo_manager()):
+            if visible:
+                self.options_entry.pack(fill="x", pady=(0, 10))
+            else:
+                self.options_entry.pack_forget()
+    
     def set_field(self, field):
         """
         Establece el campo actual para editar.
@@ -143,42 +164,35 @@ class PropertiesPanel(ctk.CTkFrame):
         self.current_field = field
         
         if field:
-            # Actualizar valores
-            self.name_entry.delete(0, "end")
-            self.name_entry.insert(0, field.label)
+            # Actualizar valores (solo los que cambian respecto a lo mostrado)
+            self._set_entry(self.name_entry, field.label)
             
-            self.type_var.set(field.type)
-            self.font_size_var.set(str(field.font_size))
-            self.required_var.set(field.required)
-            self.validation_var.set(field.validation)
+            self._set_var(self.type_var, field.type)
+            self._set_var(self.font_size_var, str(field.font_size))
+            self._set_var(self.required_var, field.required)
+            self._set_var(self.validation_var, field.validation)
             
             # Max length
-            self.max_length_entry.delete(0, "end")
-            self.max_length_entry.insert(0, str(field.max_length))
+            self._set_entry(self.max_length_entry, str(field.max_length))
             
             # Opciones
             if field.options:
-                self.options_entry.delete(0, "end")
-                self.options_entry.insert(0, ", ".join(field.options))
+                self._set_entry(self.options_entry, ", ".join(field.options))
             
             # Mostrar/ocultar opciones
-            if field.type in ["dropdown", "radio"]:
-                self.options_entry.pack(fill="x", pady=(0, 10))
-            else:
-                self.options_entry.pack_forget()
+            self._show_options(field.type in ["dropdown", "radio"])
             
             self.help_label.pack_forget()
         else:
             # Limpiar
-            self.name_entry.delete(0, "end")
-            self.type_var.set("text")
-            self.font_size_var.set("12")
-            self.required_var.set(False)
-            self.validation_var.set("Ninguno")
-            self.max_length_entry.delete(0, "end")
-            self.max_length_entry.insert(0, "0")
-            self.options_entry.delete(0, "end")
-            self.options_entry.pack_forget()
+            self._set_entry(self.name_entry, "")
+            self._set_var(self.type_var, "text")
+            self._set_var(self.font_size_var, "12")
+            self._set_var(self.required_var, False)
+            self._set_var(self.validation_var, "Ninguno")
+            self._set_entry(self.max_length_entry, "0")
+            self._set_entry(self.options_entry, "")
+            self._show_options(False)
             self.help_label.pack(pady=20)
         
         self._updating = False
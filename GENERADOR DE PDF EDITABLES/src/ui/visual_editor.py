@@ -12,17 +12,25 @@ Características:
 """
 
 import customtkinter as ctk
-from tkinter import Canvas
+from tkinter import Canvas, Menu, simpledialog
 from PIL import Image, ImageTk
 from typing import List, Dict, Optional, Callable, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
 import logging
 
+from src.ui.properties_panel import PropertiesPanel
+
 logger = logging.getLogger(__name__)
 
 
 class FieldBox:
     """Representa un campo visual en el canvas"""
     
+    # Atributos fijos: sin __dict__ por instancia (menos memoria y accesos más rápidos en el hit-test)
+    __slots__ = ('x', 'y', 'w', 'h', 'label', 'page', 'type', 'options', 'font_size', 'required',
+                 'validation', 'max_length', 'is_original', 'selected', 'canvas_id', 'text_id')
+    
     def __init__(self, x: float, y: float, w: float, h: float, label: str = "Campo", page: int = 0, 
                  field_type: str = "text", options: list = None, font_size: int = 12, 
                  required: bool = False, validation: str = "Ninguno", max_length: int = 0,
@@ -75,6 +83,19 @@ class FieldBox:
 class PDFVisualEditor(ctk.CTkFrame):
     """Editor visual interactivo para PDFs"""
     
+    # Tamaño de celda (px) de la rejilla espacial usada para localizar campos bajo el cursor
+    GRID_CELL = 128
+    # Distancia (px) al borde derecho/inferior a partir de la cual un arrastre redimensiona
+    EDGE_THRESHOLD = 10
+    # Propiedades de FieldBox que edita el panel de propiedades
+    EDITABLE_PROPERTIES = ('label', 'type', 'font_size', 'required', 'validation', 'options', 'max_length')
+    # Lado (px) de las teselas en que se divide la imagen de la página
+    BG_TILE = 512
+    # Memoria máxima (bytes, RGBA) de teselas convertidas que se conservan entre cambios de página
+    TILE_CACHE_BYTES = 96 * 1024 * 1024
+    # PhotoImages desalojados de la LRU que se guardan (por tamaño) para reutilizarlos con paste()
+    TILE_SPARES = 8
+    
     def __init__(
         self, 
         parent,
@@ -96,12 +117,54 @@ class PDFVisualEditor(ctk.CTkFrame):
         self.fields: List[FieldBox] = []
         self.selected_field: Optional[FieldBox] = None  # Campo principal seleccionado
         self.selected_fields: List[FieldBox] = []  # Lista de campos seleccionados (multi-select)
+        self._selected_ids: set = set()  # id() de selected_fields, para comprobar pertenencia en O(1)
         self.drag_start: Optional[Tuple[float, float]] = None
+        self._last_drag_xy: Optional[Tuple[float, float]] = None  # Último punto procesado del arrastre
         self.drag_mode: Optional[str] = None  # 'create', 'move', 'resize'
         self.creating_field: Optional[FieldBox] = None
         self.current_page: int = 0  # Página actual del PDF
         self.clipboard_field: Optional[Dict] = None  # Para copiar/pegar
         
+        # Rejilla espacial ((página, celda x, celda y) -> campos); se actualiza campo a campo y solo
+        # se reconstruye entera tras cambios masivos (set_fields, clear_fields)
+        self._grid: Dict[Tuple[int, int, int], List[FieldBox]] = {}
+        self._grid_cells: Dict[int, List[Tuple[int, int, int]]] = {}  # id(campo) -> celdas que ocupa
+        # Campos de cada página en orden de dibujo (se mantiene junto con la rejilla)
+        self._fields_by_page: Dict[int, List[FieldBox]] = {}
+        self._drawn_fields: List[FieldBox] = []  # Campos con items asignados en el último redibujado
+        self._grid_dirty = True
+        self._creating_id = None        # Rectángulo del campo en creación (se oculta al terminar)
+        # Pools de items del canvas (rectángulo y etiqueta por campo visible): se reconfiguran en
+        # cada redibujado en vez de borrarse y crearse; los sobrantes quedan ocultos
+        self._rect_pool: List[int] = []
+        self._text_pool: List[int] = []
+        self._pool_shown = 0            # Items del pool visibles tras el último redibujado
+        # Último estado aplicado a cada rectángulo del pool (geometría, color, línea, etiqueta):
+        # si no cambia, el redibujado no repite las llamadas a Tk
+        self._item_state: Dict[int, tuple] = {}
+        self._redraw_pending = False    # Redibujado completo ya programado con after_idle
+        self._redraw_depth = 0          # Anidamiento de batch_redraw(): mientras > 0 no se redibuja
+        self._redraw_deferred = False   # Hubo algún redibujado pedido dentro de batch_redraw()
+        self._dirty_fields = set()      # Campos a reposicionar en el próximo ciclo ocioso
+        self._sync_pending = False      # Reposicionado parcial ya programado con after_idle
+        # Fondo en teselas de BG_TILE px: cada una se convierte a PhotoImage solo al entrar en la vista.
+        # Los items (origen de la tesela -> id) se reutilizan al cambiar de página
+        self._tile_items: Dict[Tuple[int, int], int] = {}
+        self._tile_photos: Dict[Tuple[int, int], ImageTk.PhotoImage] = {}
+        # LRU (id(imagen), x, y) -> (imagen, PhotoImage, bytes): volver a una página ya vista no
+        # repite la conversión. La imagen se guarda en la entrada para que su id no se reutilice
+        self._tile_cache: "OrderedDict[Tuple[int, int, int], tuple]" = OrderedDict()
+        self._tile_cache_bytes = 0
+        self._tile_spares: Dict[Tuple[int, int], List[ImageTk.PhotoImage]] = {}
+        self._tiles_pending = False     # Conversión de teselas ya programada con after_idle
+        self._cursor = "crosshair"     # Cursor actual del canvas
+        self._pointer_in_canvas = False  # Mantenido con <Enter>/<Leave> del canvas
+        # Pasos de rueda pendientes de aplicar (se agrupan por ciclo ocioso)
+        self._wheel_dx = 0
+        self._wheel_dy = 0
+        self._wheel_pending = False
+        self._drawn_view = None         # Zona del canvas cubierta por el último redibujado completo
+        
         # Configuración
         self.field_color = "#3498db"
         self.selected_color = "#e74c3c"
@@ -143,10 +206,11 @@ class PDFVisualEditor(ctk.CTkFrame):
         self.h_scrollbar = ctk.CTkScrollbar(self.container, orientation="horizontal", command=self.canvas.xview)
         self.h_scrollbar.grid(row=1, column=0, sticky="ew")
         
-        self.canvas.configure(yscrollcommand=self.v_scrollbar.set, xscrollcommand=self.h_scrollbar.set)
+        # Al cambiar la vista (scroll o tamaño) se redibuja para mostrar los campos que entran en ella
+        self.canvas.configure(yscrollcommand=lambda *a: self._on_view_changed(self.v_scrollbar, *a),
+                              xscrollcommand=lambda *a: self._on_view_changed(self.h_scrollbar, *a))
         
         # Panel de propiedades a la derecha
-        from src.ui.properties_panel import PropertiesPanel
         self.properties_panel = PropertiesPanel(self, on_property_changed=self._on_property_changed)
         self.properties_panel.grid(row=0, column=1, sticky="nsew", padx=(10, 0))
         self.properties_panel.configure(width=250)
@@ -158,6 +222,9 @@ class PDFVisualEditor(ctk.CTkFrame):
         self.canvas.bind("<Double-Button-1>", self._on_double_click)
         self.canvas.bind("<Motion>", self._on_mouse_move)
         self.canvas.bind("<Button-3>", self._show_context_menu)  # Clic derecho
+        # Puntero sobre el canvas: lo consultan los _handle_* sin preguntar al servidor gráfico
+        self.canvas.bind("<Enter>", lambda e: setattr(self, "_pointer_in_canvas", True))
+        self.canvas.bind("<Leave>", lambda e: setattr(self, "_pointer_in_canvas", False))
         
         # Atajos de teclado - bindings en el canvas
         self.canvas.bind("<Control-c>", lambda e: self.copy_selected_field() or "break")
@@ -194,21 +261,172 @@ class PDFVisualEditor(ctk.CTkFrame):
         """
         self.pdf_image = image
         
-        # Convertir a PhotoImage
-        self.photo = ImageTk.PhotoImage(image)
-        
-        # Limpiar canvas
-        self.canvas.delete("all")
+        # Cambio de página (o de fondo): la selección múltiple era de la página anterior
+        self._clear_multi_selection()
         
-        # Dibujar imagen
-        self.canvas.create_image(0, 0, anchor="nw", image=self.photo)
+        # Las teselas de la página anterior se ocultan; las de esta se crean según se vean
+        self._tile_photos = {}
+        for item in self._tile_items.values():
+            self.canvas.itemconfig(item, state="hidden")
         
         # Configurar región de desplazamiento
         self.canvas.config(scrollregion=(0, 0, image.width, image.height))
+        self._update_tiles()
         
         # Redibujar campos existentes (solo de esta página)
         self._redraw_fields()
     
+    def _update_tiles(self):
+        """Convierte y muestra las teselas del fondo que caen en la zona visible (con margen)."""
+        image = self.pdf_image
+        if image is None:
+            return
+        tile = self.BG_TILE
+        view = self._view_bounds() or (0, 0, image.width, image.height)
+        x0, y0 = max(0, int(view[0] // tile) * tile), max(0, int(view[1] // tile) * tile)
+        x1, y1 = min(image.width, view[2]), min(image.height, view[3])
+        for ty in range(y0, int(y1), tile):
+            for tx in range(x0, int(x1), tile):
+                key = (tx, ty)
+                if key in self._tile_photos:
+                    continue
+                photo = self._tile_photo(image, tx, ty)
+                self._tile_photos[key] = photo  # Referencia: evita que el GC libere la imagen
+                item = self._tile_items.get(key)
+                if item is None:
+                    item = self._tile_items[key] = self.canvas.create_image(tx, ty, anchor="nw", image=photo, tags="bg")
+                    self.canvas.tag_lower(item)
+                else:
+                    self.canvas.itemconfig(item, image=photo, state="normal")
+    
+    def _flush_tiles(self):
+        self._tiles_pending = False
+        self._update_tiles()
+    
+    def _tile_photo(self, image: Image.Image, tx: int, ty: int) -> ImageTk.PhotoImage:
+        """PhotoImage de la tesela con origen (tx, ty), desde la LRU o convertida y añadida a ella."""
+        cache = self._tile_cache
+        key = (id(image), tx, ty)
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            return entry[1]
+        
+        tile = self.BG_TILE
+        box = (tx, ty, min(tx + tile, image.width), min(ty + tile, image.height))
+        size = (box[2] - tx, box[3] - ty)
+        spares = self._tile_spares.get(size)
+        if spares:
+            # Reutilizar un PhotoImage desalojado del mismo tamaño: se copian los píxeles sin crear otra imagen Tk
+            photo = spares.pop()
+            photo.paste(image.crop(box))
+        else:
+            photo = ImageTk.PhotoImage(image.crop(box))
+        nbytes = size[0] * size[1] * 4
+        cache[key] = (image, photo, nbytes)
+        self._tile_cache_bytes += nbytes
+        # Las teselas de la página actual siguen referenciadas en _tile_photos aunque salgan de la LRU;
+        # las demás desalojadas se guardan (hasta TILE_SPARES por tamaño) para la próxima conversión
+        shown = None
+        while self._tile_cache_bytes > self.TILE_CACHE_BYTES and len(cache) > 1:
+            _, (_, old_photo, old_bytes) = cache.popitem(last=False)
+            self._tile_cache_bytes -= old_bytes
+            if shown is None:
+                shown = {id(p) for p in self._tile_photos.values()}
+            if id(old_photo) not in shown:
+                old_spares = self._tile_spares.setdefault((old_photo.width(), old_photo.height()), [])
+                if len(old_spares) < self.TILE_SPARES:
+                    old_spares.append(old_photo)
+        return photo
+    
+    def _rebuild_grid(self):
+        """Reparte todos los campos, de todas las páginas, en celdas de GRID_CELL px y en listas por página."""
+        self._grid = {}
+        self._grid_cells = {}
+        self._fields_by_page = {}
+        for field in self.fields:
+            self._grid_insert(field)
+            self._fields_by_page.setdefault(field.page, []).append(field)
+        self._grid_dirty = False
+    
+    def _page_fields(self) -> List[FieldBox]:
+        """Campos de la página actual, en orden de dibujo."""
+        if self._grid_dirty:
+            self._rebuild_grid()
+        return self._fields_by_page.get(self.current_page, [])
+    
+    def _clear_multi_selection(self) -> List[FieldBox]:
+        """Vacía la selección múltiple; devuelve los campos que la formaban (para repintarlos)."""
+        previous = self.selected_fields
+        for field in previous:
+            field.selected = False
+        self.selected_fields = []
+        self._selected_ids = set()
+        return previous
+    
+    def _multi_selection(self) -> List[FieldBox]:
+        """Campos de la selección múltiple que siguen existiendo y están en la página actual."""
+        live = {id(f) for f in self._page_fields()}
+        return [f for f in self.selected_fields if id(f) in live]
+    
+    def _add_field(self, field: FieldBox):
+        """Añade un campo al final (encima de los demás) y lo indexa en la rejilla y en su página."""
+        self.fields.append(field)
+        if not self._grid_dirty:
+            self._grid_insert(field)
+            self._fields_by_page.setdefault(field.page, []).append(field)
+    
+    def _remove_field(self, field: FieldBox):
+        """Quita un campo de la lista, de la rejilla y de su página."""
+        self.fields.remove(field)
+        if not self._grid_dirty:
+            self._grid_remove(field)
+            self._fields_by_page[field.page].remove(field)
+    
+    def _grid_insert(self, field: FieldBox):
+        """Añade un campo a las celdas que cubre su rectángulo."""
+        cell = self.GRID_CELL
+        keys = [(field.page, cx, cy)
+                for cx in range(int(field.x // cell), int((field.x + field.w) // cell) + 1)
+                for cy in range(int(field.y // cell), int((field.y + field.h) // cell) + 1)]
+        for key in keys:
+            self._grid.setdefault(key, []).append(field)
+        self._grid_cells[id(field)] = keys
+    
+    def _grid_remove(self, field: FieldBox):
+        """Quita un campo de las celdas en las que se insertó."""
+        for key in self._grid_cells.pop(id(field), ()):
+            bucket = self._grid[key]
+            bucket.remove(field)
+            if not bucket:
+                del self._grid[key]
+    
+    def _grid_update(self, field: FieldBox):
+        """Recoloca un campo movido o redimensionado en la rejilla."""
+        if not self._grid_dirty:
+            self._grid_remove(field)
+            self._grid_insert(field)
+    
+    def _fields_at(self, x: float, y: float) -> List[FieldBox]:
+        """Campos de la página actual que contienen el punto, en orden de dibujo (el último queda encima)."""
+        if self._grid_dirty:
+            self._rebuild_grid()
+        key = (self.current_page, int(x // self.GRID_CELL), int(y // self.GRID_CELL))
+        # Prueba AABB en línea (sin llamada a contains_point por candidato)
+        hits = [f for f in self._grid.get(key, ()) if f.x <= x <= f.x + f.w and f.y <= y <= f.y + f.h]
+        if len(hits) > 1:
+            # Las celdas se rellenan en orden de inserción: solapes raros, se ordenan por orden de dibujo
+            order = {id(f): i for i, f in enumerate(self._fields_by_page[self.current_page])}
+            hits.sort(key=lambda f: order[id(f)])
+        return hits
+    
+    def _drag_mode_at(self, field: FieldBox, x: float, y: float) -> str:
+        """'resize' si el punto está junto al borde derecho o inferior del campo; si no, 'move'."""
+        t = self.EDGE_THRESHOLD
+        if abs(x - (field.x + field.w)) < t or abs(y - (field.y + field.h)) < t:
+            return 'resize'
+        return 'move'
+    
     def _on_mouse_move(self, event):
         """Maneja el movimiento del mouse para cambiar el cursor"""
         if self.drag_mode:
@@ -218,21 +436,23 @@ class PDFVisualEditor(ctk.CTkFrame):
         y = self.canvas.canvasy(event.y)
         
         # Verificar si está sobre un campo de la página actual
-        for field in reversed(self.fields):
-            if field.page == self.current_page and field.contains_point(x, y):
-                # Verificar si está en el borde para resize
-                edge_threshold = 10
-                at_right_edge = abs(x - (field.x + field.w)) < edge_threshold
-                at_bottom_edge = abs(y - (field.y + field.h)) < edge_threshold
-                
-                if at_right_edge or at_bottom_edge:
-                    self.canvas.config(cursor="bottom_right_corner")
-                else:
-                    self.canvas.config(cursor="fleur")
-                return
+        hits = self._fields_at(x, y)
+        if hits:
+            # Verificar si está en el borde para resize
+            if self._drag_mode_at(hits[-1], x, y) == 'resize':
+                self._set_cursor("bottom_right_corner")
+            else:
+                self._set_cursor("fleur")
+            return
         
         # Cursor por defecto
-        self.canvas.config(cursor="crosshair")
+        self._set_cursor("crosshair")
+    
+    def _set_cursor(self, cursor: str):
+        """Cambia el cursor del canvas solo si es distinto del actual (evita una llamada a Tk por píxel)."""
+        if cursor != self._cursor:
+            self._cursor = cursor
+            self.canvas.config(cursor=cursor)
     
     def _on_mouse_down(self, event):
         """Maneja el botón del mouse presionado"""
@@ -241,13 +461,14 @@ class PDFVisualEditor(ctk.CTkFrame):
         
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
+        self._last_drag_xy = (x, y)
         
         # Verificar si se hizo clic en un campo existente de la página actual
-        clicked_field = None
-        for field in reversed(self.fields):
-            if field.page == self.current_page and field.contains_point(x, y):
-                clicked_field = field
-                break
+        hits = self._fields_at(x, y)
+        clicked_field = hits[-1] if hits else None
+        previous = self.selected_field
+        # Un clic simple sustituye a la selección múltiple
+        deselected = self._clear_multi_selection()
         
         if clicked_field:
             # Seleccionar campo existente
@@ -256,14 +477,7 @@ class PDFVisualEditor(ctk.CTkFrame):
             self.drag_start = (x, y)
             
             # Determinar modo de arrastre
-            edge_threshold = 10
-            at_right_edge = abs(x - (clicked_field.x + clicked_field.w)) < edge_threshold
-            at_bottom_edge = abs(y - (clicked_field.y + clicked_field.h)) < edge_threshold
-            
-            if at_right_edge or at_bottom_edge:
-                self.drag_mode = 'resize'
-            else:
-                self.drag_mode = 'move'
+            self.drag_mode = self._drag_mode_at(clicked_field, x, y)
         else:
             # Empezar a crear nuevo campo
             self.drag_mode = 'create'
@@ -276,7 +490,8 @@ class PDFVisualEditor(ctk.CTkFrame):
             self.selected_field = None
             self.properties_panel.set_field(None)  # Limpiar panel
         
-        self._redraw_fields()
+        # Solo cambian de color los campos que pierden la selección y el que la gana
+        self._sync_fields({previous, clicked_field, *deselected})
     
     def _on_mouse_drag(self, event):
         """Maneja el arrastre del mouse"""
@@ -285,6 +500,10 @@ class PDFVisualEditor(ctk.CTkFrame):
         
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
+        # Tk repite <B1-Motion> sin desplazamiento real (jitter del touchpad): nada que hacer
+        if (x, y) == self._last_drag_xy:
+            return
+        self._last_drag_xy = (x, y)
         
         if self.drag_mode == 'create':
             # Actualizar tamaño del campo que se está creando
@@ -312,7 +531,68 @@ class PDFVisualEditor(ctk.CTkFrame):
             self.selected_field.h = new_h
             self.drag_start = (x, y)
         
-        self._redraw_fields()
+        # Durante el arrastre solo se reposicionan los items afectados, una vez por ciclo ocioso
+        # aunque lleguen varios <B1-Motion>; el redibujado completo, al soltar
+        self._schedule_sync(None if self.drag_mode == 'create' else self.selected_field)
+    
+    def _update_field_items(self, field: FieldBox):
+        """Reposiciona el rectángulo y la etiqueta ya dibujados de un campo."""
+        if field.canvas_id is None:
+            return
+        self._item_state.pop(field.canvas_id, None)
+        self.canvas.coords(field.canvas_id, field.x, field.y, field.x + field.w, field.y + field.h)
+        self.canvas.coords(field.text_id, field.x + 5, field.y + field.h / 2)
+    
+    def _update_creating_item(self):
+        """Crea (la primera vez), reposiciona u oculta el rectángulo del campo en creación."""
+        f = self.creating_field
+        if not f or f.w <= 0 or f.h <= 0:
+            if self._creating_id is not None:
+                self.canvas.itemconfig(self._creating_id, state="hidden")
+            return
+        if self._creating_id is None:
+            self._creating_id = self.canvas.create_rectangle(
+                f.x, f.y, f.x + f.w, f.y + f.h,
+                outline=self.creating_color, width=2, dash=(5, 5), tags="field"
+            )
+        else:
+            self.canvas.coords(self._creating_id, f.x, f.y, f.x + f.w, f.y + f.h)
+            self.canvas.itemconfig(self._creating_id, state="normal")
+            self.canvas.tag_raise(self._creating_id)
+    
+    def _schedule_sync(self, field: Optional[FieldBox] = None):
+        """Marca un campo para reposicionar y programa un único refresco con after_idle."""
+        if field is not None:
+            self._dirty_fields.add(field)
+        if not self._sync_pending:
+            self._sync_pending = True
+            self.canvas.after_idle(self._flush_sync)
+    
+    def _flush_sync(self):
+        """Reposiciona los campos marcados y el campo en creación con su geometría actual."""
+        self._sync_pending = False
+        dirty, self._dirty_fields = self._dirty_fields, set()
+        view = self._view_bounds()
+        for field in dirty:
+            if field.canvas_id is None:
+                # Campo recortado que ha entrado en la vista (p. ej. movido con las flechas)
+                if field.page == self.current_page and self._in_view(field, view):
+                    self._request_redraw()
+                continue
+            self._update_field_items(field)
+        if self.creating_field is not None:
+            self._update_creating_item()
+    
+    def _request_redraw(self):
+        """Programa un único redibujado completo cuando Tk quede libre (agrupa ráfagas)."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.canvas.after_idle(self._flush_redraw)
+    
+    def _flush_redraw(self):
+        # Si entretanto ya se redibujó todo (p. ej. llamada directa a _redraw_fields), no se repite
+        if self._redraw_pending:
+            self._redraw_fields()
     
     def _on_mouse_up(self, event):
         """Maneja la liberación del mouse"""
@@ -320,7 +600,7 @@ class PDFVisualEditor(ctk.CTkFrame):
             # Finalizar creación del campo
             # Solo añadir si tiene un tamaño mínimo
             if self.creating_field.w > 20 and self.creating_field.h > 10:
-                self.fields.append(self.creating_field)
+                self._add_field(self.creating_field)
                 self.selected_field = self.creating_field
                 self.properties_panel.set_field(self.creating_field)  # Actualizar panel
                 logger.info(f"Campo creado: {self.creating_field.label}")
@@ -332,80 +612,192 @@ class PDFVisualEditor(ctk.CTkFrame):
             self.creating_field = None
         
         elif self.drag_mode in ['move', 'resize']:
+            if self.selected_field:
+                self._grid_update(self.selected_field)
             # Notificar cambios después de mover/redimensionar
             if self.on_fields_changed:
                 self.on_fields_changed(self.get_fields())
         
+        created = self.drag_mode == 'create'
         self.drag_start = None
         self.drag_mode = None
-        self.canvas.config(cursor="crosshair")
-        self._redraw_fields()
+        self._set_cursor("crosshair")
+        if created:
+            self._request_redraw()  # Campo nuevo: necesita items del pool
+        else:
+            self._sync_fields({self.selected_field})
     
     def _on_double_click(self, event):
         """Maneja el doble clic para editar propiedades"""
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
         
-        for field in self.fields:
-            if field.contains_point(x, y):
-                self._edit_field_properties(field)
-                break
+        hits = self._fields_at(x, y)
+        if hits:
+            self._edit_field_properties(hits[0])
     
-    def _redraw_fields(self):
-        """Redibuja todos los campos en el canvas"""
-        # Eliminar campos anteriores
-        self.canvas.delete("field")
+    def _field_style(self, field: FieldBox, multi: set) -> Tuple[str, object]:
+        """Color y patrón de línea de un campo según su estado de selección."""
+        in_multi = id(field) in multi
+        if in_multi:
+            # Campo en selección múltiple
+            color = self.multi_selected_color
+        elif field is self.selected_field:
+            # Campo principal seleccionado
+            color = self.selected_color
+        else:
+            # Campo normal u original
+            color = self.original_color if field.is_original else self.field_color
         
-        # Dibujar cada campo de la página actual
-        for field in self.fields:
-            if field.page != self.current_page:
+        # Determinar estilo de línea (discontinuo para originales si no están seleccionados)
+        dash = (5, 2) if field.is_original and field is not self.selected_field and not in_multi else ""
+        return color, dash
+    
+    def _sync_fields(self, dirty=None):
+        """
+        Actualiza en el canvas solo los campos de 'dirty' (posición, color y etiqueta).
+        Sin 'dirty', o si alguno aún no tiene items dibujados, hace el redibujado completo.
+        """
+        if dirty is None:
+            self._redraw_fields()
+            return
+        dirty = [field for field in dirty if field is not None]
+        view = self._view_bounds()
+        if any(field.canvas_id is None and field.page == self.current_page and self._in_view(field, view)
+               for field in dirty):
+            self._redraw_fields()
+            return
+        canvas = self.canvas
+        multi = self._selected_ids
+        for field in dirty:
+            if field.canvas_id is None:
+                continue  # Campo de otra página o fuera de la vista
+            color, dash = self._field_style(field, multi)
+            self._item_state.pop(field.canvas_id, None)
+            canvas.coords(field.canvas_id, field.x, field.y, field.x + field.w, field.y + field.h)
+            canvas.itemconfig(field.canvas_id, outline=color, dash=dash)
+            canvas.coords(field.text_id, field.x + 5, field.y + field.h / 2)
+            canvas.itemconfig(field.text_id, text=field.label, fill=color)
+    
+    def _view_bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Zona del canvas (en coordenadas del canvas) que se dibuja: la parte visible más medio
+        viewport de margen por cada lado. None si el canvas aún no tiene tamaño (no se recorta).
+        """
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if w <= 1 or h <= 1:
+            return None
+        x0, y0 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        return (x0 - w / 2, y0 - h / 2, x0 + w * 1.5, y0 + h * 1.5)
+    
+    @staticmethod
+    def _in_view(field: FieldBox, view) -> bool:
+        return view is None or (field.x <= view[2] and field.x + field.w >= view[0] and
+                                field.y <= view[3] and field.y + field.h >= view[1])
+    
+    def _on_view_changed(self, scrollbar, first, last):
+        """Actualiza la barra de scroll y, si la vista sale de la zona dibujada, redibuja."""
+        scrollbar.set(first, last)
+        # Durante un scroll rápido llegan muchos eventos: las teselas nuevas se convierten una vez
+        # cuando Tk queda libre, no en cada paso de la rueda
+        if not self._tiles_pending:
+            self._tiles_pending = True
+            self.canvas.after_idle(self._flush_tiles)
+        view = self._view_bounds()
+        drawn = self._drawn_view
+        if drawn is None or view is None:
+            if drawn is not view:
+                self._request_redraw()
+            return
+        # Se redibuja solo si la parte visible se acerca al borde de lo ya dibujado
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        vx0, vy0 = view[0] + w / 2, view[1] + h / 2
+        if vx0 < drawn[0] or vy0 < drawn[1] or vx0 + w > drawn[2] or vy0 + h > drawn[3]:
+            self._request_redraw()
+    
+    @contextmanager
+    def batch_redraw(self):
+        """
+        Agrupa varias operaciones (limpiar, cargar página, añadir campos...) en un único
+        redibujado completo al salir. Es reentrante: solo redibuja el bloque más externo.
+        """
+        self._redraw_depth += 1
+        try:
+            yield
+        finally:
+            self._redraw_depth -= 1
+            if not self._redraw_depth and self._redraw_deferred:
+                self._redraw_deferred = False
+                self._redraw_fields()
+    
+    def _redraw_fields(self):
+        """Redibuja los campos de la página actual que caen en la zona visible (con margen)"""
+        self._redraw_pending = False
+        if self._redraw_depth:
+            self._redraw_deferred = True
+            return
+        canvas = self.canvas
+        multi = self._selected_ids
+        rect_pool, text_pool = self._rect_pool, self._text_pool
+        item_state, shown = self._item_state, self._pool_shown
+        view = self._drawn_view = self._view_bounds()
+        
+        # Los items se reasignan: se sueltan los del redibujado anterior (puede ser otra página)
+        for field in self._drawn_fields:
+            field.canvas_id = field.text_id = None
+        drawn = self._drawn_fields = []
+        
+        # Dibujar cada campo visible de la página actual reutilizando los items del pool
+        n = 0
+        for field in self._page_fields():
+            if not self._in_view(field, view):
                 continue
             
-            # Determinar color según si está seleccionado
-            if field in self.selected_fields:
-                # Campo en selección múltiple
-                color = self.multi_selected_color
-            elif field == self.selected_field:
-                # Campo principal seleccionado
-                color = self.selected_color
-            else:
-                # Campo normal u original
-                color = self.original_color if field.is_original else self.field_color
-            
-            # Determinar estilo de línea (discontinuo para originales si no están seleccionados)
-            dash = (5, 2) if field.is_original and field != self.selected_field and field not in self.selected_fields else None
-            
-            # Rectángulo del campo
-            field.canvas_id = self.canvas.create_rectangle(
-                field.x, field.y,
-                field.x + field.w, field.y + field.h,
-                outline=color,
-                width=2,
-                dash=dash,
-                tags="field"
-            )
+            color, dash = self._field_style(field, multi)
             
-            # Etiqueta del campo
-            field.text_id = self.canvas.create_text(
-                field.x + 5, field.y + field.h / 2,
-                text=field.label,
-                anchor="w",
-                fill=color,
-                font=("Arial", 10, "bold"),
-                tags="field"
-            )
+            state = (field.x, field.y, field.w, field.h, color, dash, field.label)
+            if n < len(rect_pool):
+                # Rectángulo y etiqueta del campo (items existentes); sin cambios, no se toca Tk
+                rect_id, text_id = rect_pool[n], text_pool[n]
+                if n >= shown or item_state.get(rect_id) != state:
+                    canvas.coords(rect_id, field.x, field.y, field.x + field.w, field.y + field.h)
+                    canvas.itemconfig(rect_id, outline=color, dash=dash, state="normal")
+                    canvas.coords(text_id, field.x + 5, field.y + field.h / 2)
+                    canvas.itemconfig(text_id, text=field.label, fill=color, state="normal")
+                    item_state[rect_id] = state
+            else:
+                # Pool agotado: crear items nuevos (crece hasta el máximo de campos visibles)
+                rect_id = canvas.create_rectangle(
+                    field.x, field.y,
+                    field.x + field.w, field.y + field.h,
+                    outline=color,
+                    width=2,
+                    dash=dash,
+                    tags="field"
+                )
+                text_id = canvas.create_text(
+                    field.x + 5, field.y + field.h / 2,
+                    text=field.label,
+                    anchor="w",
+                    fill=color,
+                    font=("Arial", 10, "bold"),
+                    tags="field"
+                )
+                rect_pool.append(rect_id)
+                text_pool.append(text_id)
+                item_state[rect_id] = state
+            field.canvas_id, field.text_id = rect_id, text_id
+            drawn.append(field)
+            n += 1
+        
+        # Ocultar los items sobrantes del pool (los que ya estaban ocultos no se tocan)
+        for i in range(n, shown):
+            canvas.itemconfig(rect_pool[i], state="hidden")
+            canvas.itemconfig(text_pool[i], state="hidden")
+        self._pool_shown = n
         
         # Dibujar campo en creación
-        if self.creating_field and self.creating_field.w > 0 and self.creating_field.h > 0:
-            self.canvas.create_rectangle(
-                self.creating_field.x, self.creating_field.y,
-                self.creating_field.x + self.creating_field.w,
-                self.creating_field.y + self.creating_field.h,
-                outline=self.creating_color,
-                width=2,
-                dash=(5, 5),
-                tags="field"
-            )
+        self._update_creating_item()
     
     def _edit_field_properties(self, field: FieldBox):
         """
@@ -416,7 +808,6 @@ class PDFVisualEditor(ctk.CTkFrame):
         """
         # TODO: Implementar diálogo de propiedades
         # Por ahora, solo cambiar el nombre
-        from tkinter import simpledialog
         new_label = simpledialog.askstring(
             "Editar Campo",
             "Nombre del campo:",
@@ -425,7 +816,7 @@ class PDFVisualEditor(ctk.CTkFrame):
         
         if new_label:
             field.label = new_label
-            self._redraw_fields()
+            self._sync_fields({field})
             
             # Notificar cambios
             if self.on_fields_changed:
@@ -463,8 +854,9 @@ class PDFVisualEditor(ctk.CTkFrame):
             max_length=field_data.get('max_length', 0),
             is_original=field_data.get('is_original', False)
         )
-        self.fields.append(field)
-        self._redraw_fields()
+        self._add_field(field)
+        # Se suele llamar en bucle al importar: un solo redibujado cuando Tk quede libre
+        self._request_redraw()
 
     def set_fields(self, fields: List[Dict]):
         """
@@ -474,6 +866,7 @@ class PDFVisualEditor(ctk.CTkFrame):
             fields: Lista de campos
         """
         self.fields.clear()
+        self._clear_multi_selection()
         
         for field_data in fields:
             abs_pos = field_data.get('abs_pos', {})
@@ -487,11 +880,14 @@ class PDFVisualEditor(ctk.CTkFrame):
             )
             self.fields.append(field)
         
+        self._grid_dirty = True
         self._redraw_fields()
     
     def clear_fields(self):
         """Elimina todos los campos"""
         self.fields.clear()
+        self._clear_multi_selection()
+        self._grid_dirty = True
         self.selected_field = None
         self._redraw_fields()
         
@@ -502,7 +898,11 @@ class PDFVisualEditor(ctk.CTkFrame):
     def delete_selected_field(self):
         """Elimina el campo seleccionado"""
         if self.selected_field:
-            self.fields.remove(self.selected_field)
+            self._remove_field(self.selected_field)
+            # El campo borrado no puede seguir en la selección múltiple
+            if id(self.selected_field) in self._selected_ids:
+                self._selected_ids.discard(id(self.selected_field))
+                self.selected_fields.remove(self.selected_field)
             self.selected_field = None
             self.properties_panel.set_field(None)
             self._redraw_fields()
@@ -540,10 +940,11 @@ class PDFVisualEditor(ctk.CTkFrame):
             validation=field_data.get('validation', 'Ninguno')
         )
         
-        self.fields.append(new_field)
+        self._add_field(new_field)
+        self._clear_multi_selection()  # El campo pegado queda como selección única
         self.selected_field = new_field
         self.properties_panel.set_field(new_field)
-        self._redraw_fields()
+        self._request_redraw()  # Ctrl+V/Ctrl+D mantenidos: un redibujado por ciclo ocioso
         
         logger.info(f"Campo pegado: {new_field.label}")
         
@@ -558,11 +959,17 @@ class PDFVisualEditor(ctk.CTkFrame):
             self.paste_field()
     
     def move_selected_field(self, dx: float, dy: float):
-        """Mueve el campo seleccionado con las flechas del teclado"""
+        """Mueve el campo seleccionado (o toda la selección múltiple) con las flechas del teclado"""
         if self.selected_field:
-            self.selected_field.x += dx
-            self.selected_field.y += dy
-            self._redraw_fields()
+            # Igual que en _on_property_changed: con varios seleccionados se aplica a todos
+            # (solo los que siguen existiendo y están en la página actual)
+            multi = self._multi_selection()
+            fields_to_move = multi if len(multi) > 1 else [self.selected_field]
+            for field in fields_to_move:
+                field.x += dx
+                field.y += dy
+                self._grid_update(field)
+                self._schedule_sync(field)  # Un solo refresco por ciclo ocioso para todo el grupo
             
             # Notificar cambios
             if self.on_fields_changed:
@@ -570,22 +977,18 @@ class PDFVisualEditor(ctk.CTkFrame):
     
     def _show_context_menu(self, event):
         """Muestra menú contextual al hacer clic derecho"""
-        from tkinter import Menu
-        
         # Verificar si hay un campo bajo el cursor
         x = self.canvas.canvasx(event.x)
         y = self.canvas.canvasy(event.y)
         
-        clicked_field = None
-        for field in reversed(self.fields):
-            if field.contains_point(x, y):
-                clicked_field = field
-                break
+        hits = self._fields_at(x, y)
+        clicked_field = hits[-1] if hits else None
         
         if clicked_field:
+            previous = self.selected_field
             self.selected_field = clicked_field
             self.properties_panel.set_field(clicked_field)
-            self._redraw_fields()
+            self._sync_fields({previous, clicked_field})
         
         # Crear menú
         menu = Menu(self, tearoff=0)
@@ -608,19 +1011,24 @@ class PDFVisualEditor(ctk.CTkFrame):
             return
         
         # Si hay múltiples campos seleccionados, aplicar a todos
-        fields_to_update = self.selected_fields if len(self.selected_fields) > 1 else [self.selected_field]
+        multi = self._multi_selection()
+        fields_to_update = multi if len(multi) > 1 else [self.selected_field]
         
-        # Actualizar todos los campos seleccionados con nuevas propiedades
+        # Actualizar en los campos seleccionados solo las propiedades que cambian
+        changed_any = False
+        relabeled = []  # Solo la etiqueta se ve en el canvas: el resto no requiere redibujar
         for field in fields_to_update:
-            field.label = properties.get('label', field.label)
-            field.type = properties.get('type', field.type)
-            field.font_size = properties.get('font_size', field.font_size)
-            field.required = properties.get('required', field.required)
-            field.validation = properties.get('validation', field.validation)
-            field.options = properties.get('options', field.options)
-            field.max_length = properties.get('max_length', field.max_length)
-        
-        self._redraw_fields()
+            for attr in self.EDITABLE_PROPERTIES:
+                if attr in properties and getattr(field, attr) != properties[attr]:
+                    setattr(field, attr, properties[attr])
+                    changed_any = True
+                    if attr == 'label':
+                        relabeled.append(field)
+        
+        if not changed_any:
+            return
+        if relabeled:
+            self._sync_fields(relabeled)
         
         # Notificar cambios
         if self.on_fields_changed:
@@ -632,14 +1040,15 @@ class PDFVisualEditor(ctk.CTkFrame):
         if not self.fields:
             return
         
-        # Filtrar solo campos de la página actual
-        current_page_fields = [f for f in self.fields if f.page == self.current_page]
+        # Campos de la página actual
+        current_page_fields = self._page_fields()
         
         if not current_page_fields:
             return
         
         # Seleccionar todos los campos de la página actual
         self.selected_fields = current_page_fields.copy()
+        self._selected_ids = {id(f) for f in self.selected_fields}
         self.selected_field = current_page_fields[0]
         
         # Actualizar panel - mostrar el primero
@@ -655,7 +1064,7 @@ class PDFVisualEditor(ctk.CTkFrame):
     
     def deselect_all_fields(self):
         """Deselecciona todos los campos (Escape)"""
-        self.selected_fields.clear()
+        self._clear_multi_selection()
         self.selected_field = None
         self.properties_panel.set_field(None)
         self._redraw_fields()
@@ -664,44 +1073,61 @@ class PDFVisualEditor(ctk.CTkFrame):
     # Métodos para manejar atajos de teclado
     def _handle_copy(self):
         """Maneja Ctrl+C"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.copy_selected_field()
     
     def _handle_paste(self):
         """Maneja Ctrl+V"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.paste_field()
     
     def _handle_duplicate(self):
         """Maneja Ctrl+D"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.duplicate_selected_field()
     
     def _handle_delete(self):
         """Maneja Delete"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.delete_selected_field()
     
     def _handle_move(self, dx, dy):
         """Maneja flechas de dirección"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.move_selected_field(dx, dy)
     
     def _handle_select_all(self):
         """Maneja Ctrl+A"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.select_all_fields()
     
     def _handle_deselect_all(self):
         """Maneja Escape"""
-        if self.winfo_containing(self.winfo_pointerx(), self.winfo_pointery()) == self.canvas:
+        if self._pointer_in_canvas:
             self.deselect_all_fields()
 
 
     def _on_mouse_wheel(self, event):
         """Scroll vertical con la rueda del ratón"""
-        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        self._wheel_dy += int(-1*(event.delta/120))
+        self._schedule_wheel()
 
     def _on_mouse_wheel_h(self, event):
         """Scroll horizontal con la rueda del ratón (Shift + MouseWheel)"""
-        self.canvas.xview_scroll(int(-1*(event.delta/120)), "units")
+        self._wheel_dx += int(-1*(event.delta/120))
+        self._schedule_wheel()
+
+    def _schedule_wheel(self):
+        """Acumula los pasos de la rueda y desplaza una sola vez cuando Tk queda libre."""
+        if not self._wheel_pending:
+            self._wheel_pending = True
+            self.after_idle(self._flush_wheel)
+
+    def _flush_wheel(self):
+        self._wheel_pending = False
+        dx, dy = self._wheel_dx, self._wheel_dy
+        self._wheel_dx = self._wheel_dy = 0
+        if dy:
+            self.canvas.yview_scroll(dy, "units")
+        if dx:
+            self.canvas.xview_scroll(dx, "units")
@@ -6,29 +6,65 @@ import os
 import json
 import csv
 import io
+import atexit
+import threading
 from datetime import datetime
 from tkinter import filedialog, messagebox
 
+# orjson (opcional) es bastante más rápido; si no está instalado se usa json
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 class DataManager:
     def __init__(self, history_file="history.json"):
         self.history_file = history_file
         self.history = []
+        # Escritura diferida: las ráfagas de cambios se agrupan en una sola escritura
+        self._pending = None   # Copia del historial pendiente de escribir (None = nada sucio)
+        self._timer = None
+        self._io_lock = threading.Lock()
+        atexit.register(self._flush)
         self.load_history()
 
     def load_history(self):
         if os.path.exists(self.history_file):
             try:
-                with open(self.history_file, "r") as f:
-                    self.history = json.load(f)
+                with open(self.history_file, "rb") as f:
+                    self.history = _json_loads(f.read())
             except:
                 self.history = []
 
     def save_history(self):
-        try:
-            with open(self.history_file, "w") as f:
-                json.dump(self.history, f, indent=4)
-        except Exception as e:
-            print(f"No se pudo guardar el historial: {e}")
+        """Marca el historial como modificado y programa una única escritura en 0,5 s."""
+        with self._io_lock:
+            self._pending = list(self.history)
+            if self._timer is None:
+                self._timer = threading.Timer(0.5, self._flush)
+                self._timer.daemon = True  # Al salir escribe atexit, no el temporizador
+                self._timer.start()
+
+    def _flush(self):
+        """Escribe el historial pendiente, si lo hay (temporizador o salida de la app)."""
+        with self._io_lock:
+            self._timer = None
+            if self._pending is None:
+                return
+            data = _json_dumps(self._pending)
+            self._pending = None
+            # Escritura atómica: un cierre a mitad no deja el historial truncado
+            tmp_path = self.history_file + ".tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.history_file)
+            except Exception as e:
+                print(f"No se pudo guardar el historial: {e}")
 
     def add_to_history(self, file_path):
         item = {
@@ -43,15 +79,83 @@ class DataManager:
             self.save_history()
         return self.history
 
+    def add_many_to_history(self, file_paths):
+        """Añade varios archivos (p. ej. un lote CSV) y guarda el historial una sola vez."""
+        date = datetime.now().strftime("%Y-%m-%d %H:%M")
+        nuevos = []
+        last_path = self.history[0]['path'] if self.history else None
+        for file_path in file_paths:
+            if file_path == last_path:
+                continue
+            nuevos.append({"path": file_path, "filename": os.path.basename(file_path), "date": date})
+            last_path = file_path
+        # El último añadido queda el primero, como con inserciones sucesivas al principio
+        self.history = (nuevos[-40:][::-1] + self.history)[:40] # Mantener los últimos 40
+        self.save_history()
+        return self.history
+
     def clear_history(self):
         self.history = []
-        if os.path.exists(self.history_file):
-            os.remove(self.history_file)
+        with self._io_lock:
+            # Descartar cualquier escritura pendiente antes de borrar el archivo
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+            if os.path.exists(self.history_file):
+                os.remove(self.history_file)
+
+class OperationJournal:
+    """Diario append-only (JSONL) de las operaciones de deshacer, para no perderlas si la app se cierra."""
+    def __init__(self, journal_file="operations.jsonl", max_bytes=10 * 1024 * 1024):
+        self.journal_file = journal_file
+        self.max_bytes = max_bytes
+        self._fp = None
+        try:
+            self._rotate_if_needed()
+            self._fp = open(self.journal_file, "a", encoding="utf-8")
+        except OSError as e:
+            print(f"No se pudo abrir el diario de operaciones: {e}")
+
+    def _rotate_if_needed(self):
+        # Rotación simple: el diario lleno pasa a .1 (se conserva una sola copia)
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > self.max_bytes:
+            os.replace(self.journal_file, self.journal_file + ".1")
+
+    def append(self, op):
+        """Añade una operación (dict serializable) como una línea. Best-effort: nunca lanza."""
+        if self._fp is None: return
+        try:
+            self._fp.write(json.dumps(op, default=str) + "\n")
+            self._fp.flush()
+            if self._fp.tell() > self.max_bytes:
+                self._fp.close()
+                self._rotate_if_needed()
+                self._fp = open(self.journal_file, "a", encoding="utf-8")
+        except Exception:
+            pass
+
+    def load(self):
+        """Lee las operaciones registradas (las líneas corruptas se ignoran)."""
+        ops = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ops.append(json.loads(line))
+                    except ValueError:
+                        pass
+        return ops
+
+# Fragmentos fijos del maquetado en columnas de export_to_web
+_COL_OPEN = '<div class="columns"><div class="col">'
+_COL_NEXT = '</div><div class="col">'
+_COL_CLOSE = '</div></div>'
 
 class ExportManager:
     @staticmethod
     def export_to_excel(field_rows):
-        campos = [row["entry"].get() for row in field_rows if row["entry"].get()]
+        campos = [v for v in (row["entry"].get() for row in field_rows) if v]
         if not campos: return
         
         path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV para Excel", "*.csv")])
@@ -63,22 +167,22 @@ class ExportManager:
 
     @staticmethod
     def export_to_word(titulo, field_rows):
-        html = f"<html><body style='font-family: Arial;'><h1>{titulo}</h1><table border='1' width='100%'>"
+        parts = [f"<html><body style='font-family: Arial;'><h1>{titulo}</h1><table border='1' width='100%'>"]
         for row in field_rows:
             label = row["entry"].get()
             if label:
-                html += f"<tr><td bgcolor='#f2f2f2' width='30%'><b>{label}</b></td><td>&nbsp;</td></tr>"
-        html += "</table></body></html>"
+                parts.append(f"<tr><td bgcolor='#f2f2f2' width='30%'><b>{label}</b></td><td>&nbsp;</td></tr>")
+        parts.append("</table></body></html>")
         
         path = filedialog.asksaveasfilename(defaultextension=".doc", filetypes=[("Microsoft Word", "*.doc")])
         if path:
             with open(path, 'w', encoding='utf-8') as f:
-                f.write(html)
+                f.write("".join(parts))
             messagebox.showinfo("Éxito", "Formulario exportado a formato Word.")
 
     @staticmethod
     def export_to_web(titulo, primary_color, field_rows):
-        html = f"""
+        parts = [f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -100,7 +204,7 @@ class ExportManager:
             <div class="form-card">
                 <h1>{titulo}</h1>
                 <form id="pdfForm">
-        """
+        """]
         
         in_columns = False
         for row in field_rows:
@@ -108,46 +212,48 @@ class ExportManager:
             if not label: continue
             ftype = row["type"].get()
             fcol = row["column"].get()
-            cols = [o.strip() for o in row["options"].get().split(",") if o.strip()]
 
             if fcol == "Columna Izq" and not in_columns:
-                html += '<div class="columns"><div class="col">'
+                parts.append(_COL_OPEN)
                 in_columns = True
             elif fcol == "Columna Der" and in_columns:
-                html += '</div><div class="col">'
+                parts.append(_COL_NEXT)
             elif fcol == "Ancho Completo" and in_columns:
-                html += '</div></div>'
+                parts.append(_COL_CLOSE)
                 in_columns = False
 
             if ftype == "Sección":
-                html += f'<div class="section-title">{label}</div>'
+                parts.append(f'<div class="section-title">{label}</div>')
             else:
-                html += f'<div class="field-row"><label>{label}</label>'
+                parts.append(f'<div class="field-row"><label>{label}</label>')
+                # Las opciones solo se leen y trocean para los tipos que las usan
+                if ftype in ("Dropdown", "Radio Buttons"):
+                    cols = [o.strip() for o in row["options"].get().split(",") if o.strip()]
                 if ftype == "Dropdown":
-                    html += f'<select><option></option>' + "".join([f'<option>{o}</option>' for o in cols]) + '</select>'
+                    parts.append(f'<select><option></option>' + "".join([f'<option>{o}</option>' for o in cols]) + '</select>')
                 elif ftype == "Radio Buttons":
                     for o in cols:
-                        html += f'<div><input type="radio" name="{label}" value="{o}"> {o}</div>'
+                        parts.append(f'<div><input type="radio" name="{label}" value="{o}"> {o}</div>')
                 elif ftype == "Checkbox":
-                    html += f'<input type="checkbox" style="width: auto;"> {label}'
+                    parts.append(f'<input type="checkbox" style="width: auto;"> {label}')
                 elif ftype == "Multilínea":
-                    html += '<textarea rows="4"></textarea>'
+                    parts.append('<textarea rows="4"></textarea>')
                 else:
                     t_web = "date" if ftype == "Fecha" else "number" if ftype == "Número" else "text"
-                    html += f'<input type="{t_web}">'
-                html += '</div>'
+                    parts.append(f'<input type="{t_web}">')
+                parts.append('</div>')
 
-        if in_columns: html += '</div></div>'
-        html += """
+        if in_columns: parts.append(_COL_CLOSE)
+        parts.append("""
                 <button type="button" class="btn" onclick="alert('Formulario completado')">Enviar Formulario</button>
                 </form>
             </div>
         </body>
         </html>
-        """
+        """)
         
         path = filedialog.asksaveasfilename(defaultextension=".html", filetypes=[("Archivo Web", "*.html")])
         if path:
             with open(path, 'w', encoding='utf-8') as f:
-                f.write(html)
+                f.write("".join(parts))
             messagebox.showinfo("Éxito", "Formulario web HTML generado.")
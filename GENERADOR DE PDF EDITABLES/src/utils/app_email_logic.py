@@ -5,8 +5,67 @@ Módulo de Envío de Email - PDF Master Pro
 import smtplib
 from email.message import EmailMessage
 import os
+import time
+import atexit
+import threading
 from tkinter import messagebox
-from src.core.pdf_generator import generar_pdf
+
+# Sesiones SMTP ya autenticadas, reutilizadas durante unos segundos para no repetir
+# el handshake TLS + login en cada prueba o envío: clave -> (SMTP, instante de uso)
+_SMTP_TTL = 30
+_smtp_pool = {}
+_smtp_lock = threading.Lock()
+
+def _close_smtp(server):
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+def _get_smtp(server_addr, port, user, password, timeout):
+    """
+    Devuelve (clave, sesión) autenticada: reutiliza la del pool si sigue viva
+    (se comprueba con NOOP) o abre una nueva. La sesión queda fuera del pool
+    hasta que se devuelve con _release_smtp, así que nadie más la usa a la vez.
+    """
+    key = (server_addr, int(port), user, password)
+    with _smtp_lock:
+        entry = _smtp_pool.pop(key, None)
+    if entry:
+        server, ts = entry
+        if time.time() - ts < _SMTP_TTL:
+            try:
+                if server.noop()[0] == 250:
+                    server.sock.settimeout(timeout)
+                    return key, server
+            except (smtplib.SMTPException, OSError):
+                pass
+        _close_smtp(server)
+
+    server = smtplib.SMTP(server_addr, int(port), timeout=timeout)
+    try:
+        server.starttls()
+        server.login(user, password)
+    except Exception:
+        _close_smtp(server)
+        raise
+    return key, server
+
+def _release_smtp(key, server):
+    """Devuelve una sesión sana al pool (cerrando la que hubiera con la misma clave)."""
+    with _smtp_lock:
+        old = _smtp_pool.pop(key, None)
+        _smtp_pool[key] = (server, time.time())
+    if old:
+        _close_smtp(old[0])
+
+@atexit.register
+def _close_smtp_pool():
+    with _smtp_lock:
+        entries = list(_smtp_pool.values())
+        _smtp_pool.clear()
+    for server, _ in entries:
+        _close_smtp(server)
 
 def send_generated_pdf_email(config_email, temp_path, mail_to, subject, body):
     """
@@ -19,14 +78,19 @@ def send_generated_pdf_email(config_email, temp_path, mail_to, subject, body):
         msg['To'] = mail_to or config_email['sender_email']
         msg.set_content(body)
 
+        # Sin variable intermedia: los bytes crudos se liberan en cuanto se codifican
+        # en base64 dentro del mensaje, y no siguen vivos durante el envío SMTP
         with open(temp_path, 'rb') as f:
-            file_data = f.read()
-            msg.add_attachment(file_data, maintype='application', subtype='pdf', filename=os.path.basename(temp_path))
+            msg.add_attachment(f.read(), maintype='application', subtype='pdf', filename=os.path.basename(temp_path))
 
-        with smtplib.SMTP(config_email['smtp_server'], int(config_email['smtp_port'])) as server:
-            server.starttls()
-            server.login(config_email['sender_email'], config_email['sender_password'])
+        key, server = _get_smtp(config_email['smtp_server'], config_email['smtp_port'],
+                                config_email['sender_email'], config_email['sender_password'], timeout=None)
+        try:
             server.send_message(msg)
+        except Exception:
+            _close_smtp(server)
+            raise
+        _release_smtp(key, server)
         
         return True, msg['To']
     except Exception as e:
@@ -37,9 +101,8 @@ def test_smtp_connection(server_addr, port, user, password):
     Realiza una prueba rápida de conexión SMTP para validar credenciales.
     """
     try:
-        with smtplib.SMTP(server_addr, int(port), timeout=10) as server:
-            server.starttls()
-            server.login(user, password)
+        key, server = _get_smtp(server_addr, port, user, password, timeout=10)
+        _release_smtp(key, server)
         return True, "Conexión exitosa"
     except Exception as e:
         return False, str(e)
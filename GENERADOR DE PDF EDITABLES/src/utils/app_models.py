@@ -2,7 +2,9 @@
 Modelos y Configuración por Defecto - PDF Master Pro
 """
 
+import re
 import customtkinter as ctk
+from dataclasses import dataclass
 
 # Tipos de campos permitidos y sus etiquetas visuales
 FIELD_TYPES = ["Texto", "Fecha", "Checkbox", "Dropdown", "Radio Buttons", "Multilínea", "Firma", "Número", "Sección"]
@@ -15,6 +17,38 @@ TYPE_MAP = {
     "Sección": "section"
 }
 
+# Mapeo de columnas visuales a columnas internas del PDF
+COLUMN_MAP = {"Ancho Completo": "full", "Columna Izq": "1", "Columna Der": "2"}
+
+# Mapeos inversos: tipo/columna interna -> etiqueta visual
+TYPE_MAP_INV = {v: k for k, v in TYPE_MAP.items()}
+COLUMN_MAP_INV = {v: k for k, v in COLUMN_MAP.items()}
+
+# Tipos de campo que pueden disparar la lógica condicional de otro campo
+TRIGGER_TYPES = frozenset({"Dropdown", "Radio Buttons", "Checkbox"})
+
+# Validaciones especiales: mismas reglas que el JavaScript incrustado en el PDF, compiladas una vez
+VALIDATION_PATTERNS = {
+    "Email": re.compile(r"^[\w\-.]+@([\w-]+\.)+[\w-]{2,4}$"),
+    "DNI/NIE": re.compile(r"^[XYZ0-9][0-9]{7}[TRWAGMYFPDXBNJZSQVHLCKE]$", re.IGNORECASE),
+    "Teléfono": re.compile(r"^(\+34|0034|34)?[6789]\d{8}$"),
+    "Numérico": re.compile(r"^\s*[-+]?(\d+([.,]\d*)?|[.,]\d+)\s*$"),
+}
+
+def validate_value(kind, value):
+    """
+    True si el valor cumple la validación 'kind' (los vacíos y 'Ninguno' siempre la cumplen).
+    Se ignoran los espacios alrededor del valor, habituales en los CSV exportados, y en
+    los teléfonos también los internos ("612 345 678").
+    """
+    pattern = VALIDATION_PATTERNS.get(kind)
+    if pattern is None:
+        return True
+    value = value.strip()
+    if kind == "Teléfono":
+        value = "".join(value.split())
+    return not value or pattern.match(value) is not None
+
 # Configuración Visual por defecto
 DEFAULT_CONFIG_VISUAL = {
     'primary_color': '#2E86C1',
@@ -50,6 +84,58 @@ STYLE_SB_MENU = {"fg_color": ("#FFFFFF", "#2C2C2E"), "button_color": ("#D1D1D6",
 STYLE_SB_BTN = {"fg_color": ("#D1D1D6", "#2C2C2E"), "hover_color": ("#C7C7CC", "#3A3A3C"), 
                  "corner_radius": 10, "text_color": ("black", "white")}
 
+# Entradas máximas en las pilas de deshacer/rehacer
+UNDO_LIMIT = 50
+# Movimientos del mismo elemento separados menos de esto (s) se agrupan en una sola entrada
+UNDO_COALESCE_S = 0.5
+
+# Ancho (px) de la vista previa en pantalla y sobremuestreo mínimo con el que se renderiza
+PREVIEW_DISPLAY_W = 480
+PREVIEW_SUPERSAMPLE = 2
+
+# Ventana mínima (ms) entre renders de la vista previa
+PREVIEW_DEBOUNCE_MS = 80
+# Intervalo (ms) del throttle para sliders y tecleo continuo
+PREVIEW_THROTTLE_MS = 100
+# Espera (ms) tras el último cambio de diseño (espaciado, tamaños, fuente) antes de renderizar
+VISUAL_CONFIG_DEBOUNCE_MS = 120
+# Intervalo (ms) entre refrescos durante un arrastre (~60 fps)
+DRAG_FRAME_MS = 16
+# Tamaño de celda (pts) de la rejilla de búsqueda de campos absolutos en el preview
+ABS_GRID_CELL_PTS = 50
+# Tolerancia (pts) alrededor de un campo absoluto para seleccionarlo con un clic
+ABS_CLICK_TOLERANCE_PTS = 30
+
+
+class FieldValue:
+    """
+    Valor simple con la interfaz get()/set() de las variables Tk, para propiedades de un
+    campo que no están enlazadas a ningún widget (lógica, obligatorio, validación).
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+@dataclass
+class Operation:
+    """
+    Registro de deshacer/rehacer: guarda solo lo que cambió.
+    kind: field_add, field_del, field_move, reorder, image_add, image_del, image_move,
+    visual, logo o snapshot (estado completo).
+    """
+    kind: str
+    index: int = None
+    old: object = None
+    new: object = None
+    ts: float = 0.0  # Instante (monotonic) del registro, para agrupar movimientos seguidos
+
 # Iconos para secciones colapsables
 ICON_EXPANDED = "▼"
 ICON_COLLAPSED = "▶"
@@ -1,9 +1,11 @@
 import os
+from functools import lru_cache
 
 # Configuración de entorno para silenciar MuPDF
 os.environ['FITZ_LOG_LEVEL'] = '0'
 
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
 from pypdf import PdfReader
 
@@ -31,6 +33,56 @@ def render_pdf_to_images(pdf_path, dpi=150):
         print(f"Error renderizando PDF: {e}")
         return []
 
+@lru_cache(maxsize=8)
+def _cached_render_pdf(pdf_path, mtime, dpi):
+    return tuple(render_pdf_to_images(pdf_path, dpi=dpi))
+
+@lru_cache(maxsize=8)
+def _cached_pdf_dims(pdf_path, mtime):
+    return get_pdf_dimensions(pdf_path)
+
+def render_pdf_to_images_cached(pdf_path, dpi=150):
+    """
+    Igual que render_pdf_to_images, memoizado por (ruta, mtime, dpi):
+    si el archivo cambia en disco se vuelve a rasterizar.
+    """
+    return list(_cached_render_pdf(pdf_path, os.path.getmtime(pdf_path), dpi))
+
+def get_pdf_dimensions_cached(pdf_path):
+    """Igual que get_pdf_dimensions, memoizado por (ruta, mtime)."""
+    return _cached_pdf_dims(pdf_path, os.path.getmtime(pdf_path))
+
+@lru_cache(maxsize=16)
+def _cached_page_drawings(pdf_path, mtime, page_num):
+    # get_drawings es costoso: se extrae una vez por (ruta absoluta, mtime, página).
+    # None si la página no existe.
+    doc = fitz.open(pdf_path)
+    try:
+        if page_num >= len(doc):
+            return None
+        return tuple(doc[page_num].get_drawings())
+    finally:
+        doc.close()
+
+def _classify_btn(data):
+    # Bit 16 de /Ff (32768): grupo de radio; si no, casilla
+    return "Radio Buttons" if data.get('/Ff', 0) & 32768 else "Checkbox"
+
+def _classify_tx(data):
+    # Bit 13 de /Ff (4096): texto multilínea
+    return "Multilínea" if data.get('/Ff', 0) & 4096 else "Texto"
+
+def _classify_default(data):
+    return "Texto"
+
+# Tipo de campo del editor según el /FT del PDF
+_FT_DISPATCH = {
+    '/Btn': _classify_btn,
+    '/Ch': lambda data: "Dropdown",
+    '/Sig': lambda data: "Firma",
+    '/Tx': _classify_tx,
+}
+
 def extract_pdf_fields_info(pdf_path):
     """
     Extrae información de los campos de un PDF para importar al editor.
@@ -44,22 +96,7 @@ def extract_pdf_fields_info(pdf_path):
         extracted = []
         for name, data in fields.items():
             ft = data.get('/FT')
-            ftype = "Texto"
-            
-            if ft == '/Btn':
-                flags = data.get('/Ff', 0)
-                if flags & 32768:
-                    ftype = "Radio Buttons"
-                else:
-                    ftype = "Checkbox"
-            elif ft == '/Ch':
-                ftype = "Dropdown"
-            elif ft == '/Sig':
-                ftype = "Firma"
-            elif ft == '/Tx':
-                flags = data.get('/Ff', 0)
-                if flags & 4096:
-                    ftype = "Multilínea"
+            ftype = _FT_DISPATCH.get(ft, _classify_default)(data)
             
             # Intentar obtener opciones si es dropdown
             options = ""
@@ -84,14 +121,12 @@ def find_field_box_at(pdf_path, page_num, x_pts, y_pts):
     Retorna (x, y, w, h) en puntos PDF o None si no encuentra nada razonable.
     """
     try:
-        doc = fitz.open(pdf_path)
-        if page_num >= len(doc):
+        pdf_path = os.path.abspath(pdf_path)
+        drawings = _cached_page_drawings(pdf_path, os.path.getmtime(pdf_path), page_num)
+        if drawings is None:
             return None
-            
-        page = doc[page_num]
-        
+
         # 1. Intentar con drawings (rectángulos vectoriales)
-        drawings = page.get_drawings()
         best_box = None
         min_area = float('inf')
         
@@ -111,62 +146,56 @@ def find_field_box_at(pdf_path, page_num, x_pts, y_pts):
                     }
         
         if best_box:
-            doc.close()
             return best_box
         
         # 2. Si no encontró drawings, buscar líneas cercanas
-        # Obtener todas las líneas de la página
-        paths = page.get_drawings()
-        h_lines = []  # Líneas horizontales
-        v_lines = []  # Líneas verticales
-        
+        # (reutiliza la lista ya extraída: get_drawings es costoso)
         tolerance = 5  # Tolerancia en puntos
-        
-        for path in paths:
-            items = path.get('items', [])
-            for item in items:
+        search_radius = 50  # Radio de búsqueda
+
+        # Extraer los extremos de todos los segmentos a un array (N, 4)
+        coords = []
+        for path in drawings:
+            for item in path.get('items', []):
                 if item[0] == 'l':  # Línea
                     p1, p2 = item[1], item[2]
-                    # Línea horizontal (Y similar)
-                    if abs(p1.y - p2.y) < tolerance:
-                        y = (p1.y + p2.y) / 2
-                        x1, x2 = min(p1.x, p2.x), max(p1.x, p2.x)
-                        h_lines.append((x1, x2, y))
-                    # Línea vertical (X similar)
-                    elif abs(p1.x - p2.x) < tolerance:
-                        x = (p1.x + p2.x) / 2
-                        y1, y2 = min(p1.y, p2.y), max(p1.y, p2.y)
-                        v_lines.append((x, y1, y2))
-        
-        print(f"[DETECT] Encontradas {len(h_lines)} líneas horizontales y {len(v_lines)} líneas verticales")
-        
+                    coords += (p1.x, p1.y, p2.x, p2.y)
+        seg = np.asarray(coords, dtype=float).reshape(-1, 4)
+        sx1, sy1, sx2, sy2 = seg.T
+
+        # Clasificar: horizontal (Y similar) y, si no, vertical (X similar)
+        is_h = np.abs(sy1 - sy2) < tolerance
+        is_v = ~is_h & (np.abs(sx1 - sx2) < tolerance)
+        h_y = (sy1 + sy2) / 2
+        h_x1, h_x2 = np.minimum(sx1, sx2), np.maximum(sx1, sx2)
+        v_x = (sx1 + sx2) / 2
+        v_y1, v_y2 = np.minimum(sy1, sy2), np.maximum(sy1, sy2)
+
+        print(f"[DETECT] Encontradas {int(is_h.sum())} líneas horizontales y {int(is_v.sum())} líneas verticales")
+
+        def nearest(mask, key, pick_max):
+            # Índice de la línea más cercana al punto (la primera si hay empate)
+            idx = np.flatnonzero(mask)
+            if not idx.size:
+                return None
+            vals = key[idx]
+            return idx[np.argmax(vals) if pick_max else np.argmin(vals)]
+
         # Buscar líneas que formen un recuadro alrededor del punto
-        search_radius = 50  # Radio de búsqueda
-        
         # Líneas horizontales arriba y abajo
-        top_line = None
-        bottom_line = None
-        for x1, x2, y in h_lines:
-            if x1 <= x_pts <= x2 and abs(y - y_pts) < search_radius:
-                if y < y_pts:  # Línea arriba
-                    if not top_line or y > top_line[2]:
-                        top_line = (x1, x2, y)
-                elif y > y_pts:  # Línea abajo
-                    if not bottom_line or y < bottom_line[2]:
-                        bottom_line = (x1, x2, y)
-        
+        near_h = is_h & (h_x1 <= x_pts) & (x_pts <= h_x2) & (np.abs(h_y - y_pts) < search_radius)
+        top = nearest(near_h & (h_y < y_pts), h_y, True)
+        bottom = nearest(near_h & (h_y > y_pts), h_y, False)
+        top_line = (h_x1[top], h_x2[top], h_y[top]) if top is not None else None
+        bottom_line = (h_x1[bottom], h_x2[bottom], h_y[bottom]) if bottom is not None else None
+
         # Líneas verticales izquierda y derecha
-        left_line = None
-        right_line = None
-        for x, y1, y2 in v_lines:
-            if y1 <= y_pts <= y2 and abs(x - x_pts) < search_radius:
-                if x < x_pts:  # Línea izquierda
-                    if not left_line or x > left_line[0]:
-                        left_line = (x, y1, y2)
-                elif x > x_pts:  # Línea derecha
-                    if not right_line or x < right_line[0]:
-                        right_line = (x, y1, y2)
-        
+        near_v = is_v & (v_y1 <= y_pts) & (y_pts <= v_y2) & (np.abs(v_x - x_pts) < search_radius)
+        left = nearest(near_v & (v_x < x_pts), v_x, True)
+        right = nearest(near_v & (v_x > x_pts), v_x, False)
+        left_line = (v_x[left],) if left is not None else None
+        right_line = (v_x[right],) if right is not None else None
+
         # Si encontramos al menos top y bottom, crear el recuadro
         if top_line and bottom_line:
             x0 = left_line[0] if left_line else top_line[0]
@@ -175,13 +204,12 @@ def find_field_box_at(pdf_path, page_num, x_pts, y_pts):
             y1 = bottom_line[2]
             
             best_box = {
-                "x": x0,
-                "y": y0,
-                "w": x1 - x0,
-                "h": y1 - y0
+                "x": float(x0),
+                "y": float(y0),
+                "w": float(x1 - x0),
+                "h": float(y1 - y0)
             }
-        
-        doc.close()
+
         return best_box
     except Exception as e:
         print(f"Error detectando caja: {e}")
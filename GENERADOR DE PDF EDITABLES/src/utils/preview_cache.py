@@ -15,8 +15,10 @@ os.environ['FITZ_LOG_LEVEL'] = '0'
 
 import fitz  # PyMuPDF
 from PIL import Image
-import io
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Optional, Callable, Dict, Tuple
 import logging
 
@@ -30,6 +32,55 @@ except:
     pass
 
 
+class _DocCache:
+    """
+    Documentos fitz abiertos, reutilizados entre renderizados (LRU).
+
+    Abrir un PDF obliga a MuPDF a reparsear su árbol de objetos; al mantener
+    el documento abierto, pasar de página solo cuesta el renderizado. La
+    entrada se invalida si cambia el mtime del archivo. Un documento fitz no
+    es seguro entre hilos, así que se usa bajo el lock.
+    """
+
+    def __init__(self, max_docs: int = 8):
+        self.docs: "OrderedDict[str, Tuple[float, fitz.Document]]" = OrderedDict()
+        self.max_docs = max_docs
+        self.lock = threading.RLock()
+
+    @contextmanager
+    def open(self, pdf_path: str):
+        """Entrega el documento abierto de pdf_path (mantiene el lock mientras se usa)."""
+        mtime = os.path.getmtime(pdf_path)
+        with self.lock:
+            entry = self.docs.get(pdf_path)
+            if entry and entry[0] == mtime:
+                self.docs.move_to_end(pdf_path)
+                doc = entry[1]
+            else:
+                if entry:
+                    entry[1].close()
+                doc = fitz.open(pdf_path)
+                self.docs[pdf_path] = (mtime, doc)
+                self.docs.move_to_end(pdf_path)
+                while len(self.docs) > self.max_docs:
+                    _, (_, old) = self.docs.popitem(last=False)
+                    old.close()
+            yield doc
+
+    def clear(self):
+        """Cierra todos los documentos abiertos"""
+        with self.lock:
+            for _, doc in self.docs.values():
+                doc.close()
+            self.docs.clear()
+
+
+_doc_cache = _DocCache()
+
+# Pool compartido para renderizados asíncronos y precarga (evita un hilo por petición)
+_preview_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview")
+
+
 class PreviewCache:
     """Caché inteligente para previsualizaciones de PDF"""
     
@@ -40,17 +91,27 @@ class PreviewCache:
         Args:
             max_cache_size: Número máximo de páginas en caché
         """
-        self.cache: Dict[str, Image.Image] = {}
+        # Orden de inserción = orden de uso (el más reciente al final): LRU con operaciones O(1)
+        self.cache: "OrderedDict[str, Image.Image]" = OrderedDict()
         self.max_cache_size = max_cache_size
-        self.access_order = []
         self.lock = threading.Lock()
+        # Renderizados en curso por clave: otras peticiones de la misma página esperan al Event
+        self._inflight: Dict[str, threading.Event] = {}
+    
+    @staticmethod
+    def _cache_key(pdf_path: str, page_num: int, dpi: int,
+                   target_size: Optional[Tuple[int, int]] = None) -> str:
+        if target_size:
+            return f"{pdf_path}_{page_num}_{target_size[0]}x{target_size[1]}"
+        return f"{pdf_path}_{page_num}_{dpi}"
     
     def get_preview(
         self, 
         pdf_path: str, 
         page_num: int = 0, 
         dpi: int = 150,
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        target_size: Optional[Tuple[int, int]] = None
     ) -> Optional[Image.Image]:
         """
         Obtiene una vista previa de una página PDF.
@@ -60,35 +121,50 @@ class PreviewCache:
             page_num: Número de página
             dpi: Resolución de renderizado
             force_refresh: Forzar re-renderizado
+            target_size: (ancho, alto) en píxeles donde debe caber la página;
+                si se indica, sustituye a dpi
             
         Returns:
             Imagen PIL o None si hay error
         """
-        cache_key = f"{pdf_path}_{page_num}_{dpi}"
+        cache_key = self._cache_key(pdf_path, page_num, dpi, target_size)
         
-        with self.lock:
-            # Verificar caché
-            if not force_refresh and cache_key in self.cache:
-                # Actualizar orden de acceso
-                if cache_key in self.access_order:
-                    self.access_order.remove(cache_key)
-                self.access_order.append(cache_key)
+        while True:
+            with self.lock:
+                # Verificar caché
+                if not force_refresh and cache_key in self.cache:
+                    # Actualizar orden de acceso
+                    self.cache.move_to_end(cache_key)
+                    
+                    logger.debug(f"Cache HIT: {cache_key}")
+                    return self.cache[cache_key]
                 
-                logger.debug(f"Cache HIT: {cache_key}")
-                return self.cache[cache_key]
+                evento = self._inflight.get(cache_key)
+                if evento is None:
+                    # Nadie la está renderizando: la renderiza este hilo
+                    evento = self._inflight[cache_key] = threading.Event()
+                    break
+            
+            # Otro hilo ya la está renderizando: esperar (sin lock) y reutilizar su resultado
+            evento.wait()
+            force_refresh = False
         
-        # Renderizar nueva imagen
+        # Renderizar nueva imagen (fuera del lock: no bloquea los aciertos de otras páginas)
         logger.debug(f"Cache MISS: {cache_key} - Renderizando...")
-        image = self._render_page(pdf_path, page_num, dpi)
-        
-        if image:
+        image = None
+        try:
+            image = self._render_page(pdf_path, page_num, dpi, target_size)
+        finally:
             with self.lock:
-                # Añadir al caché
-                self.cache[cache_key] = image
-                self.access_order.append(cache_key)
-                
-                # Limpiar caché si está lleno
-                self._cleanup_cache()
+                if image:
+                    # Añadir al caché
+                    self.cache[cache_key] = image
+                    self.cache.move_to_end(cache_key)  # Por si era un force_refresh de una clave existente
+                    
+                    # Limpiar caché si está lleno
+                    self._cleanup_cache()
+                del self._inflight[cache_key]
+            evento.set()
         
         return image
     
@@ -97,7 +173,8 @@ class PreviewCache:
         pdf_path: str,
         page_num: int,
         callback: Callable[[Optional[Image.Image]], None],
-        dpi: int = 150
+        dpi: int = 150,
+        target_size: Optional[Tuple[int, int]] = None
     ):
         """
         Obtiene una vista previa de forma asíncrona.
@@ -107,19 +184,45 @@ class PreviewCache:
             page_num: Número de página
             callback: Función a llamar con la imagen
             dpi: Resolución de renderizado
+            target_size: (ancho, alto) en píxeles donde debe caber la página
         """
         def render_and_callback():
-            image = self.get_preview(pdf_path, page_num, dpi)
+            image = self.get_preview(pdf_path, page_num, dpi, target_size=target_size)
             callback(image)
         
-        thread = threading.Thread(target=render_and_callback, daemon=True)
-        thread.start()
+        _preview_executor.submit(render_and_callback)
+        
+        # Precargar las páginas vecinas: lo habitual es pasar a la siguiente/anterior
+        for vecina in (page_num + 1, page_num - 1):
+            self._prefetch(pdf_path, vecina, dpi, target_size)
+    
+    def _prefetch(self, pdf_path: str, page_num: int, dpi: int,
+                  target_size: Optional[Tuple[int, int]] = None):
+        """Renderiza una página en segundo plano (sin callback) si aún no está en caché."""
+        if page_num < 0:
+            return
+        cache_key = self._cache_key(pdf_path, page_num, dpi, target_size)
+        with self.lock:
+            if cache_key in self.cache or cache_key in self._inflight:
+                return
+        
+        def render():
+            try:
+                with _doc_cache.open(pdf_path) as doc:
+                    if page_num >= len(doc):
+                        return
+                self.get_preview(pdf_path, page_num, dpi, target_size=target_size)
+            except Exception as e:
+                logger.debug(f"Precarga fallida {cache_key}: {e}")
+        
+        _preview_executor.submit(render)
     
     def _render_page(
         self, 
         pdf_path: str, 
         page_num: int, 
-        dpi: int
+        dpi: int,
+        target_size: Optional[Tuple[int, int]] = None
     ) -> Optional[Image.Image]:
         """
         Renderiza una página PDF a imagen.
@@ -128,31 +231,33 @@ class PreviewCache:
             pdf_path: Ruta al PDF
             page_num: Número de página
             dpi: Resolución
+            target_size: (ancho, alto) máximo en píxeles; si se indica, sustituye a dpi
             
         Returns:
             Imagen PIL o None
         """
         try:
-            doc = fitz.open(pdf_path)
-            
-            if page_num >= len(doc):
-                logger.error(f"Página {page_num} no existe en {pdf_path}")
-                return None
-            
-            page = doc[page_num]
-            
-            # Calcular zoom para DPI deseado
-            zoom = dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-            
-            # Renderizar (Evitamos annots=True para prevenir errores de 'appearance stream')
-            pix = page.get_pixmap(matrix=mat, alpha=False, annots=False)
-            
-            # Convertir a PIL Image
-            img_data = pix.tobytes("ppm")
-            image = Image.open(io.BytesIO(img_data))
+            # El documento queda abierto en _doc_cache para las siguientes páginas
+            with _doc_cache.open(pdf_path) as doc:
+                if page_num >= len(doc):
+                    logger.error(f"Página {page_num} no existe en {pdf_path}")
+                    return None
+                
+                page = doc[page_num]
+                
+                # Calcular zoom: ajustar al tamaño destino (sin reescalar después) o al DPI deseado
+                if target_size:
+                    zoom = min(target_size[0] / page.rect.width, target_size[1] / page.rect.height)
+                else:
+                    zoom = dpi / 72.0
+                mat = fitz.Matrix(zoom, zoom)
+                
+                # Renderizar (Evitamos annots=True para prevenir errores de 'appearance stream')
+                pix = page.get_pixmap(matrix=mat, alpha=False, annots=False)
             
-            doc.close()
+            # Convertir a PIL Image directamente desde las muestras (sin recodificar a PPM)
+            mode = "RGBA" if pix.alpha else "RGB"
+            image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
             
             return image
             
@@ -164,16 +269,13 @@ class PreviewCache:
         """Limpia el caché si excede el tamaño máximo"""
         while len(self.cache) > self.max_cache_size:
             # Eliminar el elemento menos recientemente usado
-            oldest_key = self.access_order.pop(0)
-            if oldest_key in self.cache:
-                del self.cache[oldest_key]
-                logger.debug(f"Cache cleanup: Eliminado {oldest_key}")
+            oldest_key, _ = self.cache.popitem(last=False)
+            logger.debug(f"Cache cleanup: Eliminado {oldest_key}")
     
     def clear(self):
         """Limpia todo el caché"""
         with self.lock:
             self.cache.clear()
-            self.access_order.clear()
             logger.info("Caché limpiado completamente")
     
     def get_cache_stats(self) -> Dict:
@@ -193,7 +295,8 @@ _global_cache = PreviewCache()
 def get_pdf_preview(
     pdf_path: str, 
     page_num: int = 0, 
-    dpi: int = 150
+    dpi: int = 150,
+    target_size: Optional[Tuple[int, int]] = None
 ) -> Optional[Image.Image]:
     """
     Función de conveniencia para obtener vista previa con caché global.
@@ -202,18 +305,20 @@ def get_pdf_preview(
         pdf_path: Ruta al PDF
         page_num: Número de página
         dpi: Resolución
+        target_size: (ancho, alto) en píxeles donde debe caber la página
         
     Returns:
         Imagen PIL o None
     """
-    return _global_cache.get_preview(pdf_path, page_num, dpi)
+    return _global_cache.get_preview(pdf_path, page_num, dpi, target_size=target_size)
 
 
 def get_pdf_preview_async(
     pdf_path: str,
     page_num: int,
     callback: Callable[[Optional[Image.Image]], None],
-    dpi: int = 150
+    dpi: int = 150,
+    target_size: Optional[Tuple[int, int]] = None
 ):
     """
     Función de conveniencia para obtener vista previa asíncrona.
@@ -223,10 +328,12 @@ def get_pdf_preview_async(
         page_num: Número de página
         callback: Función a llamar con la imagen
         dpi: Resolución
+        target_size: (ancho, alto) en píxeles donde debe caber la página
     """
-    _global_cache.get_preview_async(pdf_path, page_num, callback, dpi)
+    _global_cache.get_preview_async(pdf_path, page_num, callback, dpi, target_size)
 
 
 def clear_preview_cache():
     """Limpia el caché global de previsualizaciones"""
     _global_cache.clear()
+    _doc_cache.clear()
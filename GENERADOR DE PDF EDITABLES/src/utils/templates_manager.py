@@ -1,5 +1,58 @@
+import copy
+import gzip
+import hashlib
 import json
+import mmap
 import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+
+# orjson (opcional) serializa y parsea bastante más rápido que json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson else 0
+_ORJSON_PRETTY_OPTS = (orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+# msgpack (opcional): formato binario para plantillas, más compacto y rápido de leer
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# zstandard (opcional): compresión .json.zst; .json.gz usa gzip de la biblioteca estándar
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# fastjsonschema (opcional) compila el esquema a una función Python al importar: valida la
+# forma de la plantilla y rellena las claves que falten con sus valores por defecto
+try:
+    import fastjsonschema
+    _validate_template = fastjsonschema.compile({
+        "type": "object",
+        "properties": {
+            "fields": {"type": "array", "default": []},
+            "visual_config": {"type": "object", "default": {}},
+            "extra_images": {"type": "array", "default": []}
+        }
+    })
+except ImportError:
+    _validate_template = None
+
+# Último guardado de cada ruta: (hash del contenido sin comprimir, mtime tras escribir)
+_save_hash_cache = {}
+
+# Extensiones de plantilla admitidas (la primera es la predeterminada)
+TEMPLATE_EXTENSIONS = (".json", ".msgpack", ".json.gz", ".json.zst")
+_COMPRESSED_EXTENSIONS = {"gz": ".json.gz", "zst": ".json.zst"}
 
 PREDEFINED_TEMPLATES = {
     "Formulario de inscripción": [
@@ -46,41 +99,307 @@ PREDEFINED_TEMPLATES = {
     ]
 }
 
-def save_template(name, fields, visual_config, extra_images, folder="templates"):
+def _freeze(value):
+    """Convierte dicts/listas anidados en MappingProxyType/tuplas (solo lectura)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _thaw(value):
+    """Inversa de _freeze: devuelve una copia mutable (dicts y listas)."""
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+# Constante compartida de solo lectura: un editor no puede alterarla por accidente
+PREDEFINED_TEMPLATES = _freeze(PREDEFINED_TEMPLATES)
+
+def get_template(name):
+    """Copia mutable de una plantilla predefinida (lista de dicts)."""
+    return _thaw(PREDEFINED_TEMPLATES[name])
+
+@lru_cache(maxsize=8)
+def _folder_prefix(folder):
+    # Prefijo "carpeta/" calculado una vez por carpeta (evita os.path.join en cada ruta)
+    return folder.rstrip("/\\") + os.sep if folder else ""
+
+def _strip_template_ext(filename):
+    """Nombre de plantilla sin su extensión, o None si no es un archivo de plantilla."""
+    for ext in TEMPLATE_EXTENSIONS:
+        if filename.endswith(ext):
+            return filename[:-len(ext)]
+    return None
+
+def _read_bytes(path):
+    """Contenido del archivo, descomprimido según el sufijo (.gz / .zst)."""
+    if path.endswith(".gz"):
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+    with open(path, 'rb') as f:
+        buf = f.read()
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Leer plantillas .json.zst requiere el paquete 'zstandard'")
+        return zstandard.ZstdDecompressor().decompress(buf)
+    return buf
+
+def _compress(payload, compress):
+    # Nivel 1: la compresión es casi gratis al guardar y el archivo ocupa varias veces menos
+    if compress == "gz":
+        return gzip.compress(payload, compresslevel=1)
+    return zstandard.ZstdCompressor(level=1).compress(payload)
+
+def template_path(name, folder="templates"):
+    """Ruta del archivo de la plantilla `name` (cualquier formato admitido); .json si aún no existe."""
+    for ext in TEMPLATE_EXTENSIONS:
+        path = _folder_prefix(folder) + name + ext
+        if os.path.exists(path):
+            return path
+    return _folder_prefix(folder) + name + TEMPLATE_EXTENSIONS[0]
+
+def save_template(name, fields, visual_config, extra_images, folder="templates", binary=False,
+                  compress=None, pretty=False, hint_dontneed=False):
+    """
+    Guarda la plantilla en JSON (predeterminado) o, con binary=True, en MessagePack.
+    compress="gz" o "zst" guarda el JSON comprimido (.json.gz / .json.zst).
+    El JSON se escribe compacto; pretty=True lo indenta para leerlo a mano.
+    hint_dontneed=True (exportaciones masivas) pide al sistema que no retenga el
+    archivo en la caché de páginas, para no desalojar datos que sí se van a releer.
+    Tiene un coste: fuerza un fdatasync por archivo (espera a que llegue al disco),
+    porque Linux no descarta páginas sucias con DONTNEED.
+    Si existía en otro formato, ese archivo se elimina (migración al guardar).
+    """
+    if binary and msgpack is None:
+        raise RuntimeError("Guardar en binario requiere el paquete 'msgpack'")
+    if compress not in (None, *_COMPRESSED_EXTENSIONS):
+        raise ValueError(f"Compresión no soportada: {compress}")
+    if compress == "zst" and zstandard is None:
+        raise RuntimeError("Guardar en .json.zst requiere el paquete 'zstandard'")
     if not os.path.exists(folder):
         os.makedirs(folder)
     
-    clean_fields = []
-    for f in fields:
-        # Guardamos todo el diccionario del campo para no perder propiedades nuevas (columnas, lógica, etc)
-        clean_fields.append(f)
-        
+    # Guardamos todo el diccionario del campo para no perder propiedades nuevas (columnas, lógica, etc);
+    # se serializa la lista recibida directamente, sin copiarla
     data = {
-        "fields": clean_fields,
+        "fields": fields,
         "visual_config": visual_config,
         "extra_images": extra_images
     }
     
-    path = os.path.join(folder, f"{name}.json")
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    # Serializar de una vez y escribir con un único write (json.dump hace muchos pequeños)
+    if binary:
+        payload = msgpack.packb(data, use_bin_type=True)
+    else:
+        payload = _dumps_json(data, pretty)
+    
+    if binary:
+        ext = ".msgpack"
+    elif compress:
+        ext = _COMPRESSED_EXTENSIONS[compress]
+    else:
+        ext = ".json"
+    prefix = _folder_prefix(folder)
+    path = prefix + name + ext
+    
+    # Si el contenido es idéntico al último guardado y el archivo no se ha tocado desde
+    # entonces, no se reescribe (el hash es del contenido sin comprimir: gzip incluye la hora)
+    digest = hashlib.blake2b(payload, digest_size=16).digest()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime is not None and _save_hash_cache.get(path) == (digest, mtime):
+        return path
+    
+    if compress:
+        payload = _compress(payload, compress)
+    
+    # Escritura atómica: un cierre a mitad no deja una plantilla con JSON truncado
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb', buffering=max(64 * 1024, len(payload))) as f:
+        f.write(payload)
+        if hint_dontneed and hasattr(os, "posix_fadvise"):  # No existe en Windows
+            f.flush()
+            os.fdatasync(f.fileno())  # Las páginas deben estar limpias para poder descartarse
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    os.replace(tmp_path, path)
+    _save_hash_cache[path] = (digest, os.stat(path).st_mtime_ns)
+    for old_ext in TEMPLATE_EXTENSIONS:
+        if old_ext != ext:
+            try:
+                os.remove(prefix + name + old_ext)
+            except FileNotFoundError:
+                pass
     return path
 
+def _dumps_json(data, pretty=False):
+    """JSON en bytes UTF-8: orjson si está disponible; compacto salvo pretty=True."""
+    if orjson:
+        return orjson.dumps(data, option=_ORJSON_PRETTY_OPTS if pretty else _ORJSON_OPTS)
+    if pretty:
+        return json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _loads_json(buf):
+    return orjson.loads(buf) if orjson else json.loads(bytes(buf).decode("utf-8"))
+
 def load_custom_template(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        # Soporte para formato antiguo si existe
-        if isinstance(data, list):
-            return {"fields": data, "visual_config": {}, "extra_images": []}
-        
-        # Asegurar que existan todas las claves
-        if "fields" not in data: data["fields"] = []
-        if "visual_config" not in data: data["visual_config"] = {}
-        if "extra_images" not in data: data["extra_images"] = []
-        
-        return data
+    if path.endswith((".gz", ".zst")):
+        data = _loads_json(_read_bytes(path))
+    else:
+        data = _load_plain(path)
+    return _normalize_template(data)
+
+def _upgrade_legacy(fields):
+    """Formato antiguo: el archivo era solo la lista de campos."""
+    return {"fields": fields, "visual_config": {}, "extra_images": []}
+
+def _normalize_template(data):
+    """Lleva los datos leídos al formato actual {fields, visual_config, extra_images}."""
+    # Caso habitual (dict) primero; el formato antiguo se resuelve aparte.
+    # type() is: comparación de punteros, orjson/json/msgpack devuelven list exacta
+    if type(data) is list:
+        return _upgrade_legacy(data)
+    
+    # Asegurar que existan todas las claves
+    if _validate_template:
+        return _validate_template(data)
+    data.setdefault("fields", [])
+    data.setdefault("visual_config", {})
+    data.setdefault("extra_images", [])
+    
+    return data
+
+def _load_plain(path):
+    """Parsea una plantilla sin comprimir (.json o .msgpack)."""
+    with open(path, 'rb') as f:
+        if path.endswith(".msgpack"):
+            if msgpack is None:
+                raise RuntimeError("Leer plantillas .msgpack requiere el paquete 'msgpack'")
+            data = msgpack.unpackb(f.read(), raw=False)
+        elif orjson and os.fstat(f.fileno()).st_size:
+            # orjson parsea directamente sobre el mapeo del archivo, sin copia a bytes
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+                data = orjson.loads(mv)
+        else:
+            # Sin orjson, o archivo vacío (mmap no admite longitud 0)
+            buf = f.read()
+            data = orjson.loads(buf) if orjson else json.loads(buf.decode("utf-8"))
+    return data
+
+@lru_cache(maxsize=64)
+def _cached_custom_template(path, mtime_ns, size):
+    return load_custom_template(path)
+
+def load_custom_template_cached(path):
+    """
+    Versión memoizada por (ruta, mtime, tamaño) de load_custom_template.
+    Devuelve una copia profunda: la UI modifica los campos cargados (p. ej. abs_pos
+    al arrastrar) y recargar la plantilla debe devolver lo que hay en disco.
+    """
+    st = os.stat(path)
+    return copy.deepcopy(_cached_custom_template(path, st.st_mtime_ns, st.st_size))
+
+def iter_custom_templates(folder="templates"):
+    """
+    Genera los nombres de las plantillas personalizadas a medida que se leen del
+    directorio (sin orden), sin repetir una plantilla guardada en dos formatos.
+    """
+    # scandir lee las entradas por lotes; si la carpeta no existe, no hay plantillas
+    try:
+        it = os.scandir(folder)
+    except FileNotFoundError:
+        return
+    seen = set()
+    with it:
+        for e in it:
+            if e.name.endswith(TEMPLATE_EXTENSIONS) and e.is_file():
+                name = _strip_template_ext(e.name)
+                if name not in seen:
+                    seen.add(name)
+                    yield name
 
 def list_custom_templates(folder="templates"):
-    if not os.path.exists(folder):
-        return []
-    return [f.replace(".json", "") for f in os.listdir(folder) if f.endswith(".json")]
+    return sorted(iter_custom_templates(folder))
+
+def _try_load_custom_template(path):
+    """load_custom_template que devuelve None (y lo registra) si el archivo no se puede leer."""
+    try:
+        return load_custom_template(path)
+    except Exception as e:
+        print(f"Error cargando plantilla {path}: {e}")
+        return None
+
+def load_all_templates(folder="templates"):
+    """
+    Carga todas las plantillas personalizadas de `folder` -> {nombre: datos}.
+    La lectura de disco libera el GIL, así que varios hilos solapan la espera de E/S.
+    Los archivos ilegibles o corruptos se omiten sin perder el resto.
+    """
+    names = list_custom_templates(folder)
+    if not names:
+        return {}
+    paths = [template_path(n, folder) for n in names]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 4) * 4, len(paths))) as ex:
+        loaded = zip(names, ex.map(_try_load_custom_template, paths))
+        return {name: data for name, data in loaded if data is not None}
+
+class SQLiteTemplateStore:
+    """
+    Almacén de plantillas en un único archivo SQLite (una fila por plantilla).
+
+    Alternativa a la carpeta de archivos .json: un solo descriptor abierto y una
+    búsqueda en el índice por nombre en lugar de abrir un archivo por plantilla.
+    """
+
+    def __init__(self, db_path="templates.sqlite"):
+        # Autocommit: las transacciones se abren explícitamente con BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS templates ("
+                          "name TEXT PRIMARY KEY, payload BLOB NOT NULL, mtime INTEGER)")
+
+    def _write(self, rows):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO templates VALUES (?, ?, ?)", rows)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def save(self, name, fields, visual_config, extra_images):
+        data = {"fields": fields, "visual_config": visual_config, "extra_images": extra_images}
+        self._write([(name, _dumps_json(data), time.time_ns())])
+
+    def load(self, name):
+        """Datos de la plantilla `name`; KeyError si no existe."""
+        with self._lock:
+            row = self.conn.execute("SELECT payload FROM templates WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return _normalize_template(_loads_json(row[0]))
+
+    def list(self):
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT name FROM templates ORDER BY name")]
+
+    def delete(self, name):
+        with self._lock:
+            self.conn.execute("DELETE FROM templates WHERE name = ?", (name,))
+
+    def import_folder(self, folder="templates"):
+        """Migración única: copia a la base de datos todas las plantillas de `folder`."""
+        now = time.time_ns()
+        rows = [(name, _dumps_json(data), now) for name, data in load_all_templates(folder).items()]
+        if rows:
+            self._write(rows)
+        return len(rows)
+
+    def close(self):
+        self.conn.close()
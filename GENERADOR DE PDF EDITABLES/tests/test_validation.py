@@ -0,0 +1,39 @@
+"""
+Pruebas de validate_value (validación previa de los valores del CSV en la generación por lotes).
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from src.utils.app_models import validate_value
+except ImportError as e:  # app_models importa customtkinter
+    raise unittest.SkipTest(f"Dependencias no instaladas: {e}")
+
+
+class ValidateValueTests(unittest.TestCase):
+    def test_valores_validos_con_espacios_alrededor(self):
+        self.assertTrue(validate_value("Email", " ana@example.com "))
+        self.assertTrue(validate_value("DNI/NIE", "12345678Z\t"))
+        self.assertTrue(validate_value("Numérico", " 3,5 "))
+
+    def test_telefono_con_espacios_internos(self):
+        self.assertTrue(validate_value("Teléfono", "612 345 678"))
+        self.assertTrue(validate_value("Teléfono", " +34 612 345 678 "))
+
+    def test_valores_invalidos(self):
+        self.assertFalse(validate_value("Email", "ana@"))
+        self.assertFalse(validate_value("DNI/NIE", "1234"))
+        self.assertFalse(validate_value("Teléfono", "512 345 678"))
+        self.assertFalse(validate_value("Numérico", "abc"))
+
+    def test_vacios_y_sin_validacion(self):
+        self.assertTrue(validate_value("Email", "   "))
+        self.assertTrue(validate_value("Ninguno", "lo que sea"))
+
+
+if __name__ == "__main__":
+    unittest.main()